@@ -3,6 +3,8 @@ import os
 import re
 import sys
 import warnings
+from concurrent.futures import as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from typing import Any, Dict
 
 import paramiko
@@ -11,8 +13,12 @@ import paramiko
 
 # Add the parent directory to sys.path to access Backend/
 from .backend import session_manager
+from .backend.cluster_registry import cluster_registry, store_credentials
+from .backend.cluster_resolver import ClusterResolutionError, cluster_resolver
 from .backend.functionality import (
     CephOperations,  # Import CephOperations from backend.py
+    ceph_ops,
+    fanout_executor,
 )
 from dotenv import load_dotenv
 from langchain.agents import AgentType, initialize_agent
@@ -36,12 +42,12 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 HUGGINGFACEHUB_API_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
 
-# Initialize Ceph operations
-ceph_ops = CephOperations()
+# Multi-cluster queries ask every cluster at once (on fanout_executor), within one overall deadline
+FANOUT_DEADLINE = float(os.getenv("CEPHVIZ_FANOUT_DEADLINE_SECONDS", "120"))
 
-# In-memory storage for cluster mappings (Cluster 1 → IP)
-# TODO: Persist this in a file or DB to retain connections after restart
-cluster_mapping = {}
+# Clusters connected before a restart come back from the registry, their
+# sessions open on first use
+session_manager.warm_from_registry()
 
 
 class DynamicModel(BaseModel):
@@ -136,6 +142,12 @@ def connect_cluster(cluster_name, cluster_ip):
             "ip": cluster_ip,
             "session": session,  # Store session for later use
         }
+        cluster_registry.add(
+            cluster_name,
+            cluster_ip,
+            username,
+            store_credentials(cluster_ip, username, password),
+        )
         return json.dumps(
             {
                 "status": "success",
@@ -152,10 +164,7 @@ def connect_cluster(cluster_name, cluster_ip):
 
 
 def fetch_session_of_cluster(cluster_name: str):
-    print("Fetches the session of the cluster")
     cluster_info = session_manager.cluster_data.get(cluster_name.strip())
-    print("Cluster info: ", cluster_info)
-    print("Cluster sessions: ", session_manager.cluster_data.get(cluster_name))
     if not cluster_info:
         return json.dumps(
             {
@@ -164,7 +173,8 @@ def fetch_session_of_cluster(cluster_name: str):
             }
         )
 
-    cluster_session = cluster_info.get("session")
+    # Clusters restored from the registry connect on first use
+    cluster_session = session_manager.get_session(cluster_name.strip())
     if not cluster_session:
         return json.dumps(
             {
@@ -173,17 +183,15 @@ def fetch_session_of_cluster(cluster_name: str):
             }
         )
 
-    print("Inside fetch session: ", type(cluster_session))
     return cluster_session
 
 
 def get_cluster_status(cluster_name: str):
     """Fetches Ceph cluster status using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_cluster_status() for {cluster_name}")
     try:
         return ceph_ops.get_cluster_status(fetch_session_of_cluster(cluster_name))
@@ -196,11 +204,10 @@ def get_cluster_status(cluster_name: str):
 
 def get_cluster_health(cluster_name: str):
     """Fetches the health status of a Ceph cluster using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_cluster_health() for {cluster_name}")
     try:
         session = fetch_session_of_cluster(cluster_name)
@@ -216,11 +223,10 @@ def get_cluster_health(cluster_name: str):
 
 def osd_status(cluster_name: str):
     """Fetches the status of OSDs in a Ceph cluster using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_osds() for {cluster_name}", flush=True)
     try:
         output = ceph_ops.osd_status(fetch_session_of_cluster(cluster_name))
@@ -241,8 +247,8 @@ def osd_status(cluster_name: str):
         print(type(output))
         # Generate a formatted string for each OSD
         formatted_osds = [
-            f"Host: {osd['host name']}, ID: {osd['id']}, Used: {osd['kb used']}, State: {', '.join(osd['state'])}"
-            for osd in output["output"]["OSDs"]
+            f"Host: {osd.get('host', '')}, ID: {osd['id']}, Used: {osd.get('kb_used', 0)}, State: {osd.get('state', '')}"
+            for osd in output["output"]
         ]
 
         # Join the formatted strings into a single response
@@ -263,11 +269,10 @@ def osd_status(cluster_name: str):
 
 def list_filesystems(cluster_name: str):
     """Lists all CephFS filesystems using the cluster_name as parameter."""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered list_filesystems() for {cluster_name}")
     try:
         output = ceph_ops.list_filesystems(fetch_session_of_cluster(cluster_name))
@@ -298,15 +303,14 @@ def list_filesystems(cluster_name: str):
 
 def get_filesystem_metadata(cluster_name: str, fs_name: str):
     """Fetches metadata information for a Ceph filesystem using the cluster_name and file system name as a parameter from the user"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_filesystem_metadata() for {cluster_name}")
     try:
         return ceph_ops.get_filesystem_metadata(
-            fetch_session_of_cluster(cluster_name, fs_name)
+            fetch_session_of_cluster(cluster_name), fs_name
         )
     except Exception as e:
         return json.dumps(
@@ -316,11 +320,10 @@ def get_filesystem_metadata(cluster_name: str, fs_name: str):
 
 def get_filesystem_info(cluster_name: str, fs_name="cephfs"):
     """Fetches filesystem info using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_filesystem_info() for {cluster_name}")
     try:
         return ceph_ops.get_filesystem_info(
@@ -334,11 +337,10 @@ def get_filesystem_info(cluster_name: str, fs_name="cephfs"):
 
 def list_mds_nodes(cluster_name: str):
     """Lists MDS nodes, state, pool availability and its usage for CephFS using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered list_mds_nodes() for {cluster_name}")
     try:
         return ceph_ops.list_mds_nodes(fetch_session_of_cluster(cluster_name))
@@ -350,11 +352,10 @@ def list_mds_nodes(cluster_name: str):
 
 def get_mds_perf(cluster_name: str):
     """Gets MDS performance for CephFS using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_mds_perf() for {cluster_name}")
     try:
         return ceph_ops.get_mds_perf(fetch_session_of_cluster(cluster_name))
@@ -366,11 +367,10 @@ def get_mds_perf(cluster_name: str):
 
 def list_filesystem_clients(cluster_name: str):
     """Lists all active CephFS clients using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered list_filesystem_clients() for {cluster_name}")
     try:
         return ceph_ops.list_filesystem_clients(fetch_session_of_cluster(cluster_name))
@@ -382,11 +382,10 @@ def list_filesystem_clients(cluster_name: str):
 
 def get_active_mds(cluster_name: str):
     """Checks which MDS nodes are active and standby using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_active_mds() for {cluster_name}")
     try:
         return ceph_ops.get_active_mds(fetch_session_of_cluster(cluster_name))
@@ -398,11 +397,10 @@ def get_active_mds(cluster_name: str):
 
 def get_filesystem_performance(cluster_name: str):
     """Fetches CephFS performance metrics using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_filesystem_performance() for {cluster_name}")
     try:
         return ceph_ops.get_filesystem_performance(
@@ -416,11 +414,10 @@ def get_filesystem_performance(cluster_name: str):
 
 def get_mds_memory_usage(cluster_name: str):
     """Gets MDS memory usage for CephFS using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_mds_memory_usage() for {cluster_name}")
     try:
         return ceph_ops.get_mds_memory_usage(fetch_session_of_cluster(cluster_name))
@@ -432,11 +429,10 @@ def get_mds_memory_usage(cluster_name: str):
 
 def get_cephfs_metadata_pool_usage(cluster_name: str, fs_name: str):
     """Gets CephFS metadata pool usage using the cluster_name as parameter"""
-    cluster_name = (
-        re.search(r"Cluster \d+", cluster_name).group()
-        if re.search(r"Cluster \d+", cluster_name)
-        else "Cluster 1"
-    )
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
     print(f"🚀 Entered get_cephfs_metadata_pool_usage() for {cluster_name}")
     try:
         return ceph_ops.get_cephfs_metadata_pool_usage(
@@ -447,10 +443,59 @@ def get_cephfs_metadata_pool_usage(cluster_name: str, fs_name: str):
             {"status": "error", "message": f"❌ Failed to execute command: {str(e)}"}
         )
 
+def get_cluster_snapshot(cluster_name: str):
+    """Fetches status, health detail, OSD tree, usage and CephFS status of a Ceph cluster in one call"""
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
+    print(f"🚀 Entered get_cluster_snapshot() for {cluster_name}")
+    try:
+        return ceph_ops.get_cluster_snapshot(fetch_session_of_cluster(cluster_name))
+    except Exception as e:
+        return json.dumps(
+            {"status": "error", "message": f"❌ Failed to execute command: {str(e)}"}
+        )
+
+
+def list_unhealthy_pgs(cluster_name: str):
+    """Lists placement groups that are not active+clean using the cluster_name as parameter"""
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
+    print(f"🚀 Entered list_unhealthy_pgs() for {cluster_name}")
+    try:
+        return ceph_ops.list_unhealthy_pgs(fetch_session_of_cluster(cluster_name))
+    except Exception as e:
+        return json.dumps(
+            {"status": "error", "message": f"❌ Failed to execute command: {str(e)}"}
+        )
+
+
+def get_osd_usage(cluster_name: str):
+    """Gets the fullest OSDs and the OSD utilization spread using the cluster_name as parameter"""
+    try:
+        cluster_name = cluster_resolver.resolve(cluster_name)
+    except ClusterResolutionError as e:
+        return e.to_json()
+    print(f"🚀 Entered get_osd_usage() for {cluster_name}")
+    try:
+        return ceph_ops.get_osd_usage(fetch_session_of_cluster(cluster_name))
+    except Exception as e:
+        return json.dumps(
+            {"status": "error", "message": f"❌ Failed to execute command: {str(e)}"}
+        )
+
 # Use all the tools
 
 # Define AI Tools
 tools = [
+    Tool(
+        name="Get Cluster Snapshot",
+        func=get_cluster_snapshot,
+        description="Fetch a full snapshot of a Ceph cluster in one call: status, health detail, OSD tree, usage (df) and CephFS status. Provide 'cluster_name'. Prefer this over calling the individual status, health, OSD and filesystem tools one by one when a question needs several of them.",
+    ),
     Tool(
         name="Get Cluster Status",
         func=get_cluster_status,
@@ -471,6 +516,16 @@ tools = [
         description="Retrieves status of OSDs in the Ceph cluster. Provide 'cluster_name'. Extract the relevant information from the output, such as the number of hosts and their respective statuses, kb used along with id. Update in table format with columns as 'Host', 'id', 'kb used', 'state' along with the individual entries.",
         force_execute=True,  # Always force execution of tool
     ),
+    Tool(
+        name="List Unhealthy PGs",
+        func=list_unhealthy_pgs,
+        description="List the placement groups (PGs) that are not active+clean, e.g. degraded, undersized, peering or stuck PGs, with their up and acting OSDs. Provide 'cluster_name'. 'complete' is false when only the first ones were listed.",
+    ),
+    Tool(
+        name="Get OSD Usage",
+        func=get_osd_usage,
+        description="Get how full the OSDs are: the min, average and max utilization (%) and the fullest OSDs with their size, free space, PG count and variance. Provide 'cluster_name'. Use it for questions about full, nearfull or unbalanced OSDs.",
+    ),
     Tool(
         name="List Filesystems",
         func=list_filesystems,
@@ -655,6 +710,113 @@ agent = initialize_agent(
     do_sample=True,  # Set to True for sampling-based generation (as opposed to greedy)
 )
 
+# Per-cluster questions of a fan-out run concurrently, so they go through an
+# executor without the shared conversation memory
+cluster_agent = initialize_agent(
+    tools=tools,
+    llm=llm,
+    agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
+    prompt=agent_prompt,
+    verbose=True,
+    handle_parsing_errors=True,
+)
+
+
+def _ask_cluster(cluster_name, query):
+    agent_input = {
+        "input": f"Cluster: {cluster_name}\nQuery: {query}",
+        "chat_history": [],
+    }
+    return cluster_agent.invoke(agent_input)["output"]
+
+
+def iter_cluster_results(query, cluster_list, deadline=FANOUT_DEADLINE):
+    """Ask every cluster in parallel and yield ``(cluster_name, output)`` as each one answers.
+
+    Clusters that have not answered within ``deadline`` seconds are yielded
+    last with a timeout message instead of holding up the others.
+    """
+    futures = {
+        fanout_executor.submit(_ask_cluster, cluster_name, query): cluster_name
+        for cluster_name in cluster_list
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            pending.discard(future)
+            cluster_name = futures[future]
+            try:
+                yield cluster_name, future.result()
+            except Exception as e:
+                yield cluster_name, f"❌ Failed to query {cluster_name}: {str(e)}"
+    except FuturesTimeoutError:
+        for future in pending:
+            future.cancel()
+            yield futures[future], f"⏱️ No result within {deadline:.0f}s"
+
+
+def compare_cluster_results(clean_query, results):
+    """Summarise (or graph) the per-cluster answers of a multi-cluster query."""
+    summary_input = {
+        "input": (
+            f"{results}\n\n"
+            "Do not use Tool to summarise this."
+            "Compare the cluster status results for the available clusters in the dictionary (e.g., 'Cluster 1', 'Cluster 2'). "
+            "Identify key differences and summarize in a structured format:\n"
+            "- **Overall Cluster Health**: State the health status (e.g., HEALTH_OK, HEALTH_WARN).\n"
+            "- **Key Metrics**: Compare active/standby nodes, OSDs, pools, and object count.\n"
+            "- **Differences & Similarities**: Highlight variations in services, usage, or warnings.\n"
+            "- **Missing Data**: If any cluster's output is missing, acknowledge it.\n"
+            "- **Recommended Actions**: Suggest troubleshooting steps concisely.\n\n"
+            "Keep the summary short, structured, and easy to read."
+        )
+    }
+
+    if re.search(r"\b(graph|visual)\w*", clean_query):
+        json_input = {
+            "input": (
+                f"{results}\n\n"
+                "Analyze the above cluster status results and extract key details in a structured JSON format. "
+                "The output **should not assume predefined fields** but instead dynamically infer all available information. "
+                "Use the following approach:\n\n"
+                "🔹 **Identify clusters**: Extract cluster names dynamically.\n"
+                "🔹 **Extract meaningful metrics**: Identify all measurable parameters reported, such as health status, monitor count, OSD count, storage usage, warnings, etc.\n"
+                "🔹 **Handle missing data**: If certain information is absent, exclude it instead of forcing a placeholder.\n"
+                "🔹 **Ensure valid JSON output**: Return an array of JSON objects, with each cluster represented as a dictionary containing the extracted details.\n\n"
+                "⚠️ Do not assume a fixed structure—only include fields that are explicitly present in the input."
+            )
+        }
+        json_input_results = agent.invoke(json_input)
+        print(f"Graph Input: {json_input_results['output']['clusters']}")
+
+        graph_input = {
+            "input": (
+                f"Given the following structured JSON data:\n{json_input_results['output']['clusters']}\n\n"
+                "🎯 **Task:** Extract numerical values as they appear and generate a simple graphical representation.\n\n"
+                "✅ **Guidelines:**\n"
+                "1️⃣ **Display data as it is:** Do not infer missing values or overprocess the input.\n"
+                "2️⃣ **Choose the best graph type based on available data:**\n"
+                "   - 📊 **Bar Chart**: For comparing values.\n"
+                "   - 📈 **Line Chart**: If time-based trends exist.\n"
+                "   - 🟠 **Pie Chart**: For percentage breakdowns.\n"
+                "3️⃣ **Handle missing data gracefully:**\n"
+                "   - If a metric is missing, exclude it.\n"
+                "   - If no numerical data is available, generate a simple summary instead of failing.\n"
+                "4️⃣ **Output Format:**\n"
+                "   - **ASCII/Unicode Graph**: Simple text-based output.\n"
+                "   - **HTML/SVG Code**: For embedding in a dashboard.\n"
+                "   - **JSON Representation**: For further processing.\n\n"
+                "⚠️ **Important Instructions:**\n"
+                "🔹 **NEVER leave the output empty.** If the data is unclear, provide a minimal summary or a fallback visualization.\n"
+                "🔹 **DO NOT return 'Invalid' or 'Incomplete Response'.** Instead, respond with a simplified textual representation or a message stating what is missing.\n"
+                "🔹 **If unable to generate a graph, return a structured explanation of the available numerical data.**\n\n"
+                "🚀 **Always return something useful, even if the data is limited!**"
+            )
+        }
+        return agent.invoke(graph_input)  # Let the agent handle comparison
+    else:
+        return agent.invoke(summary_input)
+
 
 def process_query(query: str, cluster_data):
     """Processes user queries using the AI agent, ensuring active session is used."""
@@ -686,94 +848,43 @@ def process_query(query: str, cluster_data):
             response = agent.invoke(agent_input)
             return response
         else:
-            results = {}
-            clean_query = re.sub(r"\bCluster\s*\d+\b", "", query).strip()
-            for cluster_name in cluster_list:
-                agent_input = {
-                    "input": f"Cluster: {cluster_name}\nQuery: {clean_query}"
-                }
-                results[cluster_name] = agent.invoke(agent_input)["output"]
+            clean_query = cluster_resolver.strip_references(query)
+            results = dict(iter_cluster_results(clean_query, cluster_list))
             print("Results: ", results)
+            return compare_cluster_results(clean_query, results)
 
-            summary_input = {
-                "input": (
-                    f"{results}\n\n"
-                    "Do not use Tool to summarise this."
-                    "Compare the cluster status results for the available clusters in the dictionary (e.g., 'Cluster 1', 'Cluster 2'). "
-                    "Identify key differences and summarize in a structured format:\n"
-                    "- **Overall Cluster Health**: State the health status (e.g., HEALTH_OK, HEALTH_WARN).\n"
-                    "- **Key Metrics**: Compare active/standby nodes, OSDs, pools, and object count.\n"
-                    "- **Differences & Similarities**: Highlight variations in services, usage, or warnings.\n"
-                    "- **Missing Data**: If any cluster's output is missing, acknowledge it.\n"
-                    "- **Recommended Actions**: Suggest troubleshooting steps concisely.\n\n"
-                    "Keep the summary short, structured, and easy to read."
-                )
-            }
+    except Exception as e:
+        return f"⚠️ Error processing query: {str(e)}"
 
-            if re.search(r"\b(graph|visual)\w*", clean_query):
-                json_input = {
-                    "input": (
-                        f"{results}\n\n"
-                        "Analyze the above cluster status results and extract key details in a structured JSON format. "
-                        "The output **should not assume predefined fields** but instead dynamically infer all available information. "
-                        "Use the following approach:\n\n"
-                        "🔹 **Identify clusters**: Extract cluster names dynamically.\n"
-                        "🔹 **Extract meaningful metrics**: Identify all measurable parameters reported, such as health status, monitor count, OSD count, storage usage, warnings, etc.\n"
-                        "🔹 **Handle missing data**: If certain information is absent, exclude it instead of forcing a placeholder.\n"
-                        "🔹 **Ensure valid JSON output**: Return an array of JSON objects, with each cluster represented as a dictionary containing the extracted details.\n\n"
-                        "⚠️ Do not assume a fixed structure—only include fields that are explicitly present in the input."
-                    )
-                }
-                json_input_results = agent.invoke(json_input)
-                print(f"Graph Input: {json_input_results['output']['clusters']}")
-
-                graph_input = {
-                    "input": (
-                        f"Given the following structured JSON data:\n{json_input_results['output']['clusters']}\n\n"
-                        "🎯 **Task:** Extract numerical values as they appear and generate a simple graphical representation.\n\n"
-                        "✅ **Guidelines:**\n"
-                        "1️⃣ **Display data as it is:** Do not infer missing values or overprocess the input.\n"
-                        "2️⃣ **Choose the best graph type based on available data:**\n"
-                        "   - 📊 **Bar Chart**: For comparing values.\n"
-                        "   - 📈 **Line Chart**: If time-based trends exist.\n"
-                        "   - 🟠 **Pie Chart**: For percentage breakdowns.\n"
-                        "3️⃣ **Handle missing data gracefully:**\n"
-                        "   - If a metric is missing, exclude it.\n"
-                        "   - If no numerical data is available, generate a simple summary instead of failing.\n"
-                        "4️⃣ **Output Format:**\n"
-                        "   - **ASCII/Unicode Graph**: Simple text-based output.\n"
-                        "   - **HTML/SVG Code**: For embedding in a dashboard.\n"
-                        "   - **JSON Representation**: For further processing.\n\n"
-                        "⚠️ **Important Instructions:**\n"
-                        "🔹 **NEVER leave the output empty.** If the data is unclear, provide a minimal summary or a fallback visualization.\n"
-                        "🔹 **DO NOT return 'Invalid' or 'Incomplete Response'.** Instead, respond with a simplified textual representation or a message stating what is missing.\n"
-                        "🔹 **If unable to generate a graph, return a structured explanation of the available numerical data.**\n\n"
-                        "🚀 **Always return something useful, even if the data is limited!**"
-                    )
-                }
-                return agent.invoke(graph_input)  # Let the agent handle comparison
-            else:
-                return agent.invoke(summary_input)
 
+def stream_query(query: str, cluster_data):
+    """Like process_query, but for multi-cluster queries first yields every
+    cluster's answer as ``{"cluster": ..., "output": ...}`` as soon as it
+    arrives, then the comparison."""
+    cluster_list = get_target_clusters(query, cluster_data) if cluster_data else None
+    if not cluster_list or len(cluster_list) == 1:
+        yield process_query(query, cluster_data)
+        return
+
+    try:
+        clean_query = cluster_resolver.strip_references(query)
+        results = {}
+        for cluster_name, output in iter_cluster_results(clean_query, cluster_list):
+            results[cluster_name] = output
+            yield {"cluster": cluster_name, "output": output}
+        yield compare_cluster_results(clean_query, results)
     except Exception as e:
-        return f"⚠️ Error processing query: {str(e)}"
+        yield f"⚠️ Error processing query: {str(e)}"
 
 
 # Extract cluster names from user input
 def extract_clusters_from_input(user_input, available_clusters):
     """Extracts cluster names mentioned in user input and validates against available clusters."""
-    mentioned_clusters = []
-
-    # Match cluster patterns like "Cluster 1", "Cluster 2", etc.
-    matches = re.findall(r"Cluster\s*\d+", user_input, re.IGNORECASE)
-
-    # Normalize and validate clusters
-    for match in matches:
-        cluster_name = match.strip()  # Normalize formatting
-        if cluster_name in available_clusters:
-            mentioned_clusters.append(cluster_name)
-
-    return mentioned_clusters
+    return [
+        cluster_name
+        for cluster_name in cluster_resolver.find_all(user_input)
+        if cluster_name in available_clusters
+    ]
 
 
 # Determine which clusters to run the command on
@@ -798,7 +909,8 @@ def get_target_clusters(user_input, cluster_data):
     for cluster_name, cluster_info in cluster_data.items():
         session = cluster_info.get("session")
         print("Inside get target cluster: ", cluster_name)
-        if isinstance(session, paramiko.SSHClient):  # Ensure it's an active session
+        # An active session, or one restored from the registry that connects on first use
+        if session is None or isinstance(session, paramiko.SSHClient):
             return [cluster_name]
 
     # If no valid cluster is found
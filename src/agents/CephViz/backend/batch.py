@@ -0,0 +1,68 @@
+"""Run several shell commands in one remote invocation and split their results apart.
+
+Every command runs in the background of a single ``sh`` with its stdout,
+stderr and exit status captured to temp files. Once all have finished the
+captures are written back framed as::
+
+    <marker> <index> out <length>\\n<length bytes>
+    <marker> <index> err <length>\\n<length bytes>
+    <marker> <index> rc <exit status>\\n
+
+Lengths, not delimiters, bound every payload, so command output can contain
+anything (including the marker) without breaking the framing.
+"""
+
+import secrets
+import shlex
+from typing import NamedTuple
+
+
+class CommandResult(NamedTuple):
+    stdout: bytes
+    stderr: bytes
+    exit_status: int | None  # None when the batch ended before the command reported
+
+
+def build_batch_script(commands, marker):
+    lines = ['t=$(mktemp -d) || exit 1', "trap 'rm -rf \"$t\"' EXIT"]
+    for index, command in enumerate(commands):
+        # The group runs the command and records its status in one background job
+        lines.append(
+            f'{{ ( {command} ) >"$t/{index}.out" 2>"$t/{index}.err"; '
+            f'echo $? >"$t/{index}.rc"; }} &'
+        )
+    lines.append("wait")
+    lines.append(f"for i in $(seq 0 {len(commands) - 1}); do")
+    lines.append("  for s in out err; do")
+    lines.append(f'    printf "{marker} %s %s %s\\n" "$i" "$s" "$(wc -c <"$t/$i.$s")"')
+    lines.append('    cat "$t/$i.$s"')
+    lines.append("  done")
+    lines.append(f'  printf "{marker} %s rc %s\\n" "$i" "$(cat "$t/$i.rc")"')
+    lines.append("done")
+    return "sh -c " + shlex.quote("\n".join(lines))
+
+
+def parse_batch_output(data, marker, count):
+    """Split framed batch output into ``count`` :class:`CommandResult` items."""
+    marker = marker.encode()
+    captured = [{"out": b"", "err": b"", "rc": None} for _ in range(count)]
+    pos = 0
+    while pos < len(data):
+        end = data.find(b"\n", pos)
+        if end < 0:
+            break
+        header = data[pos:end].split()
+        pos = end + 1
+        if len(header) != 4 or header[0] != marker:
+            raise ValueError(f"Malformed batch output near byte {pos}")
+        index, stream, value = int(header[1]), header[2].decode(), int(header[3])
+        if stream == "rc":
+            captured[index]["rc"] = value
+        else:
+            captured[index][stream] = data[pos : pos + value]
+            pos += value
+    return [CommandResult(c["out"], c["err"], c["rc"]) for c in captured]
+
+
+def new_marker():
+    return f"__CEPH_BATCH_{secrets.token_hex(8)}__"
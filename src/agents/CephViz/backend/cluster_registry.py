@@ -0,0 +1,243 @@
+"""Clusters the user connected to, kept across restarts in SQLite.
+
+Passwords are never stored. A cluster keeps a *credentials reference* instead:
+
+* ``env:VAR``: the password is in the environment variable ``VAR``
+* ``keyring:<username>@<ip>``: the password is in the OS keyring (needs the
+  ``keyring`` package)
+* ``file:/path``: the password is the content of a file
+
+A cluster whose reference cannot be resolved is still listed, it just has to
+be reconnected by hand.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+load_dotenv()
+
+CLUSTER_REGISTRY_PATH = os.getenv("CLUSTER_REGISTRY_PATH") or str(
+    Path.home() / ".ceph-intelligence" / "clusters.db"
+)
+KEYRING_SERVICE = "ceph-intelligence"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clusters (
+    name TEXT PRIMARY KEY,
+    ip TEXT NOT NULL UNIQUE,
+    username TEXT NOT NULL,
+    port INTEGER NOT NULL DEFAULT 22,
+    credentials_ref TEXT,
+    endpoints TEXT NOT NULL DEFAULT '{}',
+    active_mgr TEXT,
+    health TEXT,
+    health_checked_at TEXT,
+    fsid TEXT,
+    aliases TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+# Columns added after the first release, created on databases that predate them
+_MIGRATIONS = {
+    "fsid": "ALTER TABLE clusters ADD COLUMN fsid TEXT",
+    "aliases": "ALTER TABLE clusters ADD COLUMN aliases TEXT NOT NULL DEFAULT '[]'",
+}
+_COLUMNS = (
+    "name, ip, username, port, credentials_ref, endpoints, active_mgr, health, "
+    "health_checked_at, fsid, aliases"
+)
+
+
+@dataclass(slots=True)
+class ClusterRecord:
+    name: str
+    ip: str
+    username: str
+    port: int = 22
+    credentials_ref: str | None = None
+    endpoints: dict[str, str] = field(default_factory=dict)
+    active_mgr: str | None = None
+    health: str | None = None
+    health_checked_at: str | None = None
+    fsid: str | None = None
+    aliases: list[str] = field(default_factory=list)
+
+
+def store_credentials(ip, username, password):
+    """Keep ``password`` somewhere safe and return its reference, or None if there is nowhere."""
+    if password and password == os.getenv("CEPH_SSH_PASSWORD"):
+        return "env:CEPH_SSH_PASSWORD"
+    if keyring is not None:
+        try:
+            keyring.set_password(KEYRING_SERVICE, f"{username}@{ip}", password)
+            return f"keyring:{username}@{ip}"
+        except Exception as e:
+            print(f"⚠️ Could not store the password of {ip} in the keyring: {e}")
+    print(
+        f"⚠️ The password of {ip} is not kept, it has to be entered again after a "
+        "restart. Set CEPH_SSH_PASSWORD or install keyring to avoid that."
+    )
+    return None
+
+
+def resolve_credentials(credentials_ref):
+    """The password a credentials reference points to, or None."""
+    if not credentials_ref:
+        return None
+    kind, _, value = credentials_ref.partition(":")
+    try:
+        if kind == "env":
+            return os.getenv(value)
+        if kind == "keyring" and keyring is not None:
+            return keyring.get_password(KEYRING_SERVICE, value)
+        if kind == "file":
+            return Path(value).read_text().strip()
+    except Exception as e:
+        print(f"⚠️ Could not resolve credentials {credentials_ref}: {e}")
+    return None
+
+
+def forget_credentials(credentials_ref):
+    kind, _, value = (credentials_ref or "").partition(":")
+    if kind == "keyring" and keyring is not None:
+        try:
+            keyring.delete_password(KEYRING_SERVICE, value)
+        except Exception:
+            pass
+
+
+class ClusterRegistry:
+    """Durable name -> cluster mapping. The database is opened on first use."""
+
+    def __init__(self, path=CLUSTER_REGISTRY_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        # Bumped when names, IPs, fsids or aliases change, see ClusterResolver
+        self.generation = 0
+
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.row_factory = sqlite3.Row
+            # Frontends and the scraper may open it at the same time
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(clusters)")}
+            for column, migration in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(migration)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    def add(self, name, ip, username, credentials_ref=None, port=22):
+        """Register (or re-register) a cluster. An IP already known under another name is renamed."""
+        now = _now()
+        self._execute("DELETE FROM clusters WHERE ip = ? AND name != ?", (ip, name))
+        self._execute(
+            """
+            INSERT INTO clusters (name, ip, username, port, credentials_ref, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                ip = excluded.ip,
+                username = excluded.username,
+                port = excluded.port,
+                credentials_ref = COALESCE(excluded.credentials_ref, clusters.credentials_ref),
+                updated_at = excluded.updated_at
+            """,
+            (name, ip, username, port, credentials_ref, now, now),
+        )
+        self.generation += 1
+        return self.get(name)
+
+    def remove(self, name):
+        record = self.get(name)
+        if record:
+            self._execute("DELETE FROM clusters WHERE name = ?", (name,))
+            self.generation += 1
+        return record
+
+    def set_aliases(self, name, aliases):
+        """Other names the user refers to the cluster by, e.g. ``["prod", "dc1"]``."""
+        self._execute(
+            "UPDATE clusters SET aliases = ?, updated_at = ? WHERE name = ?",
+            (json.dumps(list(aliases)), _now(), name),
+        )
+        self.generation += 1
+
+    def get(self, name):
+        rows = self._execute(f"SELECT {_COLUMNS} FROM clusters WHERE name = ?", (name,))
+        return _record(rows[0]) if rows else None
+
+    def by_ip(self, ip):
+        rows = self._execute(f"SELECT {_COLUMNS} FROM clusters WHERE ip = ?", (ip,))
+        return _record(rows[0]) if rows else None
+
+    def all(self):
+        rows = self._execute(f"SELECT {_COLUMNS} FROM clusters ORDER BY created_at, name")
+        return [_record(row) for row in rows]
+
+    def record_state(self, ip, health=None, active_mgr=None, endpoints=None, fsid=None):
+        """Remember what was last seen of the cluster at ``ip``. Unknown clusters are ignored."""
+        updates, params = ["updated_at = ?"], [_now()]
+        if fsid is not None:
+            rows = self._execute("SELECT fsid FROM clusters WHERE ip = ?", (ip,))
+            if rows and rows[0]["fsid"] != fsid:
+                updates.append("fsid = ?")
+                params.append(fsid)
+                self.generation += 1
+        if health is not None:
+            updates += ["health = ?", "health_checked_at = ?"]
+            params += [health, params[0]]
+        if active_mgr is not None:
+            updates.append("active_mgr = ?")
+            params.append(active_mgr)
+        if endpoints is not None:
+            updates.append("endpoints = ?")
+            params.append(json.dumps(endpoints))
+        self._execute(f"UPDATE clusters SET {', '.join(updates)} WHERE ip = ?", (*params, ip))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _record(row):
+    return ClusterRecord(
+        **{
+            **dict(row),
+            "endpoints": json.loads(row["endpoints"] or "{}"),
+            "aliases": json.loads(row["aliases"] or "[]"),
+        }
+    )
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+cluster_registry = ClusterRegistry()
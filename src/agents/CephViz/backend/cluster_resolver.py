@@ -0,0 +1,127 @@
+import json
+import re
+
+from . import session_manager
+from .cluster_registry import cluster_registry
+
+_SEPARATORS = re.compile(r"[\s_-]+")
+_GLUED_NUMBER = re.compile(r"\bcluster(?=\d)")
+
+
+def normalize_reference(text):
+    """``"Cluster_2"``, ``"cluster-2"`` and ``"CLUSTER2"`` all become ``"cluster 2"``."""
+    return _GLUED_NUMBER.sub("cluster ", _SEPARATORS.sub(" ", text.strip().lower()))
+
+
+class ClusterResolutionError(Exception):
+    """A cluster reference that matches no connected cluster, or several."""
+
+    def __init__(self, reference, matches, known):
+        self.reference = reference
+        self.matches = matches
+        self.known = known
+        if matches:
+            message = (
+                f"❌ '{reference}' refers to several clusters ({', '.join(matches)}). "
+                "Ask about one cluster at a time."
+            )
+        elif known:
+            message = f"❌ No connected cluster matches '{reference}'. Known clusters: {', '.join(known)}."
+        else:
+            message = "❌ No cluster is connected. Connect one first."
+        super().__init__(message)
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "status": "error",
+                "message": str(self),
+                "reference": self.reference,
+                "matches": self.matches,
+                "known_clusters": self.known,
+            }
+        )
+
+
+class ClusterResolver:
+    """Maps free-form cluster references to connected cluster names.
+
+    A reference may be the cluster's name (``"Cluster 2"``, ``"cluster2"``),
+    its IP, its fsid or one of its registry aliases, anywhere in the text. All
+    of them are compiled into one regex, rebuilt only when the connected
+    clusters or the registry change. Text that mentions no cluster resolves
+    only when exactly one cluster is connected; anything else raises
+    :class:`ClusterResolutionError` instead of guessing.
+    """
+
+    def __init__(self, registry=cluster_registry):
+        self.registry = registry
+        # (fingerprint, keys, pattern), replaced as a whole so that concurrent
+        # callers never see the keys of one index with the pattern of another
+        self._indexed = (None, {}, None)
+
+    def _index(self):
+        """The reference keys and their pattern, rebuilt if the clusters changed."""
+        clusters = session_manager.cluster_data
+        fingerprint = (
+            tuple((name, info.get("ip")) for name, info in clusters.items()),
+            self.registry.generation,
+        )
+        indexed = self._indexed
+        if fingerprint == indexed[0]:
+            return indexed[1:]
+
+        keys = {}
+        for name, info in clusters.items():
+            references = [name, info.get("ip")]
+            try:
+                record = self.registry.by_ip(info.get("ip"))
+            except Exception as e:
+                print(f"⚠️ Could not read the cluster registry: {e}")
+                record = None
+            if record:
+                references += [record.fsid, *record.aliases]
+            for reference in filter(None, references):
+                keys[normalize_reference(reference)] = name
+
+        # Longest first, so "cluster 12" is not matched as "cluster 1". Words may be
+        # glued or joined by "_"/"-" in the text, the key is normalized on lookup.
+        alternatives = "|".join(
+            r"[\s_-]*".join(map(re.escape, key.split(" ")))
+            for key in sorted(keys, key=len, reverse=True)
+        )
+        pattern = (
+            re.compile(rf"(?<!\w)(?<!\d\.)({alternatives})(?!\w)(?!\.\d)", re.IGNORECASE)
+            if keys
+            else None
+        )
+        self._indexed = (fingerprint, keys, pattern)
+        return keys, pattern
+
+    def find_all(self, text):
+        """Names of every connected cluster ``text`` mentions, in order of appearance."""
+        keys, pattern = self._index()
+        if not pattern or not text:
+            return []
+        names = [keys[normalize_reference(match)] for match in pattern.findall(text)]
+        return list(dict.fromkeys(names))
+
+    def strip_references(self, text):
+        """``text`` without its cluster references, to ask every cluster the same question."""
+        _, pattern = self._index()
+        if not pattern:
+            return text.strip()
+        return re.sub(r"\s{2,}", " ", pattern.sub("", text)).strip()
+
+    def resolve(self, text):
+        """The one connected cluster ``text`` refers to."""
+        names = self.find_all(text)
+        if len(names) == 1:
+            return names[0]
+        known = list(session_manager.cluster_data)
+        if not names and len(known) == 1:
+            return known[0]
+        raise ClusterResolutionError(str(text).strip(), names, known)
+
+
+cluster_resolver = ClusterResolver()
@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_COMMAND_TTL = float(os.getenv("CEPH_COMMAND_CACHE_TTL_SECONDS", "5"))
+
+# Read-only commands worth caching and for how long (seconds). Longest prefix
+# wins; anything not listed is never cached.
+COMMAND_TTLS = {
+    "ceph status": DEFAULT_COMMAND_TTL,
+    "ceph health": DEFAULT_COMMAND_TTL,
+    "ceph osd status": DEFAULT_COMMAND_TTL,
+    "ceph osd tree": DEFAULT_COMMAND_TTL,
+    "ceph osd df": DEFAULT_COMMAND_TTL,
+    "ceph df": DEFAULT_COMMAND_TTL,
+    "ceph fs status": DEFAULT_COMMAND_TTL,
+    "ceph fs perf stats": DEFAULT_COMMAND_TTL,
+    "ceph tell mds.* perf dump": DEFAULT_COMMAND_TTL,
+    "ceph tell mds.* session ls": DEFAULT_COMMAND_TTL,
+    # Filesystem layout changes rarely
+    "ceph fs ls": 6 * DEFAULT_COMMAND_TTL,
+    "ceph fs get": 6 * DEFAULT_COMMAND_TTL,
+    "ceph fs volume info": 6 * DEFAULT_COMMAND_TTL,
+    "ceph fs dump": 6 * DEFAULT_COMMAND_TTL,
+}
+
+_WHITESPACE = re.compile(r"\s+")
+# The result is stored decoded, so pretty and compact JSON are the same answer
+_JSON_FORMAT = re.compile(r"(-f|--format)[ =]json-pretty\b")
+
+
+def normalize_command(command):
+    command = _WHITESPACE.sub(" ", command.strip())
+    return _JSON_FORMAT.sub(r"\1 json", command)
+
+
+class CommandCache:
+    """Per-cluster cache of read-only command results with single-flight.
+
+    Concurrent callers asking for the same command on the same cluster share a
+    single execution. Cached results are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, ttls=COMMAND_TTLS):
+        # Longest prefix first, so "ceph fs status" is not matched by "ceph fs"
+        self._ttls = sorted(ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        self._entries: dict[tuple[str, str], tuple[float, object]] = {}
+        self._inflight: dict[tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        # Bumped by invalidate(), so results computed before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, command):
+        command = normalize_command(command)
+        for prefix, ttl in self._ttls:
+            if command == prefix or command.startswith(prefix + " "):
+                return ttl
+        return 0
+
+    def get_or_run(self, cluster, command, run, cacheable=lambda result: True):
+        """Return the cached result of ``command`` on ``cluster`` or compute it with ``run()``."""
+        ttl = self.ttl_for(command)
+        if not ttl:
+            return run()
+
+        key = (cluster, normalize_command(command))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            generation = self._generation
+            self.misses += 1
+
+        if not leader:
+            # Someone is already running it, share their result
+            return future.result()
+
+        try:
+            result = run()
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            if cacheable(result):
+                with self._lock:
+                    if generation == self._generation:
+                        self._entries[key] = (time.monotonic() + ttl, result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def peek(self, cluster, command):
+        """Cached result of ``command`` on ``cluster``, or None. Never runs anything."""
+        if not self.ttl_for(command):
+            return None
+        with self._lock:
+            entry = self._entries.get((cluster, normalize_command(command)))
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            return None
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def store(self, cluster, command, result, generation=None):
+        """Cache a result computed outside :meth:`get_or_run` (e.g. by a batch).
+
+        Pass the :attr:`generation` read before computing it, so a result that
+        raced an invalidation is dropped.
+        """
+        ttl = self.ttl_for(command)
+        if ttl:
+            with self._lock:
+                self.misses += 1
+                if generation is not None and generation != self._generation:
+                    return
+                self._entries[(cluster, normalize_command(command))] = (
+                    time.monotonic() + ttl,
+                    result,
+                )
+
+    def invalidate(self, cluster=None, command=None):
+        """Forget cached results of a cluster (or all), optionally only for one command."""
+        command = normalize_command(command) if command else None
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if (cluster is None or key[0] == cluster) and (
+                    command is None or key[1] == command
+                ):
+                    del self._entries[key]
+
+
+command_cache = CommandCache()
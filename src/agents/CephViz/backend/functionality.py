@@ -1,13 +1,63 @@
 import paramiko
+import heapq
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from .cluster_registry import cluster_registry
+from .command_cache import command_cache
+from .models import (
+    ClientPerf,
+    ClusterStatus,
+    Filesystem,
+    FilesystemMap,
+    FsClient,
+    FsStatus,
+    Health,
+    MdsMemory,
+    OsdState,
+    OsdTreeEntry,
+    OsdUsage,
+    PgBrief,
+    Usage,
+    VolumeInfo,
+    compact,
+)
+from .ssh_pool import ssh_sessions
+from .streaming import CEPH_STREAM_MAX_BYTES, OutputTooLarge, iter_json_items
+from .transport import SSHTransport, active_mgr, make_transport
+
 load_dotenv()
 
+# Entries listed by the streaming tools, the rest is only counted
+MAX_LISTED_PGS = int(os.getenv("CEPH_MAX_LISTED_PGS", "50"))
+MAX_LISTED_OSDS = int(os.getenv("CEPH_MAX_LISTED_OSDS", "20"))
+
+# Threads that ask several clusters at once
+FANOUT_WORKERS = int(os.getenv("CEPHVIZ_FANOUT_WORKERS", "10"))
+
+# Everything a "how is this cluster doing" question needs, in one round trip
+SNAPSHOT_COMMANDS = {
+    "status": "ceph status -f json",
+    "health_detail": "ceph health detail -f json",
+    "osd_tree": "ceph osd tree -f json",
+    "df": "ceph df -f json",
+    "fs_status": "ceph fs status -f json",
+}
+SNAPSHOT_MODELS = {
+    "status": ClusterStatus.from_json,
+    "health_detail": Health.from_json,
+    "osd_tree": OsdTreeEntry.list_from_json,
+    "df": Usage.from_json,
+    "fs_status": FsStatus.from_json,
+}
+
 class CephOperations:
     def __init__(self):
         self.connected_clusters = {}
+        # cluster -> CephTransport, created on first use
+        self.transports = {}
 
 
     def connect_cluster(self, cluster_ip, username, password):
@@ -20,6 +70,8 @@ class CephOperations:
         try:
             ssh.connect(cluster_ip, username=username, password=password)
             print(f"✅ Authentication successful for {username}@{cluster_ip}")
+            # Commands on this session run through the cluster's transport pool
+            ssh_sessions.register(cluster_ip, username, password, client=ssh)
             return ssh  # Return the SSH session
         except paramiko.AuthenticationException:
             print("❌ Connection failed: Authentication failed.")
@@ -35,86 +87,381 @@ class CephOperations:
 
         self.connected_clusters[ip].close()
         del self.connected_clusters[ip]
+        transport = self.transports.pop(ip, None)
+        if transport:
+            transport.close()
+        ssh_sessions.close(ip)
+        command_cache.invalidate(ip)
         return {"message": f"Disconnected from {ip}"}
 
+    def connection_metrics(self, ip=None):
+        """SSH pool counters (transports, channels, commands, failures) per cluster."""
+        return ssh_sessions.metrics(ip)
+
+    def invalidate_cache(self, ssh_client=None):
+        """Drop cached command results of one cluster, or of all of them."""
+        command_cache.invalidate(self._cluster_of(ssh_client) if ssh_client else None)
+
+    def set_transport(self, cluster, transport):
+        """Send the commands of ``cluster`` through ``transport`` (e.g. a FakeTransport).
+
+        ``cluster`` may then be passed wherever an SSH client is expected.
+        """
+        old = self.transports.pop(cluster, None)
+        if old and old is not transport:
+            old.close()
+        self.transports[cluster] = transport
+        command_cache.invalidate(cluster)
+
+    def transport(self, cluster):
+        """The cluster's transport: SSH, or a native one (CEPH_TRANSPORT) backed by SSH."""
+        transport = self.transports.get(cluster)
+        if transport is None:
+            ssh = SSHTransport(cluster)
+            try:
+                record = cluster_registry.by_ip(cluster)
+            except Exception as e:
+                print(f"⚠️ Could not read the cluster registry: {e}")
+                record = None
+
+            def resolve_mgr():
+                mgr = active_mgr(ssh)
+                cluster_registry.record_state(cluster, active_mgr=mgr)
+                return mgr
+
+            transport = self.transports.setdefault(
+                cluster,
+                make_transport(
+                    cluster,
+                    ssh,
+                    mgr=record.active_mgr if record else None,
+                    resolve_mgr=resolve_mgr,
+                ),
+            )
+        return transport
+
+    def _cluster_of(self, ssh_client):
+        if isinstance(ssh_client, str):
+            return ssh_client
+        return ssh_sessions.adopt(ssh_client)
+
+    def _remember_status(self, ssh_client, status):
+        """Keep the registry's last known health and mgr endpoints of the cluster current."""
+        try:
+            cluster_registry.record_state(
+                self._cluster_of(ssh_client),
+                health=status.get("health", {}).get("status"),
+                endpoints=status.get("mgrmap", {}).get("services"),
+                fsid=status.get("fsid"),
+            )
+        except Exception as e:
+            print(f"⚠️ Could not update the cluster registry: {e}")
+
+    def state_fingerprint(self, ssh_client):
+        """What changes when answers about the cluster may: health checks, map epochs, PG states.
+
+        Taken from ``ceph status``, so it shares that command's cache entry.
+        """
+        result = self.run_ceph_command(ssh_client, "ceph status -f json")
+        status = result.get("output")
+        if not isinstance(status, dict):
+            raise RuntimeError(result.get("error") or "ceph status returned no JSON")
+        self._remember_status(ssh_client, status)
+        osdmap = status.get("osdmap", {})
+        osdmap = osdmap.get("osdmap", osdmap)  # nested before Nautilus
+        health = status.get("health", {})
+        return (
+            status.get("fsid"),
+            health.get("status"),
+            tuple(sorted(health.get("checks", {}))),
+            status.get("monmap", {}).get("epoch"),
+            osdmap.get("epoch"),
+            status.get("fsmap", {}).get("epoch"),
+            tuple(
+                sorted(
+                    (state["state_name"], state["count"])
+                    for state in status.get("pgmap", {}).get("pgs_by_state", [])
+                )
+            ),
+        )
+
     def run_ceph_command(self, ssh_client, command):
-        """Execute a Ceph command on the specified cluster node."""
+        """Execute a Ceph command on the specified cluster node.
+
+        Read-only commands are answered from a short-lived per-cluster cache and
+        identical concurrent calls share one execution; any other command
+        invalidates the cluster's cached results.
+        """
+        try:
+            cluster = self._cluster_of(ssh_client)
+        except Exception as e:
+            return {"error": f"Failed to execute command: {str(e)}"}
+
+        if not command_cache.ttl_for(command):
+            command_cache.invalidate(cluster)
+        return command_cache.get_or_run(
+            cluster,
+            command,
+            lambda: self._execute(cluster, command),
+            # A failure (unknown pool, ENOENT, EACCES) is asked again next time
+            cacheable=lambda result: result.get("exit_status") == 0,
+        )
+
+    def _execute(self, cluster, command):
         print(f"Debug: {command}")
-        print(f"Debug: {ssh_client}")
+        print(f"Debug: {cluster}")
         try:
-            stdin, stdout, stderr = ssh_client.exec_command(command)
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-
-        #     return {"output": output.strip(), "error": error.strip()}
-        # except Exception as e:
-        #     return {"error": f"Failed to execute command: {str(e)}"}
-        # Attempt to parse output as JSON
-            print(type(output))
-            try:
-                output = json.loads(output)  # Convert to dictionary if it's valid JSON
-            except json.JSONDecodeError:
-                print("Not converting to JSON")
-                pass  # Keep it as a string if it's not JSON
+            result = self.transport(cluster).run(command)
+            return {
+                "output": _decode_output(result.stdout),
+                "error": result.stderr.decode(),
+                "exit_status": result.exit_status,
+            }
+        except Exception as e:
+            return {"error": f"Failed to execute command: {str(e)}"}
 
-            return {"output": output, "error": error}
+    def run_ceph_commands(self, ssh_client, commands):
+        """Execute several Ceph commands in a single round trip.
+
+        Over SSH the commands run concurrently in one remote shell and their
+        stdout, stderr and exit status come back framed on a single channel.
+        Cached read-only results are reused and the fresh ones are cached.
+        Returns one ``{"output", "error", "exit_status"}`` dict per command, in
+        order.
+        """
+        try:
+            cluster = self._cluster_of(ssh_client)
+        except Exception as e:
+            return [{"error": f"Failed to execute command: {str(e)}"} for _ in commands]
+
+        if not all(command_cache.ttl_for(command) for command in commands):
+            command_cache.invalidate(cluster)
+        results = [command_cache.peek(cluster, command) for command in commands]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        generation = command_cache.generation
+        print(f"Debug: batch of {len(pending)} commands on {cluster}")
+        try:
+            batch = self.transport(cluster).run_batch([commands[i] for i in pending])
+        except Exception as e:
+            error = {"error": f"Failed to execute command: {str(e)}"}
+            for i in pending:
+                results[i] = dict(error)
+            return results
+
+        for i, captured in zip(pending, batch):
+            if captured.exit_status is None:
+                # The remote shell died before reporting this one
+                results[i] = {"error": "Failed to execute command: no result"}
+                continue
+            results[i] = {
+                "output": _decode_output(captured.stdout),
+                "error": captured.stderr.decode(),
+                "exit_status": captured.exit_status,
+            }
+            if captured.exit_status == 0:
+                command_cache.store(cluster, commands[i], results[i], generation)
+        return results
+
+    def stream_ceph_json(self, ssh_client, command, path=(), max_bytes=CEPH_STREAM_MAX_BYTES):
+        """Yield the items of the array at ``path`` in the JSON output of ``command``.
+
+        For commands whose output is too large to buffer (``ceph pg dump``,
+        ``ceph osd df tree`` on big clusters): items are decoded as they arrive
+        over the channel and nothing is cached. Stop iterating to stop the
+        remote command; more than ``max_bytes`` of output raises
+        :class:`OutputTooLarge`.
+        """
+        cluster = self._cluster_of(ssh_client)
+        print(f"Debug: streaming {command} from {cluster}")
+        return iter_json_items(self.transport(cluster).stream(command), path, max_bytes)
+
+    def list_unhealthy_pgs(self, ssh_client, limit=MAX_LISTED_PGS):
+        """PGs that are not active+clean, reading ``ceph pg dump`` only until ``limit`` are found."""
+        scanned, unhealthy, complete = 0, [], True
+        try:
+            pgs = self.stream_ceph_json(
+                ssh_client, "ceph pg dump pgs_brief -f json", path=("pg_stats",)
+            )
+            for pg in pgs:
+                scanned += 1
+                pg = PgBrief.from_json(pg)
+                if not pg.healthy:
+                    unhealthy.append(pg)
+                    if len(unhealthy) >= limit:
+                        complete = False
+                        pgs.close()
+                        break
+        except OutputTooLarge as e:
+            complete = False
+            print(f"⚠️ {e}")
+        except Exception as e:
+            return {"error": f"Failed to execute command: {str(e)}"}
+        return {
+            "output": compact(
+                {"pgs_scanned": scanned, "unhealthy_pgs": unhealthy, "complete": complete}
+            )
+        }
+
+    def get_osd_usage(self, ssh_client, limit=MAX_LISTED_OSDS):
+        """The ``limit`` fullest OSDs and the utilization spread, streamed from ``ceph osd df tree``."""
+        fullest, count, total, lowest = [], 0, 0.0, None
+        complete = True
+        try:
+            for node in self.stream_ceph_json(
+                ssh_client, "ceph osd df tree -f json", path=("nodes",)
+            ):
+                if node.get("type") != "osd":
+                    continue
+                osd = OsdUsage.from_json(node)
+                count += 1
+                total += osd.utilization
+                lowest = osd.utilization if lowest is None else min(lowest, osd.utilization)
+                entry = (osd.utilization, osd.id, osd)
+                if len(fullest) < limit:
+                    heapq.heappush(fullest, entry)
+                else:
+                    heapq.heappushpop(fullest, entry)
+        except OutputTooLarge as e:
+            complete = False
+            print(f"⚠️ {e}")
         except Exception as e:
             return {"error": f"Failed to execute command: {str(e)}"}
-    
+        return {
+            "output": compact(
+                {
+                    "osds": count,
+                    "utilization": {
+                        "min": lowest,
+                        "avg": round(total / count, 2) if count else None,
+                        "max": max(fullest)[0] if fullest else None,
+                    },
+                    "fullest_osds": [osd for _, _, osd in sorted(fullest, reverse=True)],
+                    "complete": complete,
+                }
+            )
+        }
+
+    def get_cluster_snapshot(self, ssh_client):
+        """Status, health detail, OSD tree, usage and CephFS status in one round trip."""
+        results = self.run_ceph_commands(ssh_client, list(SNAPSHOT_COMMANDS.values()))
+        snapshot = {"output": {}, "error": {}}
+        if isinstance(results[0].get("output"), dict):
+            self._remember_status(ssh_client, results[0]["output"])
+        for name, result in zip(SNAPSHOT_COMMANDS, results):
+            result = _projected(result, SNAPSHOT_MODELS[name])
+            if "output" in result:
+                snapshot["output"][name] = result["output"]
+            if result.get("error"):
+                snapshot["error"][name] = result["error"].strip()
+        return snapshot
+
     def get_cluster_status(self, ssh_client):
         """Retrieve the status of a connected Ceph cluster."""
         print("In the backend.py")
         print(f"Debug: {type(ssh_client)}")
-        return self.run_ceph_command(ssh_client, "ceph status")
+        result = self.run_ceph_command(ssh_client, "ceph status -f json")
+        if isinstance(result.get("output"), dict):
+            self._remember_status(ssh_client, result["output"])
+        return _projected(result, ClusterStatus.from_json)
 
     def osd_status(self, ssh_client):
         """Get the status of OSDs in the Ceph cluster."""
-        return self.run_ceph_command(ssh_client, "ceph osd status -f json")
+        result = self.run_ceph_command(ssh_client, "ceph osd status -f json")
+        return _projected(result, OsdState.list_from_json)
 
     def get_cluster_health(self, ssh_client):
         """Retrieve Ceph cluster health status."""
-        return self.run_ceph_command(ssh_client, "ceph health")
+        result = self.run_ceph_command(ssh_client, "ceph health detail -f json")
+        if isinstance(result.get("output"), dict):
+            self._remember_status(ssh_client, {"health": result["output"]})
+        return _projected(result, Health.from_json)
 
     def list_filesystems(self, ssh_client):
         """List all CephFS filesystems."""
-        return self.run_ceph_command(ssh_client, "ceph fs ls")
+        result = self.run_ceph_command(ssh_client, "ceph fs ls -f json")
+        return _projected(result, Filesystem.list_from_json)
 
     def get_filesystem_metadata(self, ssh_client, fs_name="cephfs"):
         """Retrieve metadata information for a Ceph filesystem."""
-        command = f"ceph fs get {fs_name}"
-        return self.run_ceph_command(ssh_client, command)
+        result = self.run_ceph_command(ssh_client, f"ceph fs get {fs_name} -f json")
+        return _projected(result, FilesystemMap.from_json)
 
     def get_filesystem_info(self, ssh_client, fs_name="cephfs"):
         """Retrieve metadata information for a Ceph filesystem."""
-        command = f"ceph fs volume info {fs_name}"
-        return self.run_ceph_command(ssh_client, command)
+        result = self.run_ceph_command(ssh_client, f"ceph fs volume info {fs_name} -f json")
+        return _projected(result, VolumeInfo.from_json)
 
     def list_mds_nodes(self, ssh_client):
         """List all MDS (Metadata Server) nodes and its state for CephFS."""
-        return self.run_ceph_command(ssh_client, "ceph fs status -f json-pretty")
+        result = self.run_ceph_command(ssh_client, "ceph fs status -f json")
+        return _projected(result, FsStatus.from_json)
 
     def get_mds_perf(self, ssh_client):
         """Get performance details of CephFS MDS nodes."""
-        return self.run_ceph_command(ssh_client, "ceph fs perf stats -f json-pretty")
+        result = self.run_ceph_command(ssh_client, "ceph fs perf stats -f json")
+        return _projected(result, ClientPerf.list_from_json)
 
     def list_filesystem_clients(self, ssh_client):
-        """List all active CephFS clients."""
-        return self.run_ceph_command(ssh_client, "ceph fs dump | grep client")
+        """List all active CephFS clients.
+
+        ``ceph tell`` has no mon command form, so this runs over SSH whatever
+        CEPH_TRANSPORT is (as the ``ceph fs dump | grep`` it replaced did).
+        """
+        result = self.run_ceph_command(ssh_client, "ceph tell mds.* session ls -f json")
+        return _projected(result, FsClient.list_from_tell)
 
     def get_active_mds(self, ssh_client):
         """Check which MDS nodes are active and standby."""
-        return self.run_ceph_command(ssh_client, "ceph fs status -f json-pretty")
+        result = self.run_ceph_command(ssh_client, "ceph fs status -f json")
+        return _projected(result, lambda data: FsStatus.from_json(data).mds)
 
     ### ✅ CEPHFS PERFORMANCE MONITORING ###
     def get_filesystem_performance(self, ssh_client):
         """Retrieve CephFS performance metrics."""
-        return self.run_ceph_command(ssh_client, "ceph fs perf stats -f json-pretty")
+        result = self.run_ceph_command(ssh_client, "ceph fs perf stats -f json")
+        return _projected(result, ClientPerf.list_from_json)
 
     def get_mds_memory_usage(self, ssh_client):
-        """Retrieve memory usage of MDS nodes."""
-        return self.run_ceph_command(ssh_client, "ceph tell mds.* heap stats")
+        """Retrieve memory usage of MDS nodes. Like every ``ceph tell``, always over SSH."""
+        result = self.run_ceph_command(ssh_client, "ceph tell mds.* perf dump mds_mem -f json")
+        return _projected(result, MdsMemory.list_from_tell)
 
     def get_cephfs_metadata_pool_usage(self, ssh_client, fs_name=""):
         """Get metadata pool usage for a given CephFS."""
-        command = f"ceph df | grep {fs_name}" if fs_name else "ceph df"
-        return self.run_ceph_command(ssh_client, command)
\ No newline at end of file
+        result = self.run_ceph_command(ssh_client, "ceph df -f json")
+        return _projected(result, lambda data: Usage.from_json(data, pool_filter=fs_name))
+
+
+def _decode_output(stdout):
+    output = stdout.decode()
+    try:
+        return json.loads(output)  # Convert to dictionary if it's valid JSON
+    except json.JSONDecodeError:
+        return output  # Keep it as a string if it's not JSON
+
+
+def _projected(result, project):
+    """``result`` with its output replaced by the compact form of ``project(output)``.
+
+    Output that does not have the expected shape (another ceph release, an
+    error message) is passed on untouched.
+    """
+    if "output" not in result:
+        return result
+    try:
+        output = compact(project(result["output"]))
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        print(f"Not projecting output: {e!r}")
+        return result
+    return {**result, "output": output}
+
+
+# Shared by the CephViz agent and the answer cache, which must not have to
+# import the agent (and its LLM) just to look at the clusters
+ceph_ops = CephOperations()
+fanout_executor = ThreadPoolExecutor(
+    max_workers=FANOUT_WORKERS, thread_name_prefix="cephviz-fanout"
+)
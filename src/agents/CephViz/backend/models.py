@@ -0,0 +1,527 @@
+"""Compact typed views of ``ceph ... -f json`` output.
+
+The raw JSON of most ceph commands is large and mostly irrelevant to the
+questions the agents answer. Each model keeps the fields a tool needs,
+``from_json`` builds it from the decoded command output and :func:`compact`
+turns it into plain dicts and lists, without empty fields, for the agent.
+"""
+
+import json
+import re
+from dataclasses import dataclass, field, fields, is_dataclass
+
+# Detail lines kept per health check
+MAX_HEALTH_DETAIL = 5
+
+# PG states that need no attention (scrubs and snap trimming run on healthy PGs)
+_HEALTHY_PG_STATES = {"active", "clean", "scrubbing", "deep", "snaptrim", "snaptrim_wait"}
+_TELL_TARGET = re.compile(r"^([\w.:-]+):[ \t]*", re.M)
+
+
+def compact(value):
+    """Plain data of a model (or list/dict of them), leaving out empty fields."""
+    if is_dataclass(value):
+        return {
+            f.name: compact(v)
+            for f in fields(value)
+            if (v := getattr(value, f.name)) not in (None, "", [], {})
+        }
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: compact(item) for key, item in value.items()}
+    return value
+
+
+def split_tell_output(output):
+    """Replies of ``ceph tell <type>.* ... -f json`` by daemon.
+
+    With a wildcard the CLI prints one ``<daemon>: <json>`` line per daemon,
+    which is not a JSON document itself. A daemon that printed nothing maps to
+    None. A single decoded reply is returned under the empty name. Raises
+    ValueError for a reply that is not JSON, so the caller can keep the raw
+    output rather than lose it.
+    """
+    if not isinstance(output, str):
+        return {"": output}
+    decoder = json.JSONDecoder()
+    replies = {}
+    pos = 0
+    while match := _TELL_TARGET.search(output, pos):
+        pos = match.end()
+        if pos == len(output) or output[pos] in "\r\n":
+            replies[match[1]] = None
+            continue
+        try:
+            replies[match[1]], pos = decoder.raw_decode(output, pos)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Reply of {match[1]} is not JSON: {e}") from e
+    if not replies and output.strip():
+        raise ValueError("No daemon replies in the tell output")
+    return replies
+
+
+@dataclass(slots=True)
+class HealthCheck:
+    name: str
+    severity: str
+    message: str
+    detail: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Health:
+    status: str
+    checks: list[HealthCheck] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        """``ceph health -f json`` or ``ceph health detail -f json``."""
+        return cls(
+            status=data["status"],
+            checks=[
+                HealthCheck(
+                    name=name,
+                    severity=check.get("severity", ""),
+                    message=check.get("summary", {}).get("message", ""),
+                    detail=[d["message"] for d in check.get("detail", [])[:MAX_HEALTH_DETAIL]],
+                )
+                for name, check in data.get("checks", {}).items()
+            ],
+        )
+
+
+@dataclass(slots=True)
+class ClusterStatus:
+    fsid: str
+    health: Health
+    mons: int
+    quorum: list[str]
+    mgr_available: bool
+    mgr_standbys: int
+    osds: int
+    osds_up: int
+    osds_in: int
+    pools: int
+    pgs: int
+    pg_states: dict[str, int]
+    objects: int
+    used_bytes: int
+    avail_bytes: int
+    total_bytes: int
+    mds_up: dict[str, int] = field(default_factory=dict)
+    io: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_json(cls, data):
+        """``ceph status -f json``."""
+        osdmap = data.get("osdmap", {})
+        osdmap = osdmap.get("osdmap", osdmap)  # nested before Nautilus
+        pgmap = data.get("pgmap", {})
+        mgrmap = data.get("mgrmap", {})
+        fsmap = data.get("fsmap", {})
+        return cls(
+            fsid=data["fsid"],
+            health=Health.from_json(data["health"]),
+            mons=data.get("monmap", {}).get("num_mons", len(data.get("quorum_names", []))),
+            quorum=data.get("quorum_names", []),
+            mgr_available=mgrmap.get("available", False),
+            mgr_standbys=mgrmap.get("num_standbys", len(mgrmap.get("standbys", []))),
+            osds=osdmap.get("num_osds", 0),
+            osds_up=osdmap.get("num_up_osds", 0),
+            osds_in=osdmap.get("num_in_osds", 0),
+            pools=pgmap.get("num_pools", 0),
+            pgs=pgmap.get("num_pgs", 0),
+            pg_states={s["state_name"]: s["count"] for s in pgmap.get("pgs_by_state", [])},
+            objects=pgmap.get("num_objects", 0),
+            used_bytes=pgmap.get("bytes_used", 0),
+            avail_bytes=pgmap.get("bytes_avail", 0),
+            total_bytes=pgmap.get("bytes_total", 0),
+            mds_up={"up": fsmap.get("up", 0), "in": fsmap.get("in", 0), "standby": fsmap.get("up:standby", 0)}
+            if fsmap.get("by_rank") or fsmap.get("up:standby")
+            else {},
+            io={
+                key: pgmap[key]
+                for key in ("read_bytes_sec", "write_bytes_sec", "read_op_per_sec", "write_op_per_sec")
+                if pgmap.get(key)
+            },
+        )
+
+
+@dataclass(slots=True)
+class OsdState:
+    id: int
+    host: str
+    state: str
+    kb_used: int
+    kb_available: int
+    read_ops: float = 0
+    write_ops: float = 0
+
+    @classmethod
+    def list_from_json(cls, data):
+        """``ceph osd status -f json``."""
+        return [
+            cls(
+                id=osd["id"],
+                host=osd.get("host name", ""),
+                state=",".join(osd.get("state", [])),
+                kb_used=osd.get("kb used", 0),
+                kb_available=osd.get("kb available", 0),
+                read_ops=osd.get("read ops rate", 0),
+                write_ops=osd.get("write ops rate", 0),
+            )
+            for osd in data["OSDs"]
+        ]
+
+
+@dataclass(slots=True)
+class OsdTreeEntry:
+    id: int
+    name: str
+    host: str
+    status: str
+    device_class: str = ""
+    crush_weight: float = 0
+    reweight: float = 0
+
+    @classmethod
+    def list_from_json(cls, data):
+        """The OSDs of ``ceph osd tree -f json`` with the host they sit under."""
+        hosts = {
+            child: node["name"]
+            for node in data["nodes"]
+            if node.get("type") == "host"
+            for child in node.get("children", [])
+        }
+        return [
+            cls(
+                id=node["id"],
+                name=node["name"],
+                host=hosts.get(node["id"], ""),
+                status=node.get("status", ""),
+                device_class=node.get("device_class", ""),
+                crush_weight=node.get("crush_weight", 0),
+                reweight=node.get("reweight", 0),
+            )
+            for node in data["nodes"] + data.get("stray", [])
+            if node.get("type") == "osd"
+        ]
+
+
+@dataclass(slots=True)
+class OsdUsage:
+    id: int
+    name: str
+    utilization: float
+    kb: int
+    kb_avail: int
+    pgs: int
+    status: str = ""
+    device_class: str = ""
+    var: float = 0
+
+    @classmethod
+    def from_json(cls, node):
+        """One OSD node of ``ceph osd df tree -f json``."""
+        return cls(
+            id=node["id"],
+            name=node["name"],
+            utilization=round(node.get("utilization", 0), 2),
+            kb=node.get("kb", 0),
+            kb_avail=node.get("kb_avail", 0),
+            pgs=node.get("pgs", 0),
+            status=node.get("status", ""),
+            device_class=node.get("device_class", ""),
+            var=round(node.get("var", 0), 2),
+        )
+
+
+@dataclass(slots=True)
+class PgBrief:
+    pgid: str
+    state: str
+    up: list[int] = field(default_factory=list)
+    acting: list[int] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, pg):
+        """One entry of ``ceph pg dump pgs_brief -f json``."""
+        return cls(
+            pgid=pg["pgid"],
+            state=pg["state"],
+            up=pg.get("up", []),
+            acting=pg.get("acting", []),
+        )
+
+    @property
+    def healthy(self):
+        return set(self.state.split("+")) <= _HEALTHY_PG_STATES
+
+
+@dataclass(slots=True)
+class PoolUsage:
+    name: str
+    id: int
+    stored: int
+    used: int
+    objects: int
+    percent_used: float
+    max_avail: int
+
+
+@dataclass(slots=True)
+class Usage:
+    total_bytes: int
+    used_bytes: int
+    avail_bytes: int
+    used_ratio: float
+    pools: list[PoolUsage] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data, pool_filter=""):
+        """``ceph df -f json``, optionally only the pools whose name contains ``pool_filter``."""
+        stats = data["stats"]
+        return cls(
+            total_bytes=stats.get("total_bytes", 0),
+            used_bytes=stats.get("total_used_raw_bytes", stats.get("total_used_bytes", 0)),
+            avail_bytes=stats.get("total_avail_bytes", 0),
+            used_ratio=round(stats.get("total_used_raw_ratio", 0), 4),
+            pools=[
+                PoolUsage(
+                    name=pool["name"],
+                    id=pool["id"],
+                    stored=pool["stats"].get("stored", pool["stats"].get("bytes_used", 0)),
+                    used=pool["stats"].get("bytes_used", 0),
+                    objects=pool["stats"].get("objects", 0),
+                    percent_used=round(pool["stats"].get("percent_used", 0), 4),
+                    max_avail=pool["stats"].get("max_avail", 0),
+                )
+                for pool in data.get("pools", [])
+                if pool_filter in pool["name"]
+            ],
+        )
+
+
+@dataclass(slots=True)
+class Filesystem:
+    name: str
+    metadata_pool: str
+    data_pools: list[str]
+
+    @classmethod
+    def list_from_json(cls, data):
+        """``ceph fs ls -f json``."""
+        return [cls(fs["name"], fs["metadata_pool"], fs.get("data_pools", [])) for fs in data]
+
+
+@dataclass(slots=True)
+class MdsDaemon:
+    name: str
+    state: str
+    rank: int = -1
+
+
+@dataclass(slots=True)
+class FilesystemMap:
+    name: str
+    id: int
+    epoch: int
+    enabled: bool
+    max_mds: int
+    metadata_pool: int
+    data_pools: list[int]
+    session_timeout: int = 0
+    mds: list[MdsDaemon] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        """``ceph fs get <fs> -f json``."""
+        mdsmap = data["mdsmap"]
+        return cls(
+            name=mdsmap["fs_name"],
+            id=data.get("id", 0),
+            epoch=mdsmap.get("epoch", 0),
+            enabled=mdsmap.get("enabled", True),
+            max_mds=mdsmap.get("max_mds", 0),
+            metadata_pool=mdsmap.get("metadata_pool", 0),
+            data_pools=mdsmap.get("data_pools", []),
+            session_timeout=mdsmap.get("session_timeout", 0),
+            mds=[
+                MdsDaemon(info["name"], info.get("state", ""), info.get("rank", -1))
+                for info in mdsmap.get("info", {}).values()
+            ],
+        )
+
+
+@dataclass(slots=True)
+class PoolSpace:
+    name: str
+    used: int
+    avail: int
+    type: str = ""
+
+
+@dataclass(slots=True)
+class VolumeInfo:
+    mon_addrs: list[str]
+    used_size: int
+    data_pools: list[PoolSpace] = field(default_factory=list)
+    metadata_pools: list[PoolSpace] = field(default_factory=list)
+    pending_subvolume_deletions: int = 0
+
+    @classmethod
+    def from_json(cls, data):
+        """``ceph fs volume info <fs> -f json``."""
+        pools = data.get("pools", {})
+        return cls(
+            mon_addrs=data.get("mon_addrs", []),
+            used_size=data.get("used_size", 0),
+            data_pools=[PoolSpace(p["name"], p.get("used", 0), p.get("avail", 0)) for p in pools.get("data", [])],
+            metadata_pools=[
+                PoolSpace(p["name"], p.get("used", 0), p.get("avail", 0)) for p in pools.get("metadata", [])
+            ],
+            pending_subvolume_deletions=data.get("pending_subvolume_deletions", 0),
+        )
+
+
+@dataclass(slots=True)
+class MdsState:
+    name: str
+    state: str
+    rank: int | str = ""
+    rate: float = 0
+    dentries: int = 0
+    inodes: int = 0
+    dirs: int = 0
+    caps: int = 0
+
+
+@dataclass(slots=True)
+class FsStatus:
+    clients: dict[str, int]
+    mds: list[MdsState]
+    pools: list[PoolSpace]
+    versions: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        """``ceph fs status -f json``."""
+        return cls(
+            clients={c["fs"]: c["clients"] for c in data.get("clients", [])},
+            mds=[
+                MdsState(
+                    name=mds["name"],
+                    state=mds.get("state", ""),
+                    rank=mds.get("rank", ""),
+                    rate=mds.get("rate", 0),
+                    dentries=mds.get("dns", 0),
+                    inodes=mds.get("inos", 0),
+                    dirs=mds.get("dirs", 0),
+                    caps=mds.get("caps", 0),
+                )
+                for mds in data.get("mdsmap", [])
+            ],
+            pools=[
+                PoolSpace(p["name"], p.get("used", 0), p.get("avail", 0), p.get("type", ""))
+                for p in data.get("pools", [])
+            ],
+            versions=[v["version"] for v in data.get("mds_version", [])],
+        )
+
+
+@dataclass(slots=True)
+class ClientPerf:
+    fs: str
+    client: str
+    hostname: str
+    mount_point: str
+    counters: dict[str, object]
+
+    @classmethod
+    def list_from_json(cls, data):
+        """``ceph fs perf stats -f json``, one entry per client.
+
+        Latencies (reported as ``[seconds, nanoseconds]``) become milliseconds.
+        """
+        names = data.get("global_counters", [])
+        metrics = data.get("global_metrics", {})
+        metadata = data.get("client_metadata", {})
+        # Before Quincy the metrics were not grouped by filesystem
+        if metrics and not isinstance(next(iter(metrics.values())), dict):
+            metrics, metadata = {"": metrics}, {"": metadata}
+
+        clients = []
+        for fs, fs_metrics in metrics.items():
+            for client, values in fs_metrics.items():
+                meta = metadata.get(fs, {}).get(client, {})
+                counters = {}
+                for name, value in zip(names, values):
+                    if name.endswith("latency") and isinstance(value, list) and len(value) == 2:
+                        value = round(value[0] * 1e3 + value[1] / 1e6, 3)
+                    counters[name] = value
+                clients.append(
+                    cls(fs, client, meta.get("hostname", ""), meta.get("mount_point", ""), counters)
+                )
+        return clients
+
+
+@dataclass(slots=True)
+class FsClient:
+    mds: str
+    id: int
+    hostname: str
+    mount_point: str
+    root: str
+    state: str
+    num_caps: int
+    version: str = ""
+
+    @classmethod
+    def list_from_tell(cls, output):
+        """``ceph tell mds.* session ls -f json``."""
+        clients = []
+        for mds, sessions in split_tell_output(output).items():
+            for session in sessions or []:
+                meta = session.get("client_metadata", {})
+                clients.append(
+                    cls(
+                        mds=mds,
+                        id=session["id"],
+                        hostname=meta.get("hostname", ""),
+                        mount_point=meta.get("mount_point", ""),
+                        root=meta.get("root", ""),
+                        state=session.get("state", ""),
+                        num_caps=session.get("num_caps", 0),
+                        version=meta.get("ceph_version", meta.get("kernel_version", "")),
+                    )
+                )
+        return clients
+
+
+@dataclass(slots=True)
+class MdsMemory:
+    mds: str
+    rss_kb: int
+    heap_kb: int
+    inodes: int
+    dentries: int
+    dirs: int
+    caps: int
+
+    @classmethod
+    def list_from_tell(cls, output):
+        """``ceph tell mds.* perf dump mds_mem -f json``."""
+        return [
+            cls(
+                mds=mds,
+                rss_kb=mem.get("rss", 0),
+                heap_kb=mem.get("heap", 0),
+                inodes=mem.get("ino", 0),
+                dentries=mem.get("dn", 0),
+                dirs=mem.get("dir", 0),
+                caps=mem.get("cap", 0),
+            )
+            for mds, reply in split_tell_output(output).items()
+            if reply and (mem := reply.get("mds_mem"))
+        ]
@@ -1,2 +1,38 @@
+from .cluster_registry import cluster_registry, resolve_credentials
+from .ssh_pool import ssh_sessions
+
 # Global dictionary to store cluster data
-cluster_data = {}
\ No newline at end of file
+cluster_data = {}
+
+
+def warm_from_registry():
+    """Load the clusters of the registry into cluster_data without connecting.
+
+    Their SSH sessions are opened by get_session() the first time a tool needs
+    them, so starting up costs one SQLite read however many clusters there are.
+    """
+    try:
+        records = cluster_registry.all()
+    except Exception as e:
+        print(f"⚠️ Could not read the cluster registry: {e}")
+        return cluster_data
+    for record in records:
+        if record.name in cluster_data:
+            continue
+        password = resolve_credentials(record.credentials_ref)
+        if password is None:
+            print(f"⚠️ No credentials for {record.name} ({record.ip}), reconnect it by hand.")
+            continue
+        ssh_sessions.register(record.ip, record.username, password, port=record.port)
+        cluster_data[record.name] = {"ip": record.ip, "session": None}
+    return cluster_data
+
+
+def get_session(cluster_name):
+    """SSH session of a known cluster, connecting it on first use. None if unknown."""
+    cluster_info = cluster_data.get(cluster_name)
+    if not cluster_info:
+        return None
+    if cluster_info.get("session") is None:
+        cluster_info["session"] = ssh_sessions.connect(cluster_info["ip"])
+    return cluster_info["session"]
@@ -0,0 +1,353 @@
+import os
+import threading
+import time
+import weakref
+
+import paramiko
+from dotenv import load_dotenv
+
+from .streaming import CEPH_STREAM_CHUNK_BYTES, RemoteCommandError
+
+load_dotenv()
+
+SSH_TRANSPORTS_PER_CLUSTER = int(os.getenv("CEPH_SSH_TRANSPORTS_PER_CLUSTER", "2"))
+# OpenSSH allows 10 sessions per connection by default (MaxSessions)
+SSH_CHANNELS_PER_TRANSPORT = int(os.getenv("CEPH_SSH_CHANNELS_PER_TRANSPORT", "4"))
+SSH_KEEPALIVE_SECONDS = int(os.getenv("CEPH_SSH_KEEPALIVE_SECONDS", "30"))
+SSH_TIMEOUT = float(os.getenv("CEPH_SSH_TIMEOUT_SECONDS", "10"))
+SSH_COMMAND_TIMEOUT = float(os.getenv("CEPH_SSH_COMMAND_TIMEOUT_SECONDS", "60"))
+
+# Errors that mean the transport underneath a channel is gone
+_TRANSPORT_ERRORS = (paramiko.SSHException, EOFError, OSError)
+
+
+class _ClusterPool:
+    def __init__(self, host, username, password, port, max_channels):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        # client -> number of channels currently open on its transport
+        self.clients: dict[paramiko.SSHClient, int] = {}
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_channels)
+        self.metrics = {
+            "connects": 0,
+            "reconnects": 0,
+            "commands": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "command_seconds": 0.0,
+        }
+
+
+class SSHSessionManager:
+    """Per-cluster pools of SSH transports shared by every CephViz tool.
+
+    Each command runs on its own channel. Up to ``channels_per_transport``
+    channels are multiplexed over one transport and up to
+    ``transports_per_cluster`` transports are kept per cluster, which also
+    bounds how many commands run against a cluster at once; further callers
+    wait for a free channel. Transports send keep-alives and a dead one is
+    replaced (and the command retried once, if its channel could not be
+    opened) when the cluster's credentials are known. Connecting happens
+    outside the pool's lock, so a slow handshake does not hold up commands
+    on the cluster's other transports.
+    """
+
+    def __init__(
+        self,
+        transports_per_cluster=SSH_TRANSPORTS_PER_CLUSTER,
+        channels_per_transport=SSH_CHANNELS_PER_TRANSPORT,
+        keepalive=SSH_KEEPALIVE_SECONDS,
+        timeout=SSH_TIMEOUT,
+    ):
+        self.transports_per_cluster = transports_per_cluster
+        self.channels_per_transport = channels_per_transport
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._pools: dict[str, _ClusterPool] = {}
+        self._lock = threading.Lock()
+        # SSH clients handed out before the pool existed, mapped to their cluster
+        self._client_hosts = weakref.WeakKeyDictionary()
+
+    def register(self, host, username=None, password=None, port=22, client=None):
+        """Make ``host`` known to the pool, optionally seeding it with a connected client.
+
+        Without credentials the pool can only use the seeded client and cannot
+        reconnect or open extra transports.
+        """
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                max_transports = self.transports_per_cluster if password else 1
+                pool = self._pools[host] = _ClusterPool(
+                    host,
+                    username,
+                    password,
+                    port,
+                    max_transports * self.channels_per_transport,
+                )
+            elif password and not pool.password:
+                # Credentials arrived for an adopted client, allow more transports.
+                # Holders of the old semaphore release that one, so swapping is safe.
+                pool.username, pool.password, pool.port = username, password, port
+                pool.slots = threading.BoundedSemaphore(
+                    self.transports_per_cluster * self.channels_per_transport
+                )
+
+        if client is not None:
+            self._client_hosts[client] = host
+            transport = client.get_transport()
+            if transport and transport.is_active():
+                transport.set_keepalive(self.keepalive)
+                with pool.lock:
+                    pool.clients.setdefault(client, 0)
+        return host
+
+    def __contains__(self, host):
+        return host in self._pools
+
+    def adopt(self, client):
+        """Cluster key of an already connected ``paramiko.SSHClient``, registering it if new."""
+        host = self._client_hosts.get(client)
+        if host is None:
+            transport = client.get_transport()
+            if transport is None:
+                raise paramiko.SSHException("SSH client is not connected")
+            host = self.register(transport.getpeername()[0], client=client)
+        return host
+
+    def connect(self, host):
+        """A live client of the registered ``host``, connecting one if the pool has none."""
+        pool = self._pools.get(host)
+        if pool is None:
+            raise KeyError(f"Cluster {host} is not registered")
+        with pool.lock:
+            client = next((c for c in pool.clients if _is_active(c)), None)
+        if client is not None:
+            return client
+        if not pool.password:
+            raise paramiko.SSHException(
+                f"No live SSH transport to {host} and no credentials to reconnect"
+            )
+        client = self._connect(pool)
+        with pool.lock:
+            live = next((c for c in pool.clients if _is_active(c)), None)
+            if live is None:
+                pool.clients[client] = 0
+        if live is not None:
+            # Another caller connected in the meantime, use theirs
+            client.close()
+            return live
+        self._client_hosts[client] = host
+        return client
+
+    def _connect(self, pool):
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            pool.host,
+            port=pool.port,
+            username=pool.username,
+            password=pool.password,
+            timeout=self.timeout,
+        )
+        client.get_transport().set_keepalive(self.keepalive)
+        with pool.lock:
+            pool.metrics["connects"] += 1
+        return client
+
+    def _checkout(self, pool):
+        """Reserve a channel on the least busy live transport, opening one if needed."""
+        with pool.lock:
+            for client in [c for c in pool.clients if not _is_active(c)]:
+                self._discard(pool, client)
+            client = self._least_busy(pool)
+            if client is not None:
+                pool.clients[client] += 1
+                return client
+        if not pool.password:
+            raise paramiko.SSHException(
+                f"No live SSH transport to {pool.host} and no credentials to reconnect"
+            )
+
+        new_client = self._connect(pool)
+        with pool.lock:
+            # A channel may have freed up, or another caller connected, meanwhile
+            client = self._least_busy(pool)
+            if client is None:
+                client = new_client
+                pool.clients[client] = 0
+            pool.clients[client] += 1
+        if client is not new_client:
+            new_client.close()
+        return client
+
+    def _least_busy(self, pool):
+        """Live transport with the fewest open channels and room for another, or None."""
+        candidates = [
+            client
+            for client, channels in pool.clients.items()
+            if channels < self.channels_per_transport and _is_active(client)
+        ]
+        return min(candidates, key=pool.clients.get) if candidates else None
+
+    def _checkin(self, pool, client):
+        with pool.lock:
+            if client in pool.clients:
+                pool.clients[client] -= 1
+
+    def _discard(self, pool, client):
+        pool.clients.pop(client, None)
+        client.close()
+        pool.metrics["reconnects"] += 1
+
+    def exec_command(self, host, command, timeout=SSH_COMMAND_TIMEOUT):
+        """Run ``command`` on ``host``. Returns ``(exit_status, stdout, stderr)`` as bytes."""
+        pool = self._pools.get(host)
+        if pool is None:
+            raise KeyError(f"Cluster {host} is not registered")
+
+        with pool.slots:
+            with pool.lock:
+                pool.metrics["in_flight"] += 1
+            started = time.monotonic()
+            failed = False
+            try:
+                for attempt in range(2):
+                    client = self._checkout(pool)
+                    try:
+                        channel = client.get_transport().open_session(timeout=SSH_TIMEOUT)
+                    except _TRANSPORT_ERRORS:
+                        self._checkin(pool, client)
+                        if _is_active(client) or attempt or not pool.password:
+                            raise
+                        # The socket died while idle, replace it and try once more.
+                        # Once the command was sent it is not retried, it may
+                        # have run already.
+                        with pool.lock:
+                            self._discard(pool, client)
+                        continue
+                    try:
+                        return _run_on_channel(channel, command, timeout)
+                    finally:
+                        self._checkin(pool, client)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                with pool.lock:
+                    pool.metrics["in_flight"] -= 1
+                    pool.metrics["commands"] += 1
+                    pool.metrics["failures"] += failed
+                    pool.metrics["command_seconds"] += time.monotonic() - started
+
+    def stream_command(
+        self, host, command, timeout=SSH_COMMAND_TIMEOUT, chunk_size=CEPH_STREAM_CHUNK_BYTES
+    ):
+        """Run ``command`` on ``host`` and yield its stdout in chunks as it arrives.
+
+        The channel stays checked out while the caller iterates; closing the
+        generator early closes the channel, which ends the remote command.
+        ``timeout`` bounds the wait for each chunk rather than the whole
+        command. A non-zero exit raises :class:`RemoteCommandError` after the
+        last chunk. Unlike exec_command nothing is retried once output flowed.
+        """
+        pool = self._pools.get(host)
+        if pool is None:
+            raise KeyError(f"Cluster {host} is not registered")
+
+        with pool.slots:
+            with pool.lock:
+                pool.metrics["in_flight"] += 1
+            started = time.monotonic()
+            failed = False
+            client = channel = None
+            try:
+                for attempt in range(2):
+                    client = self._checkout(pool)
+                    try:
+                        channel = client.get_transport().open_session(timeout=SSH_TIMEOUT)
+                        break
+                    except _TRANSPORT_ERRORS:
+                        self._checkin(pool, client)
+                        dead, client = client, None
+                        if _is_active(dead) or attempt or not pool.password:
+                            raise
+                        # The socket died while idle, replace it and try once more
+                        with pool.lock:
+                            self._discard(pool, dead)
+                channel.settimeout(timeout)
+                channel.exec_command(command)
+                stderr = bytearray()
+                while data := channel.recv(chunk_size):
+                    # ceph says little on stderr, draining it keeps its window open
+                    while channel.recv_stderr_ready():
+                        stderr += channel.recv_stderr(chunk_size)
+                    yield data
+                while data := channel.recv_stderr(chunk_size):
+                    stderr += data
+                exit_status = channel.recv_exit_status()
+                if exit_status:
+                    raise RemoteCommandError(command, exit_status, bytes(stderr))
+            except GeneratorExit:
+                raise
+            except Exception:
+                failed = True
+                raise
+            finally:
+                if channel is not None:
+                    channel.close()
+                if client is not None:
+                    self._checkin(pool, client)
+                with pool.lock:
+                    pool.metrics["in_flight"] -= 1
+                    pool.metrics["commands"] += 1
+                    pool.metrics["failures"] += failed
+                    pool.metrics["command_seconds"] += time.monotonic() - started
+
+    def metrics(self, host=None):
+        """Connection and command counters, for one cluster or all of them."""
+        hosts = [host] if host else list(self._pools)
+        snapshot = {}
+        for name in hosts:
+            pool = self._pools.get(name)
+            if pool is None:
+                continue
+            with pool.lock:
+                snapshot[name] = dict(
+                    pool.metrics,
+                    transports=len(pool.clients),
+                    open_channels=sum(pool.clients.values()),
+                )
+        return snapshot if host is None else snapshot.get(host, {})
+
+    def close(self, host=None):
+        with self._lock:
+            hosts = [host] if host else list(self._pools)
+            pools = [self._pools.pop(name) for name in hosts if name in self._pools]
+        for pool in pools:
+            with pool.lock:
+                for client in pool.clients:
+                    client.close()
+                pool.clients.clear()
+
+
+def _is_active(client):
+    transport = client.get_transport()
+    return bool(transport and transport.is_active())
+
+
+def _run_on_channel(channel, command, timeout):
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(command)
+        stdout = channel.makefile("rb").read()
+        stderr = channel.makefile_stderr("rb").read()
+        return channel.recv_exit_status(), stdout, stderr
+    finally:
+        channel.close()
+
+
+ssh_sessions = SSHSessionManager()
@@ -0,0 +1,178 @@
+"""Incremental decoding of large ``ceph ... -f json`` documents.
+
+Commands like ``ceph pg dump`` or ``ceph osd df tree`` print a single JSON
+document of many megabytes on big clusters. :func:`iter_json_items` yields the
+items of one array inside that document as each one completes, so only the
+item being decoded is held in memory, and the caller can stop iterating (which
+closes the remote channel) as soon as it has what it needs.
+"""
+
+import codecs
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CEPH_STREAM_MAX_BYTES = int(os.getenv("CEPH_STREAM_MAX_BYTES", str(256 * 1024 * 1024)))
+CEPH_STREAM_CHUNK_BYTES = int(os.getenv("CEPH_STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+_STRUCTURAL = re.compile(r'[\[\]{}",]')
+_NESTING = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r"[\s,\]]")
+_SEPARATORS = re.compile(r"[\s,]*")
+_DECODER = json.JSONDecoder()
+
+
+class OutputTooLarge(Exception):
+    """A streamed command printed more than it is allowed to."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        super().__init__(f"Output exceeded {max_bytes} bytes, stopped reading")
+
+
+class RemoteCommandError(Exception):
+    """A streamed command that exited with a non-zero status."""
+
+    def __init__(self, command, exit_status, stderr=b""):
+        self.command = command
+        self.exit_status = exit_status
+        self.stderr = stderr
+        super().__init__(
+            f"{command!r} exited with {exit_status}: {stderr.decode(errors='replace').strip()}"
+        )
+
+
+def iter_json_items(chunks, path=(), max_bytes=CEPH_STREAM_MAX_BYTES):
+    """Yield the items of the array at ``path`` of the JSON document in ``chunks``.
+
+    ``path`` is the sequence of object keys leading to the array, e.g.
+    ``("pg_stats",)`` for ``ceph pg dump pgs_brief -f json``; ``()`` is a
+    top-level array. Reading stops once that array is complete, the rest of the
+    document is never fetched. More than ``max_bytes`` of input raises
+    :class:`OutputTooLarge`. ``chunks`` (an iterable of bytes) is closed when
+    the generator finishes or is closed.
+    """
+    path = list(path)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    stack = []  # [kind, key] of the containers enclosing the current position
+    expect_key = False
+    in_items = False
+    buf, pos = "", 0
+    item_start = scan = None  # bounds of the item being read
+    depth = 0
+    received = 0
+    try:
+        for chunk in chunks:
+            received += len(chunk)
+            if max_bytes and received > max_bytes:
+                raise OutputTooLarge(max_bytes)
+
+            # Only the unfinished item (or string) is kept from the previous chunk
+            keep = pos if item_start is None else item_start
+            buf = buf[keep:] + decoder.decode(chunk)
+            pos -= keep
+            if item_start is not None:
+                item_start, scan = 0, scan - keep
+
+            while not in_items:
+                match = _STRUCTURAL.search(buf, pos)
+                if match is None:
+                    pos = len(buf)
+                    break
+                char, at = match.group(), match.start()
+                if char == '"':
+                    end = _string_end(buf, at + 1)
+                    if end is None:
+                        pos = at  # wait for the rest of the string
+                        break
+                    if expect_key:
+                        stack[-1][1] = json.loads(buf[at:end])
+                        expect_key = False
+                    pos = end
+                    continue
+                pos = at + 1
+                if char == "[" and _at_path(stack, path):
+                    in_items = True
+                elif char in "{[":
+                    stack.append([char, None])
+                    expect_key = char == "{"
+                elif char in "}]":
+                    if stack:
+                        stack.pop()
+                    expect_key = False
+                else:  # ","
+                    expect_key = bool(stack) and stack[-1][0] == "{"
+
+            while in_items:
+                if item_start is None:
+                    pos = _SEPARATORS.match(buf, pos).end()
+                    if pos >= len(buf):
+                        break
+                    if buf[pos] == "]":
+                        return
+                    item_start = scan = pos
+                    depth = 0
+                    if buf[pos] in "{[":
+                        # Most items are complete in the buffer, let the C decoder find their end
+                        try:
+                            item, pos = _DECODER.raw_decode(buf, pos)
+                        except json.JSONDecodeError:
+                            pass
+                        else:
+                            item_start = None
+                            yield item
+                            continue
+
+                end = None
+                if buf[item_start] in "{[":
+                    # Straddles the chunk boundary, track nesting until it closes
+                    while match := _NESTING.search(buf, scan):
+                        char, at = match.group(), match.start()
+                        if char == '"':
+                            string_end = _string_end(buf, at + 1)
+                            if string_end is None:
+                                scan = at
+                                break
+                            scan = string_end
+                            continue
+                        scan = at + 1
+                        depth += 1 if char in "{[" else -1
+                        if depth == 0:
+                            end = scan
+                            break
+                    else:
+                        scan = len(buf)
+                elif buf[item_start] == '"':
+                    end = _string_end(buf, item_start + 1)
+                else:
+                    match = _SCALAR_END.search(buf, item_start)
+                    end = match.start() if match else None
+
+                if end is None:
+                    break  # the item continues in the next chunk
+                yield json.loads(buf[item_start:end])
+                item_start, pos = None, end
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _at_path(stack, path):
+    return len(stack) == len(path) and all(
+        kind == "{" and key == name for (kind, key), name in zip(stack, path)
+    )
+
+
+def _string_end(buf, pos):
+    """Index just past the closing quote of the string whose content starts at ``pos``."""
+    while match := _STRING_END.search(buf, pos):
+        if match.group() == '"':
+            return match.end()
+        pos = match.end() + 1  # skip the escaped character
+    return None
@@ -0,0 +1,411 @@
+"""How ``ceph ...`` commands reach a cluster.
+
+Every transport answers the same ``ceph`` CLI strings the tools already use
+and returns what the CLI would have printed:
+
+* :class:`SSHTransport` runs the ``ceph`` CLI on the cluster over the pooled
+  SSH transports. It can run anything, but every command pays for a remote
+  Python interpreter start (~300 ms).
+* :class:`MgrRestTransport` posts mon commands to the mgr ``restful`` module.
+* :class:`RadosTransport` sends mon and mgr commands through librados
+  (``python3-rados``).
+* :class:`FakeTransport` answers from a dict, for tests.
+
+The native transports translate the command line into the command's JSON form
+(``ceph osd tree -f json`` -> ``{"prefix": "osd tree", "format": "json"}``).
+:class:`FallbackTransport` sends whatever they cannot translate (pipes,
+``ceph tell``, unknown commands) or fail to run over SSH instead.
+"""
+
+import json
+import os
+import shlex
+
+import requests
+from dotenv import load_dotenv
+
+from .batch import CommandResult, build_batch_script, new_marker, parse_batch_output
+from .command_cache import normalize_command
+from .ssh_pool import SSH_COMMAND_TIMEOUT, ssh_sessions
+from .streaming import RemoteCommandError
+
+try:
+    import rados
+except ImportError:  # python3-rados is only there on hosts with ceph packages
+    rados = None
+
+load_dotenv()
+
+# ssh, rest or rados; the native ones fall back to SSH
+CEPH_TRANSPORT = (os.getenv("CEPH_TRANSPORT") or "ssh").lower()
+CEPH_RESTFUL_PORT = int(os.getenv("CEPH_RESTFUL_PORT", "8003"))
+CEPH_RESTFUL_USER = os.getenv("CEPH_RESTFUL_USER", "admin")
+CEPH_RESTFUL_KEY = os.getenv("CEPH_RESTFUL_KEY", "")
+# The restful module serves a self-signed certificate unless one is configured
+CEPH_RESTFUL_VERIFY_TLS = os.getenv("CEPH_RESTFUL_VERIFY_TLS", "false").lower() == "true"
+CEPH_RADOS_NAME = os.getenv("CEPH_RADOS_NAME", "client.admin")
+CEPH_RADOS_KEYRING = os.getenv("CEPH_RADOS_KEYRING", "/etc/ceph/ceph.client.admin.keyring")
+
+# Positional arguments of the commands the tools send, by prefix
+COMMAND_ARGS = {
+    "status": [],
+    "health": ["detail"],
+    "df": ["detail"],
+    "osd tree": [],
+    "osd df": [],
+    "osd status": ["bucket"],
+    "osd dump": [],
+    "mon dump": [],
+    "mgr dump": [],
+    "fs ls": [],
+    "fs dump": ["epoch"],
+    "fs get": ["fs_name"],
+    "fs status": ["fs"],
+    "fs perf stats": [],
+    "fs volume ls": [],
+    "fs volume info": ["vol_name"],
+    "config get": ["who", "key"],
+    "config set": ["who", "name", "value"],
+    "orch ls": [],
+    "orch host ls": [],
+}
+# Served by mgr modules rather than the mons
+MGR_PREFIXES = ("osd status", "fs status", "fs perf stats", "fs volume", "orch")
+_COMMAND_PREFIXES = sorted(COMMAND_ARGS, key=len, reverse=True)
+_SHELL_CHARS = set("|&;<>`$()")
+
+
+def to_mon_command(command):
+    """JSON form of a ``ceph`` command line, or None when it has none.
+
+    Only plain invocations of the commands in :data:`COMMAND_ARGS` translate;
+    pipes, redirections, ``ceph tell`` and friends stay shell-only.
+    """
+    if _SHELL_CHARS & set(command):
+        return None
+    try:
+        words = shlex.split(normalize_command(command))
+    except ValueError:
+        return None
+    if not words or words[0] != "ceph":
+        return None
+
+    args, fmt = [], None
+    words = iter(words[1:])
+    for word in words:
+        if word in ("-f", "--format"):
+            fmt = next(words, None)
+        elif word.startswith("--format="):
+            fmt = word.split("=", 1)[1]
+        elif word == "-s":
+            args.append("status")
+        elif word.startswith("-"):
+            return None
+        else:
+            args.append(word)
+
+    line = " ".join(args)
+    for prefix in _COMMAND_PREFIXES:
+        if line == prefix or line.startswith(prefix + " "):
+            break
+    else:
+        return None
+    values = args[len(prefix.split()) :]
+    names = COMMAND_ARGS[prefix]
+    if len(values) > len(names):
+        return None
+
+    mon_command = {"prefix": prefix, **dict(zip(names, values))}
+    if fmt:
+        mon_command["format"] = fmt
+    return mon_command
+
+
+def is_mgr_command(mon_command):
+    prefix = mon_command["prefix"]
+    return any(prefix == p or prefix.startswith(p + " ") for p in MGR_PREFIXES)
+
+
+class CephTransport:
+    """Runs ``ceph`` command lines against one cluster."""
+
+    name = "base"
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        """Returns a :class:`CommandResult` shaped like the CLI's output."""
+        raise NotImplementedError
+
+    def run_batch(self, commands, timeout=SSH_COMMAND_TIMEOUT):
+        return [self.run(command, timeout) for command in commands]
+
+    def supports(self, command):
+        return True
+
+    def stream(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        """Yields the stdout of ``command`` in chunks as it arrives.
+
+        Transports that only get whole replies yield it as one chunk. A
+        non-zero exit raises :class:`RemoteCommandError`.
+        """
+        result = self.run(command, timeout)
+        if result.exit_status:
+            raise RemoteCommandError(command, result.exit_status, result.stderr)
+        yield result.stdout
+
+    def execute_command(self, command):
+        """``(succeeded, output or error)``, like the perf agent's ``CephAdminClient``."""
+        result = self.run(command)
+        if result.exit_status:
+            return False, result.stderr.decode()
+        return True, result.stdout.decode()
+
+    def close(self):
+        pass
+
+
+class SSHTransport(CephTransport):
+    name = "ssh"
+
+    def __init__(self, host, sessions=ssh_sessions):
+        self.host = host
+        self.sessions = sessions
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        exit_status, stdout, stderr = self.sessions.exec_command(self.host, command, timeout)
+        return CommandResult(stdout, stderr, exit_status)
+
+    def run_batch(self, commands, timeout=SSH_COMMAND_TIMEOUT):
+        """All ``commands`` concurrently in one remote shell, over one channel."""
+        if len(commands) == 1:
+            return [self.run(commands[0], timeout)]
+        marker = new_marker()
+        _, stdout, _ = self.sessions.exec_command(
+            self.host, build_batch_script(commands, marker), timeout
+        )
+        return parse_batch_output(stdout, marker, len(commands))
+
+    def stream(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        return self.sessions.stream_command(self.host, command, timeout)
+
+
+class ClientTransport(CephTransport):
+    """Wraps anything with ``execute_command(command) -> (ok, output)``."""
+
+    name = "client"
+
+    def __init__(self, client):
+        self.client = client
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        ok, output = self.client.execute_command(command=command)[:2]
+        output = str(output).encode()
+        return CommandResult(output, b"", 0) if ok else CommandResult(b"", output, 1)
+
+    def close(self):
+        self.client.close()
+
+
+class MgrRestTransport(CephTransport):
+    """Mon commands through the mgr ``restful`` module (``ceph mgr module enable restful``).
+
+    ``resolve_mgr`` returns the active mgr's address; it is asked again when
+    the cached one stops answering, since that is how a mgr failover shows up.
+    """
+
+    name = "rest"
+
+    def __init__(
+        self,
+        resolve_mgr,
+        port=CEPH_RESTFUL_PORT,
+        user=CEPH_RESTFUL_USER,
+        key=CEPH_RESTFUL_KEY,
+        verify=CEPH_RESTFUL_VERIFY_TLS,
+        mgr=None,
+    ):
+        self.resolve_mgr = resolve_mgr
+        self.port = port
+        # Last known active mgr, if any, saves a lookup on the first command
+        self._mgr = mgr
+        self._session = requests.Session()
+        self._session.auth = (user, key)
+        self._session.verify = verify
+
+    def supports(self, command):
+        mon_command = to_mon_command(command)
+        return mon_command is not None and not is_mgr_command(mon_command)
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        mon_command = to_mon_command(command)
+        if mon_command is None or is_mgr_command(mon_command):
+            raise ValueError(f"{command!r} cannot be sent as a mon command")
+
+        for attempt in range(2):
+            if self._mgr is None:
+                self._mgr = self.resolve_mgr()
+            try:
+                response = self._session.post(
+                    f"https://{self._mgr}:{self.port}/request",
+                    params={"wait": 1},
+                    json=mon_command,
+                    timeout=timeout,
+                )
+                break
+            except requests.ConnectionError:
+                # Probably a mgr failover, look up the active mgr once more
+                self._mgr = None
+                if attempt:
+                    raise
+        response.raise_for_status()
+
+        body = response.json()
+        if body.get("failed"):
+            failed = body["failed"][0]
+            return CommandResult(b"", failed.get("outs", "").encode(), 1)
+        finished = body.get("finished") or [{}]
+        return CommandResult(
+            finished[0].get("outb", "").encode(), finished[0].get("outs", "").encode(), 0
+        )
+
+    def close(self):
+        self._session.close()
+
+
+class RadosTransport(CephTransport):
+    """Mon and mgr commands through librados, connected to the cluster's mons."""
+
+    name = "rados"
+
+    def __init__(self, mon_host, name=CEPH_RADOS_NAME, keyring=CEPH_RADOS_KEYRING):
+        if rados is None:
+            raise RuntimeError("python3-rados is not installed")
+        self.mon_host = mon_host
+        self._cluster = rados.Rados(
+            name=name, conf={"mon_host": mon_host, "keyring": keyring}
+        )
+        self._cluster.connect(timeout=10)
+
+    def supports(self, command):
+        return to_mon_command(command) is not None
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        mon_command = to_mon_command(command)
+        if mon_command is None:
+            raise ValueError(f"{command!r} cannot be sent as a mon command")
+        send = self._cluster.mgr_command if is_mgr_command(mon_command) else self._cluster.mon_command
+        ret, outbuf, outs = send(json.dumps(mon_command), b"", timeout=int(timeout))
+        # Like the CLI: the result on stdout, the status line on stderr
+        return CommandResult(outbuf, outs.encode(), abs(ret))
+
+    def close(self):
+        self._cluster.shutdown()
+
+
+class FakeTransport(CephTransport):
+    """Answers from ``responses``: command -> stdout (str, bytes, dict/list as JSON),
+    ``(exit_status, stdout, stderr)`` or a callable taking the command.
+
+    Commands are matched after :func:`normalize_command`; every command run is
+    appended to ``calls``.
+    """
+
+    name = "fake"
+
+    def __init__(self, responses=None):
+        self.responses = {normalize_command(k): v for k, v in (responses or {}).items()}
+        self.calls = []
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        self.calls.append(command)
+        response = self.responses.get(normalize_command(command))
+        if callable(response):
+            response = response(command)
+        if response is None:
+            return CommandResult(b"", f"unknown command: {command}".encode(), 22)
+        if isinstance(response, tuple):
+            exit_status, stdout, stderr = response
+            return CommandResult(_to_bytes(stdout), _to_bytes(stderr), exit_status)
+        return CommandResult(_to_bytes(response), b"", 0)
+
+
+class FallbackTransport(CephTransport):
+    """Uses ``primary`` for what it supports and ``fallback`` for the rest,
+    or when ``primary`` fails to deliver a command."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def run(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        if self.primary.supports(command):
+            try:
+                return self.primary.run(command, timeout)
+            except Exception as e:
+                print(f"⚠️ {self.primary.name} transport failed for {command!r}: {e}")
+        return self.fallback.run(command, timeout)
+
+    def run_batch(self, commands, timeout=SSH_COMMAND_TIMEOUT):
+        results = [None] * len(commands)
+        rest = []
+        for i, command in enumerate(commands):
+            if self.primary.supports(command):
+                try:
+                    results[i] = self.primary.run(command, timeout)
+                    continue
+                except Exception as e:
+                    print(f"⚠️ {self.primary.name} transport failed for {command!r}: {e}")
+            rest.append(i)
+        if rest:
+            batch = self.fallback.run_batch([commands[i] for i in rest], timeout)
+            for i, result in zip(rest, batch):
+                results[i] = result
+        return results
+
+    def stream(self, command, timeout=SSH_COMMAND_TIMEOUT):
+        if self.primary.supports(command):
+            # The native transports answer in one piece anyway, keep run()'s fallback
+            return CephTransport.stream(self, command, timeout)
+        return self.fallback.stream(command, timeout)
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+def make_transport(host, fallback, kind=CEPH_TRANSPORT, mgr=None, resolve_mgr=None):
+    """Transport of ``kind`` for the cluster at ``host``, falling back to ``fallback``.
+
+    ``mgr`` is the last known active mgr and ``resolve_mgr`` looks up the
+    current one (by default through ``fallback``). A native transport that
+    cannot be set up (missing module, unreachable mons) leaves just ``fallback``.
+    """
+    try:
+        if kind == "rest":
+            native = MgrRestTransport(resolve_mgr or (lambda: active_mgr(fallback)), mgr=mgr)
+        elif kind == "rados":
+            native = RadosTransport(host)
+        else:
+            return fallback
+    except Exception as e:
+        print(f"⚠️ {kind} transport unavailable for {host}, using {fallback.name}: {e}")
+        return fallback
+    return FallbackTransport(native, fallback)
+
+
+def active_mgr(transport):
+    result = transport.run("ceph mgr dump -f json")
+    if result.exit_status:
+        raise RuntimeError(f"ceph mgr dump failed: {result.stderr.decode().strip()}")
+    active_addr = json.loads(result.stdout).get("active_addr")
+    if not active_addr:
+        raise RuntimeError("No active mgr found")
+    return active_addr.split(":")[0]
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value).encode()
+    return str(value).encode()
@@ -11,14 +11,17 @@ import agent
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from backend import session_manager
+from backend.cluster_registry import cluster_registry, forget_credentials, store_credentials
+from backend.ssh_pool import ssh_sessions
 
 # 🎨 Streamlit Page Configuration
 st.set_page_config(page_title="Ceph AI Bot", page_icon="🤖", layout="wide")
 
 # 🎯 Initialize Session State
 if "cluster_data" not in st.session_state:
-    st.session_state.cluster_data = {}  
-    session_manager.cluster_data = {}
+    # Clusters from before the restart, connected lazily on first use
+    st.session_state.cluster_data = session_manager.warm_from_registry()
+    session_manager.cluster_data = st.session_state.cluster_data
 
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
@@ -89,9 +92,16 @@ with st.sidebar:
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             try:
                 ssh.connect(ip, username=ssh_username, password=ssh_password, timeout=5)
+                ssh_sessions.register(ip, ssh_username, ssh_password, client=ssh)
                 cluster_name = f"Cluster {len(st.session_state.cluster_data) + 1}"
                 st.session_state.cluster_data[cluster_name] = {"ip": ip, "session": ssh}
                 session_manager.cluster_data = st.session_state.cluster_data
+                cluster_registry.add(
+                    cluster_name,
+                    ip,
+                    ssh_username,
+                    store_credentials(ip, ssh_username, ssh_password),
+                )
             except Exception as e:
                 failed_ips[ip] = str(e)
 
@@ -117,7 +127,11 @@ with st.sidebar:
                 session = st.session_state.cluster_data[cluster].get("session")
                 if session:
                     session.close()
+                ssh_sessions.close(st.session_state.cluster_data[cluster]["ip"])
                 del st.session_state.cluster_data[cluster]
+                record = cluster_registry.remove(cluster)
+                if record:
+                    forget_credentials(record.credentials_ref)
             st.success("✅ Disconnected successfully!")
             # st.rerun()
         
@@ -172,7 +186,13 @@ if prompt:
     
     # Processing response
     with st.spinner("🤔 Thinking..."):
-        response = agent.process_query(prompt, cluster_data=st.session_state.cluster_data)
+        # Show each cluster's answer as it arrives; the last item is the reply
+        cluster_replies = []
+        placeholder = st.empty()
+        for response in agent.stream_query(prompt, cluster_data=st.session_state.cluster_data):
+            if isinstance(response, dict) and "cluster" in response:
+                cluster_replies.append(f"**{response['cluster']}**: {response['output']}")
+                placeholder.markdown("\n\n".join(cluster_replies))
         if isinstance(response, str):
             try:
                 response = json.loads(response)  # Convert string to JSON if possible
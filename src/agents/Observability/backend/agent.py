@@ -4,7 +4,7 @@ from langchain.memory import ConversationBufferMemory
 from langchain.tools import Tool
 from langchain_community.llms import Ollama
 
-from .connection import get_db_string
+from .connection import get_db_engine
 from .metrics_operations import (
     check_degraded_pgs,
     check_recent_osd_crashes,
@@ -13,6 +13,7 @@ from .metrics_operations import (
     get_diskoccupation,
     get_high_latency_osds,
 )
+from .metrics_query import WINDOW_HELP
 
 # Ignore get_cluster_health (this is for CephViz tool)
 # Define Tools
@@ -20,32 +21,32 @@ tools = [
     Tool(
         name="Get disk occupation",
         func=get_diskoccupation,
-        description="Fetches the disk occupation per node.",
+        description="Fetches the disk occupation per node. " + WINDOW_HELP,
     ),
     Tool(
         name="Check degraded PGs",
         func=check_degraded_pgs,
-        description="Checks degraded PGs.",
+        description="Checks degraded PGs. " + WINDOW_HELP,
     ),
     Tool(
         name="Check recent OSD crashes",
         func=check_recent_osd_crashes,
-        description="Checks recent OSD crashes.",
+        description="Checks recent OSD crashes. " + WINDOW_HELP,
     ),
     Tool(
         name="Check cluster health",
         func=get_cluster_health,
-        description="Check cluster health",
+        description="Check cluster health. " + WINDOW_HELP,
     ),
     Tool(
         name="Check high latency OSDs",
         func=get_high_latency_osds,
-        description="Check high latency OSDs",
+        description="Check high latency OSDs. " + WINDOW_HELP,
     ),
     Tool(
         name="Check count of daemons",
         func=get_ceph_daemon_counts,
-        description="Check count of daemons",
+        description="Check count of daemons. " + WINDOW_HELP,
     ),
 ]
 
@@ -82,7 +83,7 @@ def query_llm(prompt: str):
 # DB connection
 storage = PostgresAgentStorage(
     table_name="agent_sessions",
-    db_url=get_db_string(),
+    db_engine=get_db_engine(),
 )
 
 # Initialize AI Agent
@@ -1,10 +1,29 @@
 import os
+import threading
+from contextlib import contextmanager
 
 import psycopg2
 from dotenv import load_dotenv
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from sqlalchemy import create_engine, event
 
 load_dotenv()
 
+DB_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10"))
+# How long a caller waits for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+# The SQLAlchemy engine keeps this many idle connections checked out of the
+# pool for itself, so they get slots on top of POSTGRES_POOL_MAX_SIZE
+ENGINE_IDLE_CONNECTIONS = 1
+_POOL_SLOTS = DB_POOL_MAX_SIZE + ENGINE_IDLE_CONNECTIONS
+
+# Process-wide pool shared by the scraper, the metric tools and agent storage
+_pool = None
+_pool_slots = threading.BoundedSemaphore(_POOL_SLOTS)
+_pool_lock = threading.Lock()
+_engine = None
+
 
 def get_db_string():
     database_string = "postgresql://{user}:{pw}@{host}:{port}/{dbname}"
@@ -17,15 +36,113 @@ def get_db_string():
     )
 
 
+def get_db_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN_SIZE, _POOL_SLOTS, get_db_string()
+                )
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout():
+    """Check a healthy connection out of the pool, waiting for a free slot."""
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise PoolError(
+            f"No free database connection within {DB_POOL_TIMEOUT:g}s, all "
+            f"{_POOL_SLOTS} are in use (is a connection not being released?)"
+        )
+    try:
+        pool = get_db_pool()
+        # Once the server restarted every idle connection may be dead: try each
+        # of them (psycopg2 keeps them in pool._pool), then a fresh one
+        for _ in range(len(pool._pool) + 1):
+            conn = pool.getconn()
+            if _is_healthy(conn):
+                return conn
+            pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection in the pool")
+    except Exception:
+        _pool_slots.release()
+        raise
+
+
+def release_db_conn(conn, close=False):
+    """Return a connection obtained from get_db_conn() to the pool."""
+    try:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                # Unusable, but it must still leave the pool's used set
+                close = True
+        get_db_pool().putconn(conn, close=close or bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+
 # Connect to PostgreSQL
 def get_db_conn():
-    db_string = get_db_string()
-    print(f"{db_string = }")
-
     try:
-        conn = psycopg2.connect(db_string)
-    except psycopg2.OperationalError as err:
+        conn = _checkout()
+    except (psycopg2.OperationalError, PoolError) as err:
         err_msg = "DB Connection Error - Error: {}".format(err)
         print(err_msg)
         return None
     return conn
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a ``with`` block."""
+    conn = _checkout()
+    try:
+        yield conn
+    finally:
+        release_db_conn(conn)
+
+
+def get_db_engine():
+    """SQLAlchemy engine (for agno storage) drawing connections from the same pool.
+
+    The engine holds on to ENGINE_IDLE_CONNECTIONS connections between uses, and
+    their pool slots with them; up to POSTGRES_POOL_MAX_SIZE are open at once.
+    """
+    global _engine
+    if _engine is None:
+        with _pool_lock:
+            if _engine is None:
+                engine = create_engine(
+                    "postgresql+psycopg2://",
+                    creator=_checkout,
+                    pool_size=ENGINE_IDLE_CONNECTIONS,
+                    max_overflow=DB_POOL_MAX_SIZE - ENGINE_IDLE_CONNECTIONS,
+                    pool_pre_ping=True,
+                )
+                # Connections SQLAlchemy discards go back to our pool as well
+                event.listen(
+                    engine.pool,
+                    "close",
+                    lambda dbapi_conn, _record: release_db_conn(dbapi_conn, close=True),
+                )
+                event.listen(
+                    engine.pool,
+                    "close_detached",
+                    lambda dbapi_conn: release_db_conn(dbapi_conn, close=True),
+                )
+                _engine = engine
+    return _engine
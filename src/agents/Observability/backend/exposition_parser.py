@@ -0,0 +1,166 @@
+"""Streaming parser for the Prometheus text exposition format."""
+
+import re
+import sys
+from typing import NamedTuple
+
+CHUNK_SIZE = 64 * 1024
+
+_ESCAPES = {"\\": "\\", '"': '"', "n": "\n"}
+_ESCAPE_PATTERN = re.compile(r"\\(.)")
+# A whole sample line; the label set is greedy up to the last closing brace
+# because label values never follow it
+_SAMPLE_PATTERN = re.compile(
+    r"\s*([a-zA-Z_:][a-zA-Z0-9_:]*)\s*(?:\{(.*)\})?\s+(\S+)(?:\s+(-?\d+))?\s*"
+)
+# Fast path for label sets without escapes, which is nearly all of them. findall
+# skips whatever does not match, so the set is checked as a whole first
+_LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"([^"]*)"')
+_LABEL_SET_PATTERN = re.compile(r'(?:[\s,]*[a-zA-Z_][a-zA-Z0-9_]*\s*=\s*"[^"]*")*[\s,]*')
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: dict
+    value: float
+    timestamp: int | None  # milliseconds since epoch, when the exporter sets one
+
+
+class MetricMetadata(NamedTuple):
+    type: str = "untyped"
+    help: str = ""
+
+
+class ExpositionParseError(ValueError):
+    pass
+
+
+def _unescape(text):
+    return _ESCAPE_PATTERN.sub(lambda m: _ESCAPES.get(m[1], m[0]), text)
+
+
+def _iter_chunks(source):
+    if isinstance(source, (bytes, str)):
+        yield source
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(CHUNK_SIZE), source.read(0))
+    else:
+        yield from source
+
+
+def iter_lines(source):
+    """Split a byte (or text) stream into decoded lines without buffering it all."""
+    pending = None
+    for chunk in _iter_chunks(source):
+        if pending:
+            chunk = pending + chunk
+        if isinstance(chunk, bytes):
+            # Only decode up to the last newline so a multibyte character is
+            # never split across two chunks
+            head, sep, pending = chunk.rpartition(b"\n")
+            if sep:
+                yield from head.decode().split("\n")
+        else:
+            *lines, pending = chunk.split("\n")
+            yield from lines
+    if pending:
+        yield pending.decode() if isinstance(pending, bytes) else pending
+
+
+def _parse_labels(line, pos, intern=sys.intern):
+    """Parse ``key="value",...}`` starting at ``pos``. Returns (labels, end)."""
+    labels = {}
+    length = len(line)
+    while True:
+        while pos < length and line[pos] in " ,":
+            pos += 1
+        if pos >= length:
+            raise ExpositionParseError(f"Unterminated label set: {line!r}")
+        if line[pos] == "}":
+            return labels, pos + 1
+
+        eq = line.find("=", pos)
+        if eq < 0:
+            raise ExpositionParseError(f"Label without value: {line!r}")
+        key = line[pos:eq].strip()
+        quote = eq + 1
+        while quote < length and line[quote] == " ":
+            quote += 1
+        if quote >= length or line[quote] != '"':
+            raise ExpositionParseError(f"Unquoted label value: {line!r}")
+
+        end = line.find('"', quote + 1)
+        has_escape = False
+        while end > 0 and line[end - 1] == "\\":
+            # A quote is escaped only if preceded by an odd number of backslashes
+            backslashes = 1
+            while line[end - 1 - backslashes] == "\\":
+                backslashes += 1
+            has_escape = True
+            if backslashes % 2 == 0:
+                break
+            end = line.find('"', end + 1)
+        if end < 0:
+            raise ExpositionParseError(f"Unterminated label value: {line!r}")
+
+        value = line[quote + 1 : end]
+        if has_escape or "\\" in value:
+            value = _unescape(value)
+        labels[intern(key)] = value
+        pos = end + 1
+
+
+def _parse_metadata(line, metadata):
+    parts = line.split(None, 3)
+    if len(parts) < 3 or parts[1] not in ("HELP", "TYPE"):
+        return  # Plain comment
+    name = parts[2]
+    text = parts[3].strip() if len(parts) > 3 else ""
+    current = metadata.get(name)
+    if parts[1] == "TYPE":
+        metadata[name] = MetricMetadata(text, current.help if current else "")
+    else:
+        help_text = _unescape(text) if "\\" in text else text
+        metadata[name] = MetricMetadata(current.type if current else "untyped", help_text)
+
+
+def parse_exposition(source, metadata=None, intern=sys.intern):
+    """Yield a :class:`Sample` for every sample line of an exposition stream.
+
+    ``source`` may be bytes, text, a binary/text file object or any iterable of
+    chunks (e.g. ``response.iter_content()``). HELP and TYPE lines are collected
+    into ``metadata`` when a dict is given. Values accept ``NaN``, ``+Inf`` and
+    ``-Inf``; an optional trailing millisecond timestamp is kept.
+    """
+    match_sample = _SAMPLE_PATTERN.fullmatch
+    find_labels = _LABEL_PATTERN.findall
+    is_label_set = _LABEL_SET_PATTERN.fullmatch
+    for line in iter_lines(source):
+        if not line or line.isspace():
+            continue
+        if line[0] == "#" or line.lstrip()[0] == "#":
+            if metadata is not None:
+                _parse_metadata(line, metadata)
+            continue
+
+        match = match_sample(line)
+        if not match:
+            raise ExpositionParseError(f"Malformed sample line: {line!r}")
+        name, section, value, timestamp = match.groups()
+
+        if not section:
+            labels = {}
+        elif "\\" in section or not is_label_set(section):
+            # Escapes, or pairs the fast path cannot read: parsed or rejected here
+            labels, _ = _parse_labels(section + "}", 0)
+        else:
+            labels = {intern(k): v for k, v in find_labels(section)}
+
+        try:
+            value = float(value)
+        except ValueError as err:
+            raise ExpositionParseError(f"Malformed sample line: {line!r}") from err
+
+        yield Sample(
+            intern(name), labels, value, int(timestamp) if timestamp else None
+        )
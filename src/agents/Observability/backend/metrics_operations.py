@@ -1,34 +1,47 @@
-import os
-import sys
+from .connection import get_db_conn, release_db_conn
+from .metrics_query import parse_window, window_query
 
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from connection import get_db_conn
+# Every tool accepts the same window arguments, see metrics_query.parse_window.
+# "Current state" tools report the last value inside the window. Without a
+# cluster filter results cover every scraped cluster, reported per cluster.
 
 
 # Tool Functions
 def get_diskoccupation(*args, **kwargs):
     print("get_diskoccupation function called")
-    query_disk_occupation = """
+    try:
+        window = parse_window(*args, **kwargs)
+    except ValueError as e:
+        return f"❌ Invalid time window: {e}"
+    query_disk_occupation, params = window_query(
+        window,
+        ["ceph_disk_occupation"],
+        """
         SELECT 
+            cluster_id, 
             labels->>'instance' AS instance, 
             SUM(value) AS total_disk_occupation 
-        FROM ceph_cephdiskoccupation_metrics 
-        GROUP BY instance;
-        """
+        FROM latest 
+        GROUP BY cluster_id, instance
+        ORDER BY cluster_id, instance;
+        """,
+    )
 
     conn = get_db_conn()
     if not conn:
         return "❌ Database connection failed."
     cursor = conn.cursor()
     try:
-        cursor.execute(query_disk_occupation)
+        cursor.execute(query_disk_occupation, params)
         disk_occupation_results = cursor.fetchall()
 
         print("\n### Ceph Disk Occupation Per Node ###")
 
         occupation_results = []
         for row in disk_occupation_results:
-            occupation_results.append(f"Node: {row[0]}, Disk Occupation: {row[1]}")
+            occupation_results.append(
+                f"Cluster: {row[0]}, Node: {row[1]}, Disk Occupation: {row[2]}"
+            )
 
         print(f"{occupation_results = }")
 
@@ -37,59 +50,90 @@ def get_diskoccupation(*args, **kwargs):
         print("❌ Error getting disk occupation status:", e)
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
 
 
 def check_degraded_pgs(*args, **kwargs):
-    # Query to check if any degraded PGs exist
-    query = """
-    SELECT 
-        CASE 
-            WHEN MAX(value) > 0 THEN 'True'
-            ELSE 'False'
-        END AS degraded_pgs
-    FROM ceph_cephpgdegraded_metrics;
-    """
+    try:
+        window = parse_window(*args, **kwargs)
+    except ValueError as e:
+        return f"❌ Invalid time window: {e}"
+    # Query to check if any degraded PGs exist, per cluster
+    query, params = window_query(
+        window,
+        ["ceph_pg_degraded"],
+        """
+        SELECT 
+            cluster_id,
+            CASE 
+                WHEN MAX(value) > 0 THEN 'True'
+                ELSE 'False'
+            END AS degraded_pgs
+        FROM latest
+        GROUP BY cluster_id
+        ORDER BY cluster_id;
+        """,
+    )
     conn = get_db_conn()
     if not conn:
         return "❌ Database connection failed."
     cursor = conn.cursor()
     try:
-        cursor.execute(query)
-        result = cursor.fetchone()[0]
+        cursor.execute(query, params)
+        clusters = dict(cursor.fetchall())
+
+        if not clusters:
+            result = "False"
+        elif len(clusters) == 1:
+            result = next(iter(clusters.values()))
+        else:
+            result = "\n".join(
+                f"{cluster_id}: {degraded}" for cluster_id, degraded in clusters.items()
+            )
 
         print(f"Degraded PGs: {result}")
-        cursor.close()
-        conn.close()
         return result
 
     except Exception as e:
         print("❌ Error checking degraded PGs:", e)
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
 
 
 def check_recent_osd_crashes(*args, **kwargs):
-    # Query to check if any failed OSDs exist
-    query = """
-        WITH osd_status AS (
-        SELECT 
-            labels->>'ceph_daemon' AS osd_id, 
-            value, 
-            timestamp,
-            LAG(value) OVER (
-                PARTITION BY labels->>'ceph_daemon' 
-                ORDER BY timestamp ASC
-            ) AS previous_value
-        FROM ceph_cephosdup_metrics
-        WHERE metric_name = 'ceph_osd_up'
+    try:
+        window = parse_window(*args, default="1d", **kwargs)
+    except ValueError as e:
+        return f"❌ Invalid time window: {e}"
+    # An OSD crashed where it is seen down right after being up. With rollups
+    # or a step a row spans many samples, so a row that was both up and down
+    # counts as well.
+    query, params = window_query(
+        window,
+        ["ceph_osd_up"],
+        """
+        SELECT cluster_id, osd_id, min_value AS current_status, previous_value, ts 
+        FROM osd_status
+        WHERE min_value = 0.0 AND (previous_value = 1.0 OR max_value = 1.0)
+        ORDER BY ts DESC;
+        """,
+        ctes="""
+        , osd_status AS (
+            SELECT 
+                cluster_id, 
+                labels->>'ceph_daemon' AS osd_id, 
+                min_value, 
+                max_value, 
+                ts,
+                LAG(last_value) OVER (
+                    PARTITION BY series_id 
+                    ORDER BY ts ASC
+                ) AS previous_value
+            FROM windowed
+        )
+        """,
     )
-    SELECT osd_id, value AS current_status, previous_value, timestamp 
-    FROM osd_status
-    WHERE previous_value = 1.0 AND value = 0.0
-    ORDER BY timestamp DESC;
-    """
 
     conn = get_db_conn()
     if not conn:
@@ -97,14 +141,16 @@ def check_recent_osd_crashes(*args, **kwargs):
     cursor = conn.cursor()
 
     try:
-        cursor.execute(query)
+        cursor.execute(query, params)
         crashed_osds = cursor.fetchall()
 
         if crashed_osds:
             response = "\n🚨 **YES!! AN OSD CRASH DETECTED!** 🚨\n"
             for osd in crashed_osds:
-                osd_id, current_status, previous_value, timestamp = osd
-                response += f"🛑 **OSD {osd_id} went DOWN at {timestamp}**\n"
+                cluster_id, osd_id, current_status, previous_value, timestamp = osd
+                response += (
+                    f"🛑 **OSD {osd_id} of {cluster_id} went DOWN at {timestamp}**\n"
+                )
             return response  # Return a formatted response with OSD crash details
         else:
             return "✅ No OSD failures detected."
@@ -113,11 +159,23 @@ def check_recent_osd_crashes(*args, **kwargs):
         return f"❌ Error executing query: {e}"
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
 
 
 def get_cluster_health(*args, **kwargs):
-    query = "SELECT MAX(value) FROM ceph_cephhealthstatus_metrics;"
+    try:
+        window = parse_window(*args, **kwargs)
+    except ValueError as e:
+        return {"status": "error", "message": f"❌ Invalid time window: {e}"}
+    query, params = window_query(
+        window,
+        ["ceph_health_status"],
+        """
+        SELECT cluster_id, MAX(value) FROM latest
+        GROUP BY cluster_id
+        ORDER BY cluster_id;
+        """,
+    )
 
     conn = get_db_conn()
     if not conn:
@@ -125,25 +183,29 @@ def get_cluster_health(*args, **kwargs):
 
     cursor = conn.cursor()
     try:
-        cursor.execute(query)
-        result = cursor.fetchone()
+        cursor.execute(query, params)
+        results = [row for row in cursor.fetchall() if row[1] is not None]
 
-        if not result or result[0] is None:
+        if not results:
             return {"status": "error", "message": "⚠️ No health data available."}
 
-        health_status = int(result[0])
-
         health_messages = {
             0: "🟢 Cluster is healthy (HEALTH_OK)",
             1: "🟡 Cluster has warnings (HEALTH_WARN)",
             2: "🔴 Cluster has critical issues (HEALTH_ERR)",
         }
-
-        return {
-            "status": "success",
-            "health": health_messages.get(health_status, "Unknown health status"),
+        clusters = {
+            cluster_id: health_messages.get(int(status), "Unknown health status")
+            for cluster_id, status in results
         }
 
+        if len(clusters) == 1:
+            health = next(iter(clusters.values()))
+        else:
+            health = "\n".join(f"{cluster_id}: {msg}" for cluster_id, msg in clusters.items())
+
+        return {"status": "success", "health": health, "clusters": clusters}
+
     except Exception as e:
         return {
             "status": "error",
@@ -152,20 +214,39 @@ def get_cluster_health(*args, **kwargs):
 
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
 
 
 def get_high_latency_osds(*args, **kwargs):
-    query = """
-    SELECT 
-        labels->>'ceph_daemon' AS osd_id, 
-        MAX(value) AS max_latency 
-    FROM ceph_cephosdapplylatencyms_metrics
-    WHERE timestamp >= %s AND timestamp <= %s
-    GROUP BY labels->>'ceph_daemon'
-    ORDER BY max_latency DESC
-    LIMIT 5;
-    """
+    try:
+        window = parse_window(*args, default="3d", **kwargs)
+    except ValueError as e:
+        return {"status": "error", "message": f"❌ Invalid time window: {e}"}
+    # With a step, every OSD also gets its max latency per step as "points"
+    points = (
+        "JSON_AGG(JSON_BUILD_ARRAY(ts, max_value) ORDER BY ts)"
+        if window.step
+        else "NULL"
+    )
+    query, params = window_query(
+        window,
+        ["ceph_osd_apply_latency_ms"],
+        f"""
+        SELECT 
+            cluster_id, 
+            osd_id, 
+            MAX(max_value) AS max_latency, 
+            {points} AS points 
+        FROM (
+            SELECT cluster_id, labels->>'ceph_daemon' AS osd_id, ts, MAX(max_value) AS max_value
+            FROM windowed
+            GROUP BY 1, 2, 3
+        ) per_osd
+        GROUP BY cluster_id, osd_id
+        ORDER BY max_latency DESC
+        LIMIT 5;
+        """,
+    )
 
     conn = get_db_conn()
     if not conn:
@@ -173,10 +254,7 @@ def get_high_latency_osds(*args, **kwargs):
 
     cursor = conn.cursor()
     try:
-        start_time = "2025-02-14 16:40:00"
-        end_time = "2025-02-17 16:40:10"
-
-        cursor.execute(query, (start_time, end_time))
+        cursor.execute(query, params)
         results = cursor.fetchall()
 
         if not results:
@@ -200,7 +278,7 @@ def get_high_latency_osds(*args, **kwargs):
         high_latency_osds = []
 
         for row in results:
-            osd_id, max_latency = row
+            cluster_id, osd_id, max_latency, points = row
 
             # Determine latency category based on thresholds
             if max_latency < 50:
@@ -214,12 +292,15 @@ def get_high_latency_osds(*args, **kwargs):
 
             high_latency_osds.append(
                 {
+                    "cluster": cluster_id,
                     "osd_id": osd_id,
                     "max_latency": max_latency,
                     "status": latency_info["status"],
                     "description": latency_info["description"],
                 }
             )
+            if points:
+                high_latency_osds[-1]["points"] = points
 
         return {"high_latency_osds": high_latency_osds}
 
@@ -231,17 +312,27 @@ def get_high_latency_osds(*args, **kwargs):
 
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
 
 
 def get_ceph_daemon_counts(*args, **kwargs):
-    query = """
-    SELECT 'MON' AS daemon_type, COUNT(*) AS count FROM ceph_cephmonmetadata_metrics
-    UNION ALL
-    SELECT 'MGR' AS daemon_type, COUNT(*) AS count FROM ceph_cephmgrmetadata_metrics
-    UNION ALL
-    SELECT 'OSD' AS daemon_type, COUNT(*) AS count FROM ceph_cephosdmetadata_metrics;
-    """
+    daemon_metrics = {
+        "MON": "ceph_mon_metadata",
+        "MGR": "ceph_mgr_metadata",
+        "OSD": "ceph_osd_metadata",
+    }
+    try:
+        window = parse_window(*args, **kwargs)
+    except ValueError as e:
+        return {"status": "error", "message": f"❌ Invalid time window: {e}"}
+    query, params = window_query(
+        window,
+        daemon_metrics.values(),
+        """
+        SELECT cluster_id, metric_name, COUNT(*) AS count FROM latest
+        GROUP BY cluster_id, metric_name;
+        """,
+    )
 
     conn = get_db_conn()
     if not conn:
@@ -249,12 +340,18 @@ def get_ceph_daemon_counts(*args, **kwargs):
 
     cursor = conn.cursor()
     try:
-        cursor.execute(query)
-        results = cursor.fetchall()
+        cursor.execute(query, params)
+        counts = {}
+        for cluster_id, metric_name, count in cursor.fetchall():
+            counts.setdefault(cluster_id, {})[metric_name] = count
 
         message = ""
-        for daemon_type, count in results:
-            message += f"\n **{daemon_type} Count**: {count}\n"
+        for cluster_id, cluster_counts in sorted(counts.items()) or [(None, {})]:
+            if len(counts) > 1:
+                message += f"\n **{cluster_id}**\n"
+            for daemon_type, metric_name in daemon_metrics.items():
+                count = cluster_counts.get(metric_name, 0)
+                message += f"\n **{daemon_type} Count**: {count}\n"
 
         return {"status": "success", "message": message}
 
@@ -266,4 +363,4 @@ def get_ceph_daemon_counts(*args, **kwargs):
 
     finally:
         cursor.close()
-        conn.close()
+        release_db_conn(conn)
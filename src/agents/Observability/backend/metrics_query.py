@@ -0,0 +1,181 @@
+"""Time windows for the metrics_operations tools and the SQL they all share."""
+
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from .metrics_store import SERIES_TABLE, window_source
+
+DEFAULT_WINDOW = os.getenv("METRICS_DEFAULT_WINDOW", "1h")
+# A stepped query returns at most this many points per series
+MAX_POINTS = 500
+
+WINDOW_HELP = (
+    "Input: optional time window, e.g. 'last 15m', 'last 2 days step 1h', "
+    "'start=2025-02-14T16:40:00 end=2025-02-17T16:40:00' or 'cluster=<ip>'."
+)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_DURATION = r"(\d+(?:\.\d+)?)?\s*(s|secs?|seconds?|m|mins?|minutes?|h|hrs?|hours?|d|days?|w|weeks?)"
+_DURATION_PATTERN = re.compile(_DURATION, re.I)
+_KEY_PATTERN = re.compile(
+    r"\b(start|end|from|to|last|step|cluster)\s*=\s*"
+    r"(\d{4}-\d\d-\d\d[ T]\d\d:\d\d(?::\d\d(?:\.\d+)?)?(?:Z|[+-]\d\d:?\d\d)?|\S+)",
+    re.I,
+)
+_LAST_PATTERN = re.compile(rf"\b(?:last|past)\s+({_DURATION})\b", re.I)
+_STEP_PATTERN = re.compile(rf"\b(?:step|every)\s+({_DURATION})\b", re.I)
+_KEY_ALIASES = {"from": "start", "to": "end"}
+
+
+class MetricWindow(NamedTuple):
+    start: datetime
+    end: datetime
+    step: timedelta | None = None
+    cluster: str | None = None
+
+
+def parse_duration(value):
+    """``"15m"``, ``"2 hours"``, ``"day"``, a number of seconds or a timedelta."""
+    if isinstance(value, timedelta):
+        return value
+    if isinstance(value, (int, float)):
+        return timedelta(seconds=value)
+    match = _DURATION_PATTERN.fullmatch(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    amount, unit = match.groups()
+    seconds = float(amount or 1) * _UNITS[unit[0].lower()]
+    if seconds <= 0:
+        raise ValueError(f"Duration must be positive: {value!r}")
+    return timedelta(seconds=seconds)
+
+
+def parse_timestamp(value):
+    """ISO 8601 string or datetime; naive values are taken as UTC."""
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip())
+        except ValueError as err:
+            raise ValueError(f"Invalid timestamp: {value!r}") from err
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _parse_text(text):
+    """Pull window options out of a tool's free text input."""
+    text = text.strip()
+    if text.startswith("{"):
+        return json.loads(text)
+
+    options = {}
+    for key, value in _KEY_PATTERN.findall(text):
+        key = key.lower()
+        options[_KEY_ALIASES.get(key, key)] = value
+    # Series are stored under the cluster IP, so a cluster is only filtered on
+    # when given as cluster=<ip>; "cluster 1" in free text is a name, not an id
+    for key, pattern in (("last", _LAST_PATTERN), ("step", _STEP_PATTERN)):
+        match = pattern.search(text)
+        if key not in options and match:
+            options[key] = match[1]
+    return options
+
+
+def parse_window(*args, default=DEFAULT_WINDOW, now=None, **kwargs):
+    """Build a :class:`MetricWindow` from whatever a tool was called with.
+
+    Agents pass a single free text string (``"last 15 minutes step 1m"``,
+    ``"start=... end=..."`` or a JSON object), Python callers may pass
+    ``start``, ``end``, ``last``, ``step`` and ``cluster`` as keywords. Without
+    a start the window is the ``last`` (or ``default``) duration up to ``end``,
+    which defaults to now. Raises ValueError for a window that makes no sense.
+    """
+    options = {}
+    for arg in args:
+        if isinstance(arg, dict):
+            options.update(arg)
+        elif isinstance(arg, str) and arg.strip():
+            options.update(_parse_text(arg))
+    options.update({k: v for k, v in kwargs.items() if v is not None})
+
+    now = now or datetime.now(timezone.utc)
+    end = parse_timestamp(options["end"]) if options.get("end") else now
+    if options.get("start"):
+        start = parse_timestamp(options["start"])
+    else:
+        start = end - parse_duration(options.get("last") or default)
+    if start >= end:
+        raise ValueError(f"Window start {start} is not before its end {end}")
+
+    step = parse_duration(options["step"]) if options.get("step") else None
+    if step and (end - start) / step > MAX_POINTS:
+        # Keep stepped results (and the rows behind them) bounded
+        step = timedelta(seconds=-(-(end - start).total_seconds() // MAX_POINTS))
+
+    cluster = options.get("cluster")
+    return MetricWindow(start, end, step, str(cluster) if cluster else None)
+
+
+def window_query(window, metric_names, select, ctes=""):
+    """Prefix ``select`` with the CTEs every metric tool reads through.
+
+    * ``series``: the series of ``metric_names`` (and of ``window.cluster``)
+    * ``latest``: the last value and ts of every series inside the window, one
+      index probe per series
+    * ``windowed``: ``series_id, cluster_id, metric_name, labels, ts, min_value,
+      max_value, sum_value, sample_count, last_value`` over the window, one row per
+      ``window.step`` when there is one, else per stored row
+
+    The samples are read from the coarsest rollup that answers the window,
+    always through ``ts``/``bucket`` range predicates. Extra CTEs built on these
+    go in ``ctes`` (starting with a comma). Returns ``(sql, params)``.
+    """
+    step = window.step.total_seconds() if window.step else None
+    source, params = window_source(window.start, window.end, step)
+    params.update({"metric_names": list(metric_names), "cluster": window.cluster, "step": step})
+
+    cluster_filter = "AND cluster_id = %(cluster)s" if window.cluster else ""
+    if step:
+        windowed = f"""
+            SELECT s.series_id, s.cluster_id, s.metric_name, s.labels,
+                   to_timestamp(floor(extract(epoch FROM w.ts) / %(step)s) * %(step)s) AS ts,
+                   MIN(w.min_value) AS min_value, MAX(w.max_value) AS max_value,
+                   SUM(w.sum_value) AS sum_value, SUM(w.sample_count) AS sample_count,
+                   (ARRAY_AGG(w.last_value ORDER BY w.ts DESC))[1] AS last_value
+            FROM series s
+            JOIN ({source}) w USING (series_id)
+            GROUP BY s.series_id, s.cluster_id, s.metric_name, s.labels, 5
+        """
+    else:
+        windowed = f"""
+            SELECT s.series_id, s.cluster_id, s.metric_name, s.labels, w.ts,
+                   w.min_value, w.max_value, w.sum_value, w.sample_count, w.last_value
+            FROM series s
+            JOIN ({source}) w USING (series_id)
+        """
+
+    sql = f"""
+    WITH series AS (
+        SELECT series_id, cluster_id, metric_name, labels
+        FROM {SERIES_TABLE}
+        WHERE metric_name = ANY(%(metric_names)s) {cluster_filter}
+    ),
+    latest AS (
+        SELECT s.series_id, s.cluster_id, s.metric_name, s.labels, l.value, l.ts
+        FROM series s
+        CROSS JOIN LATERAL (
+            SELECT w.last_value AS value, w.ts
+            FROM ({source}) w
+            WHERE w.series_id = s.series_id
+            ORDER BY w.ts DESC
+            LIMIT 1
+        ) l
+    ),
+    windowed AS ({windowed})
+    {ctes}
+    {select}
+    """
+    return sql, params
@@ -0,0 +1,381 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+SERIES_TABLE = "ceph_metric_series"
+SAMPLES_TABLE = "ceph_metric_samples"
+TARGETS_TABLE = "ceph_scrape_targets"
+RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", "14"))
+# Cluster id of samples that were not scraped from a registered cluster
+LOCAL_CLUSTER_ID = "local"
+
+# Rollup resolutions in seconds, finest first, and how long each is kept
+ROLLUPS = {"1m": 60, "5m": 300, "1h": 3600}
+ROLLUP_RETENTION_DAYS = {
+    "1m": RETENTION_DAYS,
+    "5m": int(os.getenv("METRICS_ROLLUP_5M_RETENTION_DAYS", "90")),
+    "1h": int(os.getenv("METRICS_ROLLUP_1H_RETENTION_DAYS", "400")),
+}
+# A rollup only answers a window that spans at least this many of its buckets
+ROLLUP_MIN_BUCKETS = 12
+
+
+def rollup_table(resolution):
+    return f"ceph_metric_rollup_{resolution}"
+
+
+SCHEMA_QUERIES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {SERIES_TABLE} (
+        series_id BIGSERIAL PRIMARY KEY,
+        cluster_id VARCHAR NOT NULL,
+        metric_name VARCHAR NOT NULL,
+        labels JSONB NOT NULL,
+        labels_key TEXT NOT NULL
+    );
+    """,
+    # Series tables created before the cluster dimension was added
+    f"""
+    ALTER TABLE {SERIES_TABLE}
+        ADD COLUMN IF NOT EXISTS cluster_id VARCHAR NOT NULL DEFAULT '{LOCAL_CLUSTER_ID}';
+    """,
+    f"""
+    ALTER TABLE {SERIES_TABLE}
+        DROP CONSTRAINT IF EXISTS {SERIES_TABLE}_metric_name_labels_key_key;
+    """,
+    # Also serves every "metrics X of cluster Y" lookup
+    f"""
+    CREATE UNIQUE INDEX IF NOT EXISTS {SERIES_TABLE}_cluster_metric_labels_idx
+        ON {SERIES_TABLE} (cluster_id, metric_name, labels_key);
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {SAMPLES_TABLE} (
+        series_id BIGINT NOT NULL,
+        ts TIMESTAMPTZ NOT NULL,
+        value DOUBLE PRECISION
+    ) PARTITION BY RANGE (ts);
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {SAMPLES_TABLE}_series_ts_idx
+        ON {SAMPLES_TABLE} (series_id, ts);
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {TARGETS_TABLE} (
+        cluster_ip VARCHAR PRIMARY KEY,
+        interval_seconds DOUBLE PRECISION,
+        added_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """,
+    f"""
+    ALTER TABLE {TARGETS_TABLE} ADD COLUMN IF NOT EXISTS last_scraped_at TIMESTAMPTZ;
+    """,
+] + [
+    f"""
+    CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} (
+        series_id BIGINT NOT NULL,
+        bucket TIMESTAMPTZ NOT NULL,
+        min_value DOUBLE PRECISION,
+        max_value DOUBLE PRECISION,
+        sum_value DOUBLE PRECISION,
+        sample_count INTEGER NOT NULL,
+        last_value DOUBLE PRECISION,
+        last_ts TIMESTAMPTZ NOT NULL,
+        PRIMARY KEY (series_id, bucket)
+    );
+    """
+    for resolution in ROLLUPS
+]
+
+# Process-wide caches, so steady-state scrapes skip the DDL and series lookups.
+# Concurrent ingests share them: only committed partitions and series are added,
+# always under _cache_lock
+_cache_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready = False
+_partitions = set()
+_series_ids = {}
+
+
+def canonical_labels(labels):
+    return json.dumps(labels, sort_keys=True, separators=(",", ":"))
+
+
+def partition_name(day):
+    return f"{SAMPLES_TABLE}_p{day:%Y%m%d}"
+
+
+def ensure_schema(conn):
+    global _schema_ready
+    if _schema_ready:
+        return
+    # Held across the DDL, so concurrent first ingests run it only once
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with conn.cursor() as cur:
+            for query in SCHEMA_QUERIES:
+                cur.execute(query)
+        conn.commit()
+        _schema_ready = True
+
+
+def ensure_partition(cur, ts):
+    """Create the daily partition holding ``ts``. Returns True if it was not cached.
+
+    The partition is only cached by ``ingest_samples`` once its transaction commits.
+    """
+    day = ts.astimezone(timezone.utc).date()
+    with _cache_lock:
+        if day in _partitions:
+            return False
+    lower = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {partition_name(day)}
+        PARTITION OF {SAMPLES_TABLE}
+        FOR VALUES FROM (%s) TO (%s);
+        """,
+        (lower, lower + timedelta(days=1)),
+    )
+    return True
+
+
+def bucket_start(ts, seconds):
+    """Start of the ``seconds`` wide bucket holding ``ts``."""
+    return datetime.fromtimestamp(ts.timestamp() // seconds * seconds, timezone.utc)
+
+
+def pick_rollup(start, end, step=None, now=None):
+    """Coarsest rollup resolution that can answer ``[start, end)``, or None for raw samples.
+
+    With a ``step`` (seconds) the rollup must not be coarser than the step.
+    """
+    now = now or datetime.now(timezone.utc)
+    window = (end - start).total_seconds()
+    for resolution, seconds in reversed(ROLLUPS.items()):
+        if step and seconds > step:
+            continue
+        kept_since = now - timedelta(days=ROLLUP_RETENTION_DAYS[resolution])
+        if window >= seconds * ROLLUP_MIN_BUCKETS and start >= kept_since:
+            return resolution
+    return None
+
+
+def window_source(start, end, step=None):
+    """Subquery over ``[start, end)`` from the coarsest source that can answer it.
+
+    Every row has ``series_id, ts, min_value, max_value, sum_value, sample_count,
+    last_value``, whether it comes from a rollup or from raw samples, so callers
+    aggregate the same way (``SUM(sum_value) / SUM(sample_count)`` for an
+    average). Rollup buckets are whole, so the window is widened to the bucket
+    holding ``start``. Binds ``%(window_start)s`` and ``%(window_end)s``.
+    """
+    resolution = pick_rollup(start, end, step)
+    if resolution is None:
+        sql = f"""
+            SELECT series_id, ts, value AS min_value, value AS max_value,
+                   value AS sum_value, 1 AS sample_count, value AS last_value
+            FROM {SAMPLES_TABLE}
+            WHERE ts >= %(window_start)s AND ts < %(window_end)s
+        """
+        return sql, {"window_start": start, "window_end": end}
+
+    sql = f"""
+        SELECT series_id, bucket AS ts, min_value, max_value,
+               sum_value, sample_count, last_value
+        FROM {rollup_table(resolution)}
+        WHERE bucket >= %(window_start)s AND bucket < %(window_end)s
+    """
+    return sql, {"window_start": bucket_start(start, ROLLUPS[resolution]), "window_end": end}
+
+
+def update_rollups(cur, values, ts):
+    """Fold one scrape (``{series_id: value}`` at ``ts``) into every rollup."""
+    for resolution, seconds in ROLLUPS.items():
+        bucket = bucket_start(ts, seconds)
+        execute_values(
+            cur,
+            f"""
+            INSERT INTO {rollup_table(resolution)} AS r (
+                series_id, bucket, min_value, max_value,
+                sum_value, sample_count, last_value, last_ts
+            ) VALUES %s
+            ON CONFLICT (series_id, bucket) DO UPDATE SET
+                min_value = LEAST(r.min_value, EXCLUDED.min_value),
+                max_value = GREATEST(r.max_value, EXCLUDED.max_value),
+                sum_value = r.sum_value + EXCLUDED.sum_value,
+                sample_count = r.sample_count + EXCLUDED.sample_count,
+                last_value = CASE WHEN EXCLUDED.last_ts >= r.last_ts
+                                  THEN EXCLUDED.last_value ELSE r.last_value END,
+                last_ts = GREATEST(r.last_ts, EXCLUDED.last_ts)
+            """,
+            [
+                (series_id, bucket, value, value, value, 1, value, ts)
+                for series_id, value in values.items()
+            ],
+            page_size=max(len(values), 1),
+        )
+
+
+def resolve_series_ids(cur, series_keys):
+    """Map (cluster_id, metric_name, labels_key) keys to series ids, creating missing ones.
+
+    Returns a mapping of its own; the new ids are only cached by ``ingest_samples``
+    once its transaction commits.
+    """
+    with _cache_lock:
+        series_ids = {key: _series_ids[key] for key in series_keys if key in _series_ids}
+    missing = [key for key in series_keys if key not in series_ids]
+    if missing:
+        rows = execute_values(
+            cur,
+            f"""
+            INSERT INTO {SERIES_TABLE} (cluster_id, metric_name, labels_key, labels)
+            VALUES %s
+            ON CONFLICT (cluster_id, metric_name, labels_key)
+            DO UPDATE SET metric_name = EXCLUDED.metric_name
+            RETURNING series_id, cluster_id, metric_name, labels_key
+            """,
+            [key + (key[2],) for key in missing],
+            page_size=len(missing),
+            fetch=True,
+        )
+        for series_id, *key in rows:
+            series_ids[tuple(key)] = series_id
+    return series_ids
+
+
+def ingest_samples(conn, samples, cluster_id=LOCAL_CLUSTER_ID, scraped_at=None):
+    """Write one scrape of ``cluster_id`` into the samples table in a single transaction.
+
+    ``samples`` is an iterable of ``(metric_name, labels, value)`` tuples. Every
+    sample of the scrape shares the same timestamp, so consecutive scrapes can
+    be compared sample by sample. The rollups are updated in the same
+    transaction, so they never disagree with the raw samples.
+    """
+    ensure_schema(conn)
+    scraped_at = scraped_at or datetime.now(timezone.utc)
+
+    rows = [
+        ((cluster_id, metric_name, canonical_labels(labels)), value)
+        for metric_name, labels, value in samples
+    ]
+    series_keys = {key for key, _ in rows}
+
+    new_partition = False
+    cur = conn.cursor()
+    try:
+        new_partition = ensure_partition(cur, scraped_at)
+        series_ids = resolve_series_ids(cur, series_keys)
+        execute_values(
+            cur,
+            f"INSERT INTO {SAMPLES_TABLE} (series_id, ts, value) VALUES %s",
+            [(series_ids[key], scraped_at, value) for key, value in rows],
+            page_size=max(len(rows), 1),
+        )
+        # One row per series, a duplicated series cannot be upserted twice
+        # by the same statement
+        update_rollups(cur, {series_ids[key]: value for key, value in rows}, scraped_at)
+        cur.execute(
+            f"UPDATE {TARGETS_TABLE} SET last_scraped_at = %s WHERE cluster_ip = %s;",
+            (scraped_at, cluster_id),
+        )
+        conn.commit()
+    except Exception as err:
+        print(f"Database error: {err}")
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    with _cache_lock:
+        _partitions.add(scraped_at.astimezone(timezone.utc).date())
+        _series_ids.update(series_ids)
+
+    if new_partition:
+        apply_retention(conn)
+
+    print(f"Ingested {len(rows)} samples for {len(series_keys)} series of {cluster_id}")
+    return len(rows)
+
+
+def apply_retention(conn, retention_days=RETENTION_DAYS):
+    """Drop expired daily sample partitions and rollup buckets."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).date()
+    prefix = f"{SAMPLES_TABLE}_p"
+    dropped = []
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s;
+            """,
+            (SAMPLES_TABLE,),
+        )
+        for (relname,) in cur.fetchall():
+            if not relname.startswith(prefix):
+                continue
+            day = datetime.strptime(relname[len(prefix) :], "%Y%m%d").date()
+            # The partition holds [day, day + 1), drop it once that is all expired
+            if day + timedelta(days=1) <= cutoff:
+                cur.execute(f"DROP TABLE IF EXISTS {relname}")
+                with _cache_lock:
+                    _partitions.discard(day)
+                dropped.append(relname)
+        for resolution, days in ROLLUP_RETENTION_DAYS.items():
+            cur.execute(
+                f"DELETE FROM {rollup_table(resolution)} WHERE bucket < now() - %s * interval '1 day'",
+                (days,),
+            )
+    conn.commit()
+    if dropped:
+        print(f"Retention dropped partitions: {', '.join(dropped)}")
+    return dropped
+
+
+def register_scrape_target(conn, cluster_ip, interval_seconds=None):
+    """Ask the scraper daemon to poll ``cluster_ip`` (default interval if None)."""
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {TARGETS_TABLE} (cluster_ip, interval_seconds) VALUES (%s, %s)
+            ON CONFLICT (cluster_ip)
+            DO UPDATE SET interval_seconds = EXCLUDED.interval_seconds;
+            """,
+            (cluster_ip, interval_seconds),
+        )
+    conn.commit()
+
+
+def unregister_scrape_target(conn, cluster_ip):
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {TARGETS_TABLE} WHERE cluster_ip = %s;", (cluster_ip,))
+    conn.commit()
+
+
+def last_scrape_times(conn):
+    """Return ``{cluster_ip: time of its last ingested scrape}`` (None before the first)."""
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT cluster_ip, last_scraped_at FROM {TARGETS_TABLE};")
+        times = dict(cur.fetchall())
+    conn.commit()
+    return times
+
+
+def list_scrape_targets(conn):
+    """Return ``{cluster_ip: interval_seconds}`` for every registered cluster."""
+    ensure_schema(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT cluster_ip, interval_seconds FROM {TARGETS_TABLE};")
+        targets = dict(cur.fetchall())
+    conn.commit()
+    return targets
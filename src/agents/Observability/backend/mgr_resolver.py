@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from agents.CephViz.backend.cluster_registry import (
+    cluster_registry,
+    resolve_credentials,
+)
+from agents.CephViz.backend.ssh_pool import ssh_sessions
+from agents.CephViz.backend.transport import SSHTransport, active_mgr
+
+load_dotenv()
+
+MGR_CACHE_TTL = float(os.getenv("MGR_CACHE_TTL_SECONDS", "300"))
+
+
+class MgrResolver:
+    """Caches the active mgr address of every cluster.
+
+    The address is trusted for ``ttl`` seconds. Callers should ``resolve(...,
+    refresh=True)`` when talking to the cached mgr fails, since that is how a
+    mgr failover shows up. Lookups go through the pooled SSH transports the
+    CephViz tools use; a cluster this process has not connected yet (the
+    scraper daemon's) is registered with the credentials of the cluster registry.
+    """
+
+    def __init__(self, ttl=MGR_CACHE_TTL, sessions=ssh_sessions):
+        self.ttl = ttl
+        self.sessions = sessions
+        self._cache: dict[str, tuple[str, float]] = {}
+        # One lookup at a time per cluster; concurrent callers share its result
+        self._cluster_locks: dict[str, threading.Lock] = {}
+
+    def resolve(self, cluster_ip, refresh=False):
+        if not refresh:
+            cached = self._cache.get(cluster_ip)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+
+        with self._cluster_locks.setdefault(cluster_ip, threading.Lock()):
+            cached = self._cache.get(cluster_ip)
+            # Someone else refreshed it while we were waiting for the lock
+            if cached and cached[1] > time.monotonic() and not refresh:
+                return cached[0]
+
+            mgr_ip = self._query_active_mgr(cluster_ip)
+            self._cache[cluster_ip] = (mgr_ip, time.monotonic() + self.ttl)
+            return mgr_ip
+
+    def invalidate(self, cluster_ip):
+        self._cache.pop(cluster_ip, None)
+
+    def _register(self, cluster_ip):
+        record = cluster_registry.by_ip(cluster_ip)
+        password = resolve_credentials(record.credentials_ref) if record else None
+        if password is None:
+            raise RuntimeError(f"No credentials for {cluster_ip} in the registry")
+        self.sessions.register(cluster_ip, record.username, password, port=record.port)
+
+    def _query_active_mgr(self, cluster_ip):
+        if cluster_ip not in self.sessions:
+            self._register(cluster_ip)
+        try:
+            return active_mgr(SSHTransport(cluster_ip, self.sessions))
+        except RuntimeError as e:
+            raise RuntimeError(f"{e} for {cluster_ip}") from e
+
+
+mgr_resolver = MgrResolver()
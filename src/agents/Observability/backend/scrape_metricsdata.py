@@ -1,155 +1,142 @@
-import json
-import re
+import os
+import threading
+import time
+from contextlib import contextmanager
 
-import paramiko
 import requests
 
-from .connection import get_db_conn
+from .connection import db_connection
+from .exposition_parser import CHUNK_SIZE, parse_exposition
+from .metrics_store import LOCAL_CLUSTER_ID, ingest_samples
+from .mgr_resolver import mgr_resolver
 
-TABLE_PREFIX = "ceph_"
-TABLE_SUFFIX = "_metrics"
 LOCAL_SAMPLE_METRICS_FILE = "../data/sample_metrics.txt"
+MGR_PROMETHEUS_PORT = 9283
+SCRAPE_CONNECT_TIMEOUT = float(os.getenv("SCRAPE_CONNECT_TIMEOUT_SECONDS", "3"))
+# Longest pause between two reads of the body, well under the deadline: the
+# deadline is checked between reads, so a stalled read can overrun it by this much
+SCRAPE_READ_TIMEOUT = float(os.getenv("SCRAPE_READ_TIMEOUT_SECONDS", "3"))
+# Longest the whole scrape, including streaming the body, may take
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "8"))
 
-
-# Function to parse labels
-def parse_labels(label_str):
-    labels = {}
-    # Match key="value" pairs including those with spaces
-    label_pattern = r'([a-zA-Z0-9_]+)="([^"]+)"'
-    matches = re.findall(label_pattern, label_str)
-    for match in matches:
-        labels[match[0]] = match[1]
-    return labels
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+# ETag / Last-Modified of the last successful scrape, per URL
+_validators: dict[str, tuple[str | None, str | None]] = {}
 
 
 def get_active_mgr_ip(cluster_ip):
     try:
-        # Establish SSH connection
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(cluster_ip, username="root", password="passwd")
-
-        # Run the Ceph command to get manager details
-        stdin, stdout, stderr = ssh.exec_command("ceph mgr dump -f json")
-        output = stdout.read().decode()
-
-        # Close SSH connection
-        ssh.close()
-
-        # Parse JSON output
-        mgr_data = json.loads(output)
-
-        # Extract active manager name
-        active_addr = mgr_data.get("active_addr", None)
-        if not active_addr:
-            print("No active mgr found")
-            return None
-        else:
-            active_addr = active_addr.split(":")[0]
-            return active_addr
-
+        return mgr_resolver.resolve(cluster_ip)
     except Exception as e:
         print(f"Error: {e}")
         return None
 
 
+def _get_session(mgr_ip):
+    """One keep-alive session per mgr, so scrapes reuse the TCP connection."""
+    with _sessions_lock:
+        session = _sessions.get(mgr_ip)
+        if session is None:
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = "gzip"
+            _sessions[mgr_ip] = session
+        return session
+
+
+def _metrics_url(mgr_ip):
+    return f"http://{mgr_ip}:{MGR_PROMETHEUS_PORT}/metrics"
+
+
+def _open_metrics(mgr_ip, deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"Scrape of mgr {mgr_ip} exceeded its deadline")
+    url = _metrics_url(mgr_ip)
+    headers = {}
+    etag, last_modified = _validators.get(url, (None, None))
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    response = _get_session(mgr_ip).get(
+        url,
+        headers=headers,
+        stream=True,
+        # Neither the connection nor a read may outlast the deadline
+        timeout=(
+            min(SCRAPE_CONNECT_TIMEOUT, remaining),
+            min(SCRAPE_READ_TIMEOUT, remaining),
+        ),
+    )
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    return response
+
+
+def _iter_body(response, deadline):
+    """Stream the (transparently gunzipped) body, enforcing a total deadline."""
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Scrape of {response.url} exceeded its deadline")
+        yield chunk
+
+
+@contextmanager
+def open_metrics_stream(cluster_ip):
+    """Yield the cluster's exposition payload as a stream of byte chunks.
+
+    Yields None when the mgr answered 304 Not Modified.
+    """
+    deadline = time.monotonic() + SCRAPE_DEADLINE
+    mgr_ip = mgr_resolver.resolve(cluster_ip)
+    try:
+        response = _open_metrics(mgr_ip, deadline)
+    except requests.RequestException as err:
+        # The cached mgr stopped answering, most likely a failover. Ask the
+        # cluster which mgr is active now and retry once.
+        print(f"Scrape of mgr {mgr_ip} failed ({err}), re-resolving active mgr")
+        mgr_ip = mgr_resolver.resolve(cluster_ip, refresh=True)
+        response = _open_metrics(mgr_ip, deadline)
+
+    with response:
+        if response.status_code == 304:
+            yield None
+            return
+        yield _iter_body(response, deadline)
+        # Only trust the validators once the whole body has been consumed
+        _validators[_metrics_url(mgr_ip)] = (
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+
 # Fetch Prometheus metrics
 def scrape_metrics(cluster_ip: str | None = None):
     if cluster_ip:
-        ip = get_active_mgr_ip(cluster_ip)
-        url = f"http://{ip}:9283/metrics"
-        response = requests.get(url)
-        metrics_data = response.text.splitlines()
+        with open_metrics_stream(cluster_ip) as metrics_stream:
+            if metrics_stream is None:
+                print(f"Metrics of {cluster_ip} not modified since the last scrape")
+                return 0
+            # Parse while the body is still streaming in
+            samples = _collect_samples(metrics_stream)
     else:
-        metrics_data = open(LOCAL_SAMPLE_METRICS_FILE, "r").read().splitlines()
-        metrics_data = [line for line in metrics_data if line.strip()]
-
-    # Connect to PostgreSQL once
-    conn = get_db_conn()
-    if not conn:
-        print("Database connection failed. Exiting...")
-        exit()
-
-    # Parse metrics and process each line
-    for line in metrics_data:
-        if line.startswith("#"):  # Skip comment lines
-            continue
-
-        # Example line format:
-        # ceph_mon_metadata{ceph_daemon="mon.ceph-sangadi-nvme-ixwhtf-node1-installer",hostname="ceph-sangadi-nvme-ixwhtf-node1-installer",public_addr="10.0.65.187",rank="0",ceph_version="ceph version 19.2.0-79.el9cp (4f3da703296998ada04b48f8565da9952ce77eb8) squid (stable)"} 1.0
-
-        print("=================================")
-        print(line)
-        metric_parts = line.rsplit(
-            " ", 1
-        )  # Split only on the last space to separate the value
-        metric_name_and_labels = metric_parts[0]
-        metric_value_str = metric_parts[1]
-
-        # Extract metric name and labels
-        metric_name = metric_name_and_labels.split("{")[
-            0
-        ]  # Extract metric name before '{'
-        metric_labels_str = (
-            metric_name_and_labels.split("{")[1][:-1]
-            if "{" in metric_name_and_labels
-            else ""
-        )  # Extract labels inside '{}'
-
-        # Parse the labels into a dictionary
-        metric_labels = parse_labels(metric_labels_str)
-
-        # Convert the metric value to float
-        try:
-            metric_value = float(metric_value_str)
-        except ValueError:
-            print(f"Error converting '{metric_value_str}' to float")
-            continue
-
-        # Create table name dynamically from metric name
-        table_name = f"{metric_name.lower().replace('_', '')}"  # e.g., ceph_mon_quorum_status_metrics
-        table_name = f"{TABLE_PREFIX}{table_name}{TABLE_SUFFIX}"
-
-        cur = conn.cursor()
-
-        delete_table_query = f"DROP TABLE IF EXISTS {table_name}"
-        cur.execute(delete_table_query)
-
-        # Create the table dynamically based on the metric name if it doesn't exist
-        create_table_query = f"""
-        CREATE TABLE IF NOT EXISTS {table_name} (
-            metric_name VARCHAR NOT NULL,
-            labels JSONB,
-            value DOUBLE PRECISION,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-
-        # Prepare labels as JSONB
-        labels_json = json.dumps(metric_labels)
-
-        cur = conn.cursor()
-        try:
-            # Create the table if it doesn't exist
-            cur.execute(create_table_query)
-            conn.commit()  # Commit the table creation
-
-            # Execute insert query
-            insert_query = f"INSERT INTO {table_name} (metric_name, labels, value) VALUES (%s, %s, %s)"
-            cur.execute(insert_query, (metric_name, labels_json, metric_value))
-            conn.commit()
-            print(
-                f"Inserted {metric_name} with labels {labels_json} and value {metric_value} into {table_name}"
-            )
-
-        except Exception as err:
-            print(f"Database error: {err}")
-            conn.rollback()
-        finally:
-            cur.close()
-
-    # Close the connection
-    conn.close()
+        with open(LOCAL_SAMPLE_METRICS_FILE, "rb") as metrics_file:
+            samples = _collect_samples(metrics_file)
+
+    with db_connection() as conn:
+        return ingest_samples(conn, samples, cluster_id=cluster_ip or LOCAL_CLUSTER_ID)
+
+
+def _collect_samples(source):
+    return [
+        (sample.name, sample.labels, sample.value)
+        for sample in parse_exposition(source)
+    ]
 
 
 if __name__ == "__main__":
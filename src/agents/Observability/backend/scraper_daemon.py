@@ -0,0 +1,154 @@
+"""Background service that keeps the metrics store fed for every registered cluster.
+
+Clusters are registered in the ``ceph_scrape_targets`` table (the UI does this on
+connect). Run from ``src/``:
+
+    uv run -m agents.Observability.backend.scraper_daemon
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from .connection import db_connection
+from .metrics_store import list_scrape_targets
+from .scrape_metricsdata import scrape_metrics
+
+SCRAPE_INTERVAL = float(os.getenv("SCRAPE_INTERVAL_SECONDS", "15"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT_SECONDS", "10"))
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "8"))
+SCRAPE_MAX_BACKOFF = float(os.getenv("SCRAPE_MAX_BACKOFF_SECONDS", "300"))
+TARGETS_REFRESH_INTERVAL = float(os.getenv("SCRAPE_TARGETS_REFRESH_SECONDS", "30"))
+# Every sleep is stretched or shrunk by up to this fraction
+JITTER = 0.1
+
+
+def _jittered(delay):
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class ScraperDaemon:
+    def __init__(
+        self,
+        interval=SCRAPE_INTERVAL,
+        timeout=SCRAPE_TIMEOUT,
+        concurrency=SCRAPE_CONCURRENCY,
+        max_backoff=SCRAPE_MAX_BACKOFF,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="scraper"
+        )
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._intervals: dict[str, float] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def scrape_once(self, cluster_ip):
+        # scrape_metrics is blocking (SSH, HTTP, Postgres), so it runs on a
+        # worker thread. A timed out thread cannot be killed: the caller stops
+        # waiting for it, but its semaphore slot is only freed once the thread
+        # returns, so abandoned scrapes never exceed the concurrency either.
+        await self._semaphore.acquire()
+        try:
+            scrape = asyncio.get_running_loop().run_in_executor(
+                self._executor, scrape_metrics, cluster_ip
+            )
+        except BaseException:
+            self._semaphore.release()
+            raise
+        scrape.add_done_callback(lambda _: self._semaphore.release())
+        return await asyncio.wait_for(asyncio.shield(scrape), self.timeout)
+
+    async def _scrape_loop(self, cluster_ip, interval):
+        # Spread the first scrape of every cluster over one interval
+        await asyncio.sleep(random.uniform(0, interval))
+        failures = 0
+        while True:
+            try:
+                samples = await self.scrape_once(cluster_ip)
+                print(f"Scraped {samples} samples from {cluster_ip}")
+                failures = 0
+                delay = interval
+            except Exception as err:
+                failures += 1
+                delay = min(interval * 2**failures, self.max_backoff)
+                print(
+                    f"❌ Scrape of {cluster_ip} failed ({failures} in a row), "
+                    f"retrying in {delay:.0f}s: {err!r}"
+                )
+            await asyncio.sleep(_jittered(delay))
+
+    def _sync_targets(self, targets):
+        for cluster_ip in list(self._tasks):
+            interval = targets.get(cluster_ip, self.interval) or self.interval
+            if cluster_ip not in targets or self._intervals[cluster_ip] != interval:
+                self._tasks.pop(cluster_ip).cancel()
+                self._intervals.pop(cluster_ip)
+
+        for cluster_ip, interval in targets.items():
+            if cluster_ip not in self._tasks:
+                interval = interval or self.interval
+                print(f"Scheduling {cluster_ip} every {interval}s")
+                self._intervals[cluster_ip] = interval
+                self._tasks[cluster_ip] = asyncio.create_task(
+                    self._scrape_loop(cluster_ip, interval)
+                )
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                targets = await asyncio.to_thread(_load_targets)
+                self._sync_targets(targets)
+            except Exception as err:
+                print(f"❌ Failed to load scrape targets: {err!r}")
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), _jittered(TARGETS_REFRESH_INTERVAL)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _load_targets():
+    with db_connection() as conn:
+        return list_scrape_targets(conn)
+
+
+async def _main(args):
+    daemon = ScraperDaemon(
+        interval=args.interval,
+        timeout=args.timeout,
+        concurrency=args.concurrency,
+        max_backoff=args.max_backoff,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stop)
+    await daemon.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ceph mgr metrics scraper")
+    parser.add_argument("--interval", type=float, default=SCRAPE_INTERVAL)
+    parser.add_argument("--timeout", type=float, default=SCRAPE_TIMEOUT)
+    parser.add_argument("--concurrency", type=int, default=SCRAPE_CONCURRENCY)
+    parser.add_argument("--max-backoff", type=float, default=SCRAPE_MAX_BACKOFF)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
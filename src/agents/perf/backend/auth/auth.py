@@ -1,9 +1,13 @@
+import os
 import sys
 
 from .cephadmin import CephAdminClient
 
 sys.path.append("..")
 
+# ssh, rest or rados, see agents/CephViz/backend/transport.py
+CEPH_TRANSPORT = (os.getenv("CEPH_TRANSPORT") or "ssh").lower()
+
 
 def authenticate(host, user, password):
     """Authenticate ceph admin or dashboard password."""
@@ -12,6 +16,11 @@ def authenticate(host, user, password):
         client = CephAdminClient(host, user, password)
         client.connect()
         print("authetication Successfull...")
+        if CEPH_TRANSPORT != "ssh":
+            # Same execute_command surface, commands go native where they can
+            from agents.CephViz.backend.transport import ClientTransport, make_transport
+
+            return True, make_transport(host, ClientTransport(client), CEPH_TRANSPORT)
         return True, client
     except Exception as e:
         if client:
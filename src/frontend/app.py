@@ -6,11 +6,14 @@ import streamlit as st
 sys.path.append(str(Path(__file__).parent.parent))
 
 
-from agents.Observability.backend.scrape_metricsdata import scrape_metrics
 from frontend.helpers import (
+    forget_cluster,
+    load_registered_clusters,
     process_query,
-    test_ssh_connection,
+    remember_cluster,
+    unregister_cluster_from_scraping,
 )
+from frontend.onboarding import OnboardingJob
 
 
 # Class to handle individual chat sessions
@@ -69,7 +72,8 @@ st.markdown(
 
 # Initialize session state for storing cluster data
 if "cluster_data" not in st.session_state:
-    st.session_state.cluster_data = {}  # Stores {"Cluster 1": "192.168.1.10", ...}
+    # Stores {"Cluster 1": "192.168.1.10", ...}, starting with the clusters from before a restart
+    st.session_state.cluster_data = load_registered_clusters()
 
 # Sidebar: Ceph SSH Authentication Panel
 st.sidebar.markdown("<h2>🔐 Ceph SSH Authentication</h2>", unsafe_allow_html=True)
@@ -87,45 +91,85 @@ with st.sidebar.expander("⚙️ SSH Configuration", expanded=True):
 
     connect_button = st.button("🔗 Connect to Clusters")
 
-# Handle SSH authentication
+
+def next_cluster_name():
+    existing_numbers = [
+        int(name.split(" ")[1]) for name in st.session_state.cluster_data
+    ]
+    return f"Cluster {max(existing_numbers, default=0) + 1}"
+
+
+@st.fragment(run_every=1)
+def onboarding_progress():
+    """Reports the background connect job and adds clusters as they come online."""
+    job = st.session_state.get("onboarding_job")
+    if job is None:
+        return
+
+    # Read before collecting: a cluster that connects in between is collected
+    # now or on the next run, never reported without being stored
+    done = job.done
+    for ip in job.collect():
+        if ip in st.session_state.cluster_data.values():
+            continue
+        cluster_name = next_cluster_name()
+        st.session_state.cluster_data[cluster_name] = ip  # Store correctly
+        remember_cluster(cluster_name, ip, job.username, job.password)
+
+    finished, total, connected, failed = job.progress()
+    if not done:
+        st.progress(
+            finished / total,
+            text=f"🔄 Connecting clusters: {finished}/{total} done, {connected} connected",
+        )
+        return
+
+    st.session_state.onboarding_job = None
+    st.session_state.onboarding_result = (
+        connected,
+        {ip: job.errors[ip] for ip, status in job.status.items() if ip in job.errors and status == "failed"},
+        {ip: job.errors[ip] for ip, status in job.status.items() if ip in job.errors and status == "connected"},
+    )
+    # Refresh the whole page so the connected clusters list picks them up
+    st.rerun(scope="app")
+
+
+# Handle SSH authentication: probing runs in the background, the chat stays usable
 if connect_button:
     if ssh_username and ssh_password and cluster_ips.strip():
+        ip_list = list(
+            dict.fromkeys(ip.strip() for ip in cluster_ips.split("\n") if ip.strip())
+        )  # Remove empty lines and duplicates
+
+        job = st.session_state.get("onboarding_job")
+        busy = job.pending_ips if job else set()
         ip_list = [
-            ip.strip() for ip in cluster_ips.split("\n") if ip.strip()
-        ]  # Remove empty lines
-
-        failed_ips = {}
-
-        for ip in ip_list:
-            scrape_metrics(ip)
-            if (
-                ip in st.session_state.cluster_data.values()
-            ):  # Skip already connected IPs
-                continue
-
-            result = test_ssh_connection(ip, ssh_username, ssh_password)
-            if result is True:
-                # Find the next available cluster name
-                existing_numbers = [
-                    int(name.split(" ")[1]) for name in st.session_state.cluster_data
-                ]
-                next_cluster_number = max(existing_numbers, default=0) + 1
-                cluster_name = f"Cluster {next_cluster_number}"
-
-                st.session_state.cluster_data[cluster_name] = ip  # Store correctly
-            else:
-                failed_ips[ip] = result  # Store error message per IP
-
-        if failed_ips:
-            for ip, error in failed_ips.items():
-                st.sidebar.error(f"❌ Failed to connect to {ip}: {error}")
+            ip
+            for ip in ip_list
+            if ip not in st.session_state.cluster_data.values() and ip not in busy
+        ]  # Skip already connected IPs
+        if job and not job.done:
+            st.sidebar.warning("⏳ Still connecting the previous clusters, try again shortly.")
         elif ip_list:
-            st.sidebar.success(
-                f"✅ Successfully connected to {len(ip_list) - len(failed_ips)} new cluster(s)!"
+            st.session_state.onboarding_job = OnboardingJob(
+                ip_list, ssh_username, ssh_password
             )
     else:
         st.sidebar.error("❌ Please fill in all fields before connecting.")
 
+with st.sidebar:
+    onboarding_progress()
+
+# Outcome of the finished connect job, shown once
+if onboarding_result := st.session_state.pop("onboarding_result", None):
+    connected, failures, warnings = onboarding_result
+    for ip, error in failures.items():
+        st.sidebar.error(f"❌ Failed to connect to {ip}: {error}")
+    for ip, warning in warnings.items():
+        st.sidebar.warning(f"⚠️ {ip}: {warning}")
+    if connected:
+        st.sidebar.success(f"✅ Successfully connected to {connected} new cluster(s)!")
+
 # Show connected clusters at the left bottom
 if st.session_state.cluster_data:
     with st.sidebar.expander("🔗 Connected Ceph Clusters", expanded=True):
@@ -137,9 +181,13 @@ if st.session_state.cluster_data:
 
         if st.button("❌ Disconnect Selected"):
             for cluster_name in selected_clusters:
+                unregister_cluster_from_scraping(
+                    st.session_state.cluster_data[cluster_name]
+                )
                 del st.session_state.cluster_data[
                     cluster_name
                 ]  # Remove from session state
+                forget_cluster(cluster_name)
 
             st.sidebar.success(f"✅ Disconnected {len(selected_clusters)} cluster(s)!")
             st.rerun()  # Refresh UI after removal
@@ -1,14 +1,30 @@
 import paramiko
 import streamlit as st
 
+from agents.CephViz.backend.cluster_registry import (
+    cluster_registry,
+    forget_credentials,
+    store_credentials,
+)
+from agents.Observability.backend.connection import db_connection
+from agents.Observability.backend.metrics_store import (
+    register_scrape_target,
+    unregister_scrape_target,
+)
+from orchestration.answer_cache import answer
 from orchestration.flow import CephAgentsFlow
 
-ceph_agents_flow = CephAgentsFlow()
+def process_query(query: str):
+    """Answer from the cache while the clusters are unchanged, else run the agents."""
 
+    def run_agents():
+        # One flow per request: its state must not mix with concurrent sessions
+        flow = CephAgentsFlow()
+        response = flow.kickoff(inputs={"topic": query})
+        # A specialist that failed or timed out may answer next time
+        return response, not flow.state.unanswered
 
-def process_query(query: str):
-    response = ceph_agents_flow.kickoff(inputs={"topic": query})
-    return response
+    return answer(query, run_agents)
 
 
 def test_ssh_connection(ip, username, password):
@@ -24,6 +40,52 @@ def test_ssh_connection(ip, username, password):
         return str(e)  # Return the error message
 
 
+def register_cluster_for_scraping(ip):
+    """Hands the cluster to the background scraper; the UI never scrapes itself."""
+    try:
+        with db_connection() as conn:
+            register_scrape_target(conn, ip)
+        return True
+    except Exception as e:
+        print(f"❌ Failed to register {ip} for metrics scraping: {e}")
+        return False
+
+
+def unregister_cluster_from_scraping(ip):
+    try:
+        with db_connection() as conn:
+            unregister_scrape_target(conn, ip)
+    except Exception as e:
+        print(f"❌ Failed to unregister {ip} from metrics scraping: {e}")
+
+
+def load_registered_clusters():
+    """{"Cluster 1": "192.168.1.10", ...} of the clusters connected before a restart."""
+    try:
+        return {record.name: record.ip for record in cluster_registry.all()}
+    except Exception as e:
+        print(f"❌ Failed to read the cluster registry: {e}")
+        return {}
+
+
+def remember_cluster(cluster_name, ip, username, password):
+    try:
+        cluster_registry.add(
+            cluster_name, ip, username, store_credentials(ip, username, password)
+        )
+    except Exception as e:
+        print(f"❌ Failed to save {cluster_name} ({ip}) in the cluster registry: {e}")
+
+
+def forget_cluster(cluster_name):
+    try:
+        record = cluster_registry.remove(cluster_name)
+        if record:
+            forget_credentials(record.credentials_ref)
+    except Exception as e:
+        print(f"❌ Failed to remove {cluster_name} from the cluster registry: {e}")
+
+
 # Custom chat message function
 def chat_message(role, content):
     if role == "user":
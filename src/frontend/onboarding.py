@@ -0,0 +1,83 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from frontend.helpers import register_cluster_for_scraping, test_ssh_connection
+
+load_dotenv()
+
+ONBOARDING_WORKERS = int(os.getenv("ONBOARDING_WORKERS", "16"))
+
+# Shared by every browser session, so pasting IPs in several tabs stays bounded
+onboarding_executor = ThreadPoolExecutor(
+    max_workers=ONBOARDING_WORKERS, thread_name_prefix="onboarding"
+)
+
+
+class OnboardingJob:
+    """Connects a batch of clusters in the background, in parallel.
+
+    Every IP is probed over SSH and, when that works, registered for metrics
+    scraping. The UI polls ``progress()`` and picks up connected clusters with
+    ``collect()``; streamlit state is only ever touched from the script thread.
+    """
+
+    def __init__(self, ips, username, password):
+        self.username = username
+        self.password = password
+        self.status = {ip: "pending" for ip in ips}
+        self.errors: dict[str, str] = {}
+        self._collected: set[str] = set()
+        self._lock = threading.Lock()
+        self.futures = [onboarding_executor.submit(self._onboard, ip) for ip in ips]
+
+    def _onboard(self, ip):
+        self._set(ip, "connecting")
+        try:
+            result = test_ssh_connection(ip, self.username, self.password)
+        except Exception as e:
+            result = str(e)
+        if result is not True:
+            with self._lock:
+                self.errors[ip] = result
+            self._set(ip, "failed")
+            return
+        if not register_cluster_for_scraping(ip):
+            # Reachable, just without metrics until the scraper can take it
+            with self._lock:
+                self.errors[ip] = "connected, but could not be registered for metrics scraping"
+        self._set(ip, "connected")
+
+    def _set(self, ip, status):
+        with self._lock:
+            self.status[ip] = status
+
+    def progress(self):
+        """``(finished, total, connected, failed)``."""
+        with self._lock:
+            statuses = list(self.status.values())
+        connected = statuses.count("connected")
+        failed = statuses.count("failed")
+        return connected + failed, len(statuses), connected, failed
+
+    def collect(self):
+        """IPs that connected since the last call."""
+        with self._lock:
+            new = [
+                ip
+                for ip, status in self.status.items()
+                if status == "connected" and ip not in self._collected
+            ]
+            self._collected.update(new)
+        return new
+
+    @property
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    @property
+    def pending_ips(self):
+        with self._lock:
+            return {ip for ip, status in self.status.items() if status in ("pending", "connecting")}
@@ -1,42 +1,74 @@
 import os
+import threading
 
 from crewai import LLM
 from dotenv import load_dotenv
 
+try:
+    import httpx
+    import litellm
+except ImportError:  # both come with crewai, but do not fail without them
+    httpx = litellm = None
+
 load_dotenv()
 
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_SECONDS", "120"))
+
+# (model, api key) -> LLM, shared by every agent of the process
+_clients: dict[tuple[str, str | None], LLM] = {}
+_clients_lock = threading.Lock()
+
+
+def _share_http_pools():
+    """Make litellm, which crewai's LLM calls through, keep its connections alive.
+
+    httpx pools connections per origin, so every provider gets its own pool of
+    warm connections and requests stop paying for a TCP and TLS handshake.
+    """
+    if litellm is None or litellm.client_session is not None:
+        return
+    limits = httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS,
+    )
+    litellm.client_session = httpx.Client(limits=limits, timeout=600)
+    litellm.aclient_session = httpx.AsyncClient(limits=limits, timeout=600)
+
+
+def llm_client(model: str, api_key: str | None):
+    """The process-wide LLM for ``model``, created on first use."""
+    key = (model, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                _share_http_pools()
+                client = _clients[key] = LLM(model=model, api_key=api_key)
+    return client
+
 
 def openai_llm_client(model: str = "openai/gpt-4o-mini"):
     assert model.startswith("openai/"), "Model must start with 'openai/'"
-    return LLM(
-        model=model,
-        api_key=os.getenv("OPENAI_API_KEY"),
-    )
+    return llm_client(model, os.getenv("OPENAI_API_KEY"))
 
 
 def groq_llm_client(model: str = "groq/llama3-70b-8192"):
     assert model.startswith("groq/"), "Model must start with 'groq/'"
-    return LLM(
-        model=model,
-        api_key=os.getenv("GROQ_API_KEY"),
-    )
+    return llm_client(model, os.getenv("GROQ_API_KEY"))
 
 
 def hf_llm_client(model: str = "huggingface/mistralai/Mistral-7B-Instruct-v0.3"):
     assert model.startswith("huggingface/"), "Model must start with 'huggingface/'"
 
-    return LLM(
-        model=model,
-        api_key=os.getenv("HF_TOKEN"),
-    )
+    return llm_client(model, os.getenv("HF_TOKEN"))
 
 
 def gemini_llm_client(model: str = "gemini/gemini-2.0-flash-lite"):
     assert model.startswith("gemini/"), "Model must start with 'gemini/'"
-    return LLM(
-        model=model,
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
+    return llm_client(model, os.getenv("GEMINI_API_KEY"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+"""Answers of the whole agent pipeline, reused while the clusters do not change.
+
+Operators ask the same few questions over and over. An answer is stored with
+the query and a *fingerprint* of the cluster state it was computed from; a
+later query is served from the cache when it means the same thing and the
+fingerprint is unchanged:
+
+* Queries match when their normalised forms are equal, or when their hashed
+  n-gram vectors (see :mod:`orchestration.router`) are at least
+  ANSWER_CACHE_SIMILARITY alike and they mention the same numbers, so
+  "status of cluster 1" never answers "status of cluster 2".
+* The fingerprint holds, per cluster the query is about, the health checks,
+  the mon/osd/fs map epochs and the PG states from ``ceph status``, and the
+  time of the last metrics scrape when the query may be answered from
+  metrics. Any change misses the cache.
+
+The fingerprint costs a ``ceph status`` per cluster, so :func:`answer` only
+waits for it (at most ANSWER_CACHE_FINGERPRINT_TIMEOUT, a failure is a miss)
+when a cached answer to the query exists; otherwise it is computed while the
+agents run, for storing their answer.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from agents.CephViz.backend import session_manager
+from agents.CephViz.backend.cluster_resolver import cluster_resolver
+from agents.CephViz.backend.functionality import ceph_ops, fanout_executor
+from agents.Observability.backend.connection import db_connection
+from agents.Observability.backend.metrics_store import last_scrape_times
+from orchestration.router import cosine, embed, route_query
+from utils.agents import AgentsEnum
+
+load_dotenv()
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+# Upper bound on an answer's age even when the clusters look unchanged
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.85"))
+# How long a query with a cached answer waits for the fingerprint to check it
+ANSWER_CACHE_FINGERPRINT_TIMEOUT = float(
+    os.getenv("ANSWER_CACHE_FINGERPRINT_TIMEOUT_SECONDS", "2")
+)
+
+_WORD = re.compile(r"[a-z0-9_.]+")
+_GLUED_NUMBER = re.compile(r"\bcluster(?=\d)")
+_NUMBER = re.compile(r"\d+(?:\.\d+)*")
+# Words that do not change what is asked
+_FILLER = {
+    "a", "about", "an", "any", "are", "can", "could", "current", "currently", "do",
+    "does", "for", "get", "give", "i", "in", "is", "me", "my", "now", "of", "on",
+    "our", "please", "right", "show", "tell", "the", "there", "to", "us", "we",
+    "what", "whats", "you",
+}  # fmt: skip
+# Agents whose answers depend on the live cluster state, and on the scraped metrics
+_CLUSTER_AGENTS = {AgentsEnum.CEPHVIZ, AgentsEnum.OBSERVABILITY, AgentsEnum.PERFORMANCE}
+_METRICS_AGENTS = {AgentsEnum.OBSERVABILITY}
+
+
+def normalize_query(query):
+    """``"What is the status of Cluster1?"`` -> ``"status cluster 1"``."""
+    query = _GLUED_NUMBER.sub("cluster ", query.lower().replace("'", ""))
+    words = _WORD.findall(query)
+    words = (word.strip(".") for word in words)
+    return " ".join(word for word in words if word and word not in _FILLER)
+
+
+class _Entry(NamedTuple):
+    query: str
+    vector: dict[int, float]
+    numbers: frozenset[str]
+    fingerprint: tuple
+    answer: object
+    stored_at: float
+
+
+class AnswerCache:
+    """Bounded LRU of pipeline answers, matched on meaning and cluster state."""
+
+    def __init__(
+        self,
+        max_entries=ANSWER_CACHE_SIZE,
+        ttl=ANSWER_CACHE_TTL,
+        similarity=ANSWER_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        # "unchecked": a cached answer was found but the fingerprint did not come in time
+        self.metrics = {"hits": 0, "semantic_hits": 0, "misses": 0, "stale": 0, "unchecked": 0}
+
+    def candidate(self, query):
+        """The entry that would answer ``query`` if the clusters are unchanged, or None."""
+        key = normalize_query(query)
+        with self._lock:
+            return self._match(key)
+
+    def lookup(self, query, fingerprint):
+        """The cached answer to ``query`` under ``fingerprint``, or None."""
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._match(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            if entry.fingerprint != fingerprint or now - entry.stored_at > self.ttl:
+                self.metrics["stale"] += 1
+                return None
+            self._entries.move_to_end(entry.query)
+            self.metrics["hits" if entry.query == key else "semantic_hits"] += 1
+            return entry.answer
+
+    def count(self, metric):
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def _match(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        numbers = frozenset(_NUMBER.findall(key))
+        vector = embed(key)
+        similarity, best = max(
+            (
+                (cosine(vector, candidate.vector), candidate)
+                for candidate in self._entries.values()
+                if candidate.numbers == numbers
+            ),
+            key=lambda item: item[0],
+            default=(0.0, None),
+        )
+        return best if similarity >= self.similarity else None
+
+    def store(self, query, fingerprint, answer):
+        key = normalize_query(query)
+        entry = _Entry(
+            key,
+            embed(key),
+            frozenset(_NUMBER.findall(key)),
+            fingerprint,
+            answer,
+            time.monotonic(),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _cluster_fingerprint(ip):
+    try:
+        return ceph_ops.state_fingerprint(ip)
+    except Exception as e:
+        # An unreachable cluster is a state too; the answer changes once it is back
+        return ("unreachable", type(e).__name__)
+
+
+def state_fingerprint(query):
+    """Fingerprint of the cluster state the answer to ``query`` depends on.
+
+    Questions routed only to documentation or bug agents do not depend on it.
+    """
+    route = route_query(query)
+    agents = set(route.agents) if route else set(AgentsEnum)
+    if not agents & _CLUSTER_AGENTS:
+        return ()
+
+    clusters = session_manager.warm_from_registry()
+    names = sorted(cluster_resolver.find_all(query) or clusters)
+    ips = [clusters[name]["ip"] for name in names]
+    fingerprint = list(zip(names, fanout_executor.map(_cluster_fingerprint, ips)))
+
+    if agents & _METRICS_AGENTS:
+        try:
+            with db_connection() as conn:
+                scraped = last_scrape_times(conn)
+            fingerprint.append(("scraped", tuple(scraped.get(ip) for ip in ips)))
+        except Exception as e:
+            print(f"⚠️ Could not read the last scrape times: {e}")
+            fingerprint.append(("scraped", None))
+    return tuple(fingerprint)
+
+
+answer_cache = AnswerCache()
+fingerprint_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="answer-fingerprint")
+
+
+def _fingerprint_result(future, timeout):
+    """The fingerprint computed by ``future``, or None if it failed or took too long."""
+    try:
+        return future.result(timeout=timeout)
+    except Exception as e:
+        print(f"⚠️ No cluster state fingerprint for the answer cache: {e!r}")
+        return None
+
+
+def answer(query, run):
+    """The cached answer to ``query``, else ``run()``'s.
+
+    ``run`` returns ``(answer, cacheable)``. A cacheable answer is stored
+    under the fingerprint computed meanwhile, as soon as that is in.
+    """
+    fingerprint = fingerprint_executor.submit(state_fingerprint, query)
+    if answer_cache.candidate(query) is None:
+        answer_cache.count("misses")
+    else:
+        current = _fingerprint_result(fingerprint, ANSWER_CACHE_FINGERPRINT_TIMEOUT)
+        if current is None:
+            answer_cache.count("unchecked")
+        else:
+            response = answer_cache.lookup(query, current)
+            if response is not None:
+                print(f"✅ Answered from cache: {answer_cache.metrics}")
+                return response
+
+    response, cacheable = run()
+    if cacheable:
+        # Stored once the fingerprint is in, the user does not wait for it
+        def store(future):
+            current = _fingerprint_result(future, 0)
+            if current is not None:
+                answer_cache.store(query, current, response)
+
+        fingerprint.add_done_callback(store)
+    return response
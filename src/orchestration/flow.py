@@ -1,12 +1,28 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from crewai import Agent, Task
 from crewai.flow.flow import Flow, listen, start
 from crewai.flow.persistence import persist
+from dotenv import load_dotenv
 from pydantic import BaseModel
 
 from llm.llm_client import gemini_llm_client
 from orchestration.crew_agents import agent_factory
 from orchestration.orchestrator import ceph_orchestrator
-from utils.agents import AgentsEnum
+from utils.agents import AgentPool, AgentsEnum
+
+load_dotenv()
+
+SPECIALIST_WORKERS = int(os.getenv("SPECIALIST_WORKERS", "10"))
+SPECIALIST_TIMEOUT = float(os.getenv("SPECIALIST_TIMEOUT_SECONDS", "90"))
+
+# Shared by every flow. A specialist past its timeout cannot be interrupted and
+# keeps its worker until it returns, hence the headroom over the agent count.
+specialist_executor = ThreadPoolExecutor(
+    max_workers=SPECIALIST_WORKERS, thread_name_prefix="specialist"
+)
 
 
 class Memory(BaseModel):
@@ -18,12 +34,14 @@ class CephAgentsState(BaseModel):
     topic: str = ""
     chosen_agents: list[AgentsEnum] = []
     opinions: dict[AgentsEnum, str] = {}
+    # Specialists that failed or timed out, with the reason
+    unanswered: dict[AgentsEnum, str] = {}
     response: str = ""
     memory: list[Memory] = []
 
 
-def client_outcome_architect(query: str, opinions: str) -> str:
-    agent = Agent(
+def _build_response_architect():
+    return Agent(
         role="User Response Architect",
         goal="Craft helpful user responses from expert input.",
         backstory="Expert in user service and synthesizing "
@@ -35,16 +53,22 @@ def client_outcome_architect(query: str, opinions: str) -> str:
         verbose=True,
     )
 
-    task = Task(
-        description="Generate user response from user query and "
-        "expert opinions. The users are Ceph users. If expert opinions are technical and detailed enought you can use it to answer the user query. "
-        "Rely on expert input only. If no input, explain to the user why are we not able to help them."
-        f"User Query: {query}\nSpecialists opinions: {opinions}",
-        expected_output="Friendly, accurate user response or explanation why we are not able to help them.",
-        agent=agent,
-    )
 
-    outcome = task.execute_sync()
+response_architects = AgentPool(_build_response_architect)
+
+
+def client_outcome_architect(query: str, opinions: str) -> str:
+    with response_architects.borrow() as agent:
+        task = Task(
+            description="Generate user response from user query and "
+            "expert opinions. The users are Ceph users. If expert opinions are technical and detailed enought you can use it to answer the user query. "
+            "Rely on expert input only. If no input, explain to the user why are we not able to help them."
+            f"User Query: {query}\nSpecialists opinions: {opinions}",
+            expected_output="Friendly, accurate user response or explanation why we are not able to help them.",
+            agent=agent,
+        )
+
+        outcome = task.execute_sync()
 
     return outcome.raw
 
@@ -61,17 +85,55 @@ class CephAgentsFlow(Flow[CephAgentsState]):
 
     @listen(schedule_orchestration)
     def conduct_orchestration(self):
+        """Ask every chosen specialist at once, waiting at most SPECIALIST_TIMEOUT.
+
+        The wait tracks the slowest specialist rather than their sum. Whoever
+        has not answered by then is reported as unanswered and the response is
+        built from the opinions that did arrive.
+        """
+        started = time.monotonic()
+        futures = {
+            specialist_executor.submit(self._ask_specialist, agent_name): agent_name
+            for agent_name in dict.fromkeys(self.state.chosen_agents)
+        }
+        done, pending = wait(futures, timeout=SPECIALIST_TIMEOUT)
+
         opinions: dict[AgentsEnum, str] = {}
-        for agent_name in self.state.chosen_agents:
+        unanswered: dict[AgentsEnum, str] = {}
+        for future in done:
+            agent_name = futures[future]
             try:
-                agent = agent_factory.get_agent(agent_name)
-                opinion = agent.kickoff(messages=self.state.topic)
-                opinions[agent_name] = opinion.raw
-                print(f"Usage Metrics: {opinion.usage_metrics}")
+                opinions[agent_name] = future.result()
             except Exception as e:
                 print(f"\nError with {agent_name}: {e}\n")
-                continue
-        self.state.opinions = opinions
+                unanswered[agent_name] = f"failed: {e}"
+        for future in pending:
+            future.cancel()
+            agent_name = futures[future]
+            print(f"\n⏱️ {agent_name} did not answer within {SPECIALIST_TIMEOUT:.0f}s\n")
+            unanswered[agent_name] = f"no answer within {SPECIALIST_TIMEOUT:.0f}s"
+
+        # Keep the orchestrator's order for the synthesizer
+        self.state.opinions = {
+            agent_name: opinions[agent_name]
+            for agent_name in futures.values()
+            if agent_name in opinions
+        }
+        self.state.unanswered = unanswered
+        print(
+            f"Specialists answered in {time.monotonic() - started:.1f}s: "
+            f"{len(opinions)} of {len(futures)}"
+        )
+
+    def _ask_specialist(self, agent_name: AgentsEnum):
+        started = time.monotonic()
+        with agent_factory.borrow(agent_name) as agent:
+            opinion = agent.kickoff(messages=self.state.topic)
+        print(
+            f"Usage Metrics ({agent_name.value}, {time.monotonic() - started:.1f}s): "
+            f"{opinion.usage_metrics}"
+        )
+        return opinion.raw
 
     @listen(conduct_orchestration)
     def generate_client_response(self):
@@ -80,6 +142,10 @@ class CephAgentsFlow(Flow[CephAgentsState]):
                 f"{agent_name}: {opinion}"
                 for agent_name, opinion in self.state.opinions.items()
             ]
+            + [
+                f"{agent_name}: did not contribute ({reason})"
+                for agent_name, reason in self.state.unanswered.items()
+            ]
         )
 
         client_response = client_outcome_architect(self.state.topic, opinions)
@@ -1,19 +1,27 @@
+import os
 from textwrap import dedent
 from typing import cast
 
 from crewai import Agent, Task
+from dotenv import load_dotenv
 from pydantic import BaseModel
 
 from llm.llm_client import gemini_llm_client
-from utils.agents import AgentsEnum
+from orchestration.router import route_query
+from utils.agents import AgentPool, AgentsEnum
+
+load_dotenv()
+
+# Route clear-cut queries locally and only ask the LLM planner about the rest
+FAST_ROUTING = os.getenv("ORCHESTRATOR_FAST_ROUTING", "true").lower() == "true"
 
 
 class OrchestratorPlan(BaseModel):
     chosen_agents: list[AgentsEnum] = []
 
 
-def ceph_orchestrator(topic: str):
-    agent = Agent(
+def _build_orchestrator_agent():
+    return Agent(
         role="Ceph Orchestrator Manager",
         goal=dedent(
             """Decompose user queries and delegate tasks to the appropriate Ceph agents in order of how task should be executed. 
@@ -32,20 +40,36 @@ def ceph_orchestrator(topic: str):
         max_execution_time=40,
         verbose=True,
     )
-    task = Task(
-        description=dedent(
-            f"""Evaluate the user's Ceph-related query and identify 
-                which Ceph agents are best suited to address the 
-                task. Provide only a list of agent names that should be executed in order.
-                Exclude agents who are not relevant to the Ceph context. 
-                If no agent is needed, return an empty list.\n\n
-                Ceph User Query: {topic}"""
-        ),
-        expected_output="List of names of relevant Ceph agents from the team or an empty list if no agent is needed.",
-        agent=agent,
-        output_pydantic=OrchestratorPlan,
-    )
-    plan = task.execute_sync()
+
+
+orchestrator_agents = AgentPool(_build_orchestrator_agent)
+
+
+def ceph_orchestrator(topic: str):
+    if FAST_ROUTING:
+        route = route_query(topic)
+        if route:
+            print(
+                f"Routed by {route.source} ({route.confidence:.2f}): "
+                f"{[agent.value for agent in route.agents]}"
+            )
+            return route.agents
+
+    with orchestrator_agents.borrow() as agent:
+        task = Task(
+            description=dedent(
+                f"""Evaluate the user's Ceph-related query and identify 
+                    which Ceph agents are best suited to address the 
+                    task. Provide only a list of agent names that should be executed in order.
+                    Exclude agents who are not relevant to the Ceph context. 
+                    If no agent is needed, return an empty list.\n\n
+                    Ceph User Query: {topic}"""
+            ),
+            expected_output="List of names of relevant Ceph agents from the team or an empty list if no agent is needed.",
+            agent=agent,
+            output_pydantic=OrchestratorPlan,
+        )
+        plan = task.execute_sync()
 
     if plan.pydantic:
         plan.pydantic = cast(OrchestratorPlan, plan.pydantic)
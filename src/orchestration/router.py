@@ -0,0 +1,215 @@
+"""Local routing of user queries to specialist agents, ahead of the LLM planner.
+
+Two cheap stages decide most queries without a model call:
+
+1. Keyword rules. A strong rule (a bug id, "tunables", "KCS", ...) routes to
+   its agent outright; a query with strong rules for several agents goes to
+   all of them, in the order they are mentioned.
+2. A hashed n-gram classifier. Queries and a profile of each agent (its
+   description plus example queries) are embedded as L2-normalised vectors of
+   hashed word unigrams, bigrams and character trigrams; the closest profile,
+   nudged by weak rule hits, wins if it clears a similarity floor and a margin
+   over the runner-up.
+
+Anything else is ambiguous and :func:`route_query` returns None, leaving the
+decision to the LLM planner.
+"""
+
+import math
+import os
+import re
+import zlib
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+from utils.agents import AgentsEnum
+
+load_dotenv()
+
+# Similarity floor and margin over the runner-up of a classifier route
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.2"))
+ROUTER_MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.05"))
+
+STRONG = 1.0
+# How much a weak rule hit (weight < STRONG) adds to a classifier similarity
+RULE_BOOST = 0.1
+
+_DIMENSIONS = 1 << 18
+_WORD = re.compile(r"[a-z0-9]+")
+
+RULES: dict[AgentsEnum, list[tuple[str, float]]] = {
+    AgentsEnum.BUG_INTELLIGENCE: [
+        (r"\bbug\s*(id\s*)?#?\s*\d+", STRONG),
+        (r"\b(bugzilla|bz\s*#?\s*\d+)", STRONG),
+        (r"\bbugs?\b", STRONG),
+        (r"\b(regression|fixed\s+in|backport)", 0.5),
+    ],
+    AgentsEnum.CEPHVIZ: [
+        (r"\bcluster\s*\d*\s+(status|health)\b", STRONG),
+        (r"\b(status|health)\s+(of|for)\s+(the\s+)?(ceph\s+)?cluster", STRONG),
+        (r"\bhealth\s+detail\b", STRONG),
+        (r"\b(list|show)\b.*\b(file\s*systems?|cephfs|mds\s+nodes?)\b", STRONG),
+        (r"\b(unhealthy|degraded|stuck)\s+(pgs?|placement\s+groups?)\b", STRONG),
+        (r"\b(fullest|full|nearfull)\s+osds?\b", STRONG),
+        (r"\b(cephfs|filesystem)\s+clients?\b", STRONG),
+        # "is it affecting cluster 1" needs a look at the cluster itself
+        (r"\b(affect|impact|hit)(s|ing)?\b.*\bcluster\s*\d+", STRONG),
+        (r"\bcluster\s*\d+\b", 0.5),
+        (r"\bhealth\b", 0.5),
+        (r"\b(osds?|mds|pgs?)\b", 0.3),
+    ],
+    AgentsEnum.OBSERVABILITY: [
+        (r"\bdisk\s+(occupation|usage|space)\b", STRONG),
+        (r"\b(over|in|during)\s+the\s+(last|past)\b", STRONG),
+        (r"\blast\s+\d+\s*(m|h|d|mins?|minutes?|hours?|days?)\b", STRONG),
+        (r"\b(trends?|time\s*series|history|historical)\b", STRONG),
+        (r"\bpool\s+usage\b", STRONG),
+        (r"\bmetrics?\b", 0.5),
+        (r"\b(mon|mgr|mds|osd|pg|pool)s?\s+status\b", 0.5),
+    ],
+    AgentsEnum.PERFORMANCE: [
+        (r"\btun(e|ing|ables?)\b", STRONG),
+        (r"\b(optimi[sz]e|optimi[sz]ation|bottlenecks?|slow\s+(ops|requests))\b", STRONG),
+        (r"\b(high|low|improve|better)\s+(throughput|latency|iops|performance)\b", STRONG),
+        (r"\bperformance\b", 0.5),
+        (r"\b(throughput|latency|iops)\b", 0.3),
+    ],
+    AgentsEnum.MAVERICK: [
+        (r"\b(documentation|docs?|kcs|knowledge\s*base|solution\s+articles?)\b", STRONG),
+        (r"\bcustomer\s+portal\b", STRONG),
+        (r"\bsupport\s+(tickets?|cases?|pages?)\b", STRONG),
+        (r"\bhow\s+(do\s+i|do\s+you|to|can\s+i)\b", 0.5),
+        (r"\b(configure|configuration|set\s*up|install|deploy|enable)\b", 0.3),
+        (r"\bwhat\s+(is|are)\b", 0.3),
+    ],
+}
+_COMPILED_RULES = {
+    agent: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+    for agent, rules in RULES.items()
+}
+
+PROFILES: dict[AgentsEnum, list[str]] = {
+    AgentsEnum.BUG_INTELLIGENCE: [
+        "Get the bug details for a given bug id",
+        "What is bug 2312345 about and which release fixes it",
+        "Is there a known bug for this crash",
+        "Bugzilla report status and fixed in version",
+    ],
+    AgentsEnum.CEPHVIZ: [
+        "Get the cluster status",
+        "Cluster health of cluster 1",
+        "Show the health detail and warnings of the ceph cluster",
+        "List the OSDs, filesystems, MDS nodes and their state",
+        "Which placement groups are degraded or stuck",
+        "Compare cluster 1 and cluster 2",
+        "How many monitors, managers and OSDs are up and in",
+    ],
+    AgentsEnum.OBSERVABILITY: [
+        "Get the disk occupation, osd status, mds status, mgr status, mon status, "
+        "pg status, pool status and pool usage",
+        "Disk usage of every OSD over the last hour",
+        "Show the metrics trend of pool usage for the past day",
+        "Graph of the read and write IOPS over time",
+        "How did the number of PGs change during the last week",
+    ],
+    AgentsEnum.PERFORMANCE: [
+        "Get the relevant suggestions on cluster performance tunings",
+        "Which tunables improve throughput for large sequential writes",
+        "How to reduce latency of small random IO",
+        "Optimize the cluster for high throughput workloads",
+        "Recommended bluestore cache and osd memory target settings",
+    ],
+    AgentsEnum.MAVERICK: [
+        "Get the relevant documentation, support pages and Red Hat Customer Portal "
+        "knowledge base (KCS) articles related to Ceph clusters",
+        "How to configure sync modules in multisite",
+        "What are placement groups and how does CRUSH work",
+        "Find customer portal issues labeled as performance",
+        "Documentation on setting up RGW multisite replication",
+    ],
+}
+
+
+class Route(NamedTuple):
+    agents: list[AgentsEnum]
+    source: str  # "rules" or "classifier"
+    confidence: float
+
+
+def embed(text):
+    """Sparse, L2-normalised hashed n-gram vector of ``text``: {bucket: weight}."""
+    words = _WORD.findall(text.lower())
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [padded[i : i + 3] for i in range(len(padded) - 2)]
+
+    vector: dict[int, float] = {}
+    for feature in features:
+        bucket = zlib.crc32(feature.encode()) % _DIMENSIONS
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+def cosine(a, b):
+    """Cosine similarity of two vectors from :func:`embed`."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+def _centroid(texts):
+    total: dict[int, float] = {}
+    for text in texts:
+        for bucket, weight in embed(text).items():
+            total[bucket] = total.get(bucket, 0.0) + weight
+    norm = math.sqrt(sum(weight * weight for weight in total.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in total.items()}
+
+
+_CENTROIDS = {agent: _centroid(texts) for agent, texts in PROFILES.items()}
+
+
+def rule_scores(query):
+    """``{agent: (score, position of the first hit)}`` of the agents whose rules match."""
+    scores = {}
+    for agent, rules in _COMPILED_RULES.items():
+        score, first = 0.0, None
+        for pattern, weight in rules:
+            if match := pattern.search(query):
+                score += weight
+                first = match.start() if first is None else min(first, match.start())
+        if score:
+            scores[agent] = (score, first)
+    return scores
+
+
+def similarities(query):
+    """Cosine similarity of ``query`` to each agent profile."""
+    vector = embed(query)
+    return {agent: cosine(vector, centroid) for agent, centroid in _CENTROIDS.items()}
+
+
+def route_query(query, min_similarity=ROUTER_MIN_SIMILARITY, min_margin=ROUTER_MIN_MARGIN):
+    """A confident :class:`Route` for ``query``, or None to ask the LLM planner."""
+    scores = rule_scores(query)
+    strong = [agent for agent, (score, _) in scores.items() if score >= STRONG]
+    if strong:
+        strong.sort(key=lambda agent: scores[agent][1])
+        return Route(strong, "rules", min(scores[agent][0] for agent in strong))
+
+    ranked = sorted(
+        (
+            (similarity + RULE_BOOST * scores.get(agent, (0.0, None))[0], agent)
+            for agent, similarity in similarities(query).items()
+        ),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+    (best, agent), (runner_up, _) = ranked[0], ranked[1]
+    if best >= min_similarity and best - runner_up >= min_margin:
+        return Route([agent], "classifier", round(best - runner_up, 3))
+    return None
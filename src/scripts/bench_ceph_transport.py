@@ -0,0 +1,83 @@
+"""Per-command latency of the CephViz transports against a live cluster.
+
+Runs the read-only commands the CephViz tools send through each transport and
+prints the median and p95 latency. The native transports need the restful
+module (CEPH_RESTFUL_KEY) or python3-rados and a keyring on this host.
+
+    cd src/
+    uv run scripts/bench_ceph_transport.py 10.0.0.1 --transports ssh rest rados
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agents.CephViz.backend.ssh_pool import ssh_sessions
+from agents.CephViz.backend.transport import (
+    MgrRestTransport,
+    RadosTransport,
+    SSHTransport,
+    active_mgr,
+)
+
+COMMANDS = [
+    "ceph status -f json",
+    "ceph health detail -f json",
+    "ceph osd tree -f json",
+    "ceph df -f json",
+    "ceph fs ls -f json",
+]
+
+
+def build(kind, host, ssh):
+    if kind == "ssh":
+        return ssh
+    if kind == "rest":
+        return MgrRestTransport(lambda: active_mgr(ssh))
+    if kind == "rados":
+        return RadosTransport(host)
+    raise ValueError(f"Unknown transport {kind!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("host")
+    parser.add_argument("--user", default=os.getenv("CEPH_SSH_USER", "root"))
+    parser.add_argument("--password", default=os.getenv("CEPH_SSH_PASSWORD"))
+    parser.add_argument("--transports", nargs="+", default=["ssh", "rest", "rados"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    ssh_sessions.register(args.host, args.user, args.password)
+    ssh = SSHTransport(args.host)
+
+    print(f"{'transport':>10} {'command':<30} {'median ms':>10} {'p95 ms':>8}")
+    for kind in args.transports:
+        try:
+            transport = build(kind, args.host, ssh)
+        except Exception as e:
+            print(f"{kind:>10} unavailable: {e}")
+            continue
+        for command in COMMANDS:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                transport.run(command)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(
+                f"{kind:>10} {command:<30} {statistics.median(timings):>10.1f} {p95:>8.1f}"
+            )
+        if transport is not ssh:
+            transport.close()
+    ssh_sessions.close()
+
+
+if __name__ == "__main__":
+    main()
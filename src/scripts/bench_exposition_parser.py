@@ -0,0 +1,76 @@
+"""Throughput of the Observability exposition parser.
+
+Replicates data/sample_metrics.txt up to the requested line counts and compares
+the streaming parser against the previous regex based line parsing.
+
+    cd src/
+    uv run scripts/bench_exposition_parser.py --lines 10000 100000 1000000
+"""
+
+import argparse
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from agents.Observability.backend.exposition_parser import parse_exposition
+
+SAMPLE_METRICS_FILE = Path(__file__).parent.parent.parent / "data" / "sample_metrics.txt"
+LABEL_PATTERN = re.compile(r'([a-zA-Z0-9_]+)="([^"]+)"')
+
+
+def legacy_parse(payload):
+    """The regex/split based parsing scrape_metrics used before."""
+    samples = []
+    for line in payload.decode().splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_and_labels, _, value = line.rpartition(" ")
+        name = name_and_labels.split("{")[0]
+        labels_str = name_and_labels.split("{")[1][:-1] if "{" in name_and_labels else ""
+        labels = dict(LABEL_PATTERN.findall(labels_str))
+        samples.append((name, labels, float(value)))
+    return samples
+
+
+def build_payload(target_lines):
+    lines = SAMPLE_METRICS_FILE.read_bytes().splitlines(keepends=True)
+    repeats, remainder = divmod(target_lines, len(lines))
+    return b"".join(lines * repeats + lines[:remainder])
+
+
+def timed(func):
+    start = time.perf_counter()
+    count = func()
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--lines", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'lines':>10} {'parser':>10} {'samples':>10} {'seconds':>9} {'lines/s':>12}")
+    for target_lines in args.lines:
+        payload = build_payload(target_lines)
+        runs = {
+            "streaming": lambda payload=payload: sum(
+                1 for _ in parse_exposition(io.BytesIO(payload), metadata={})
+            ),
+            "regex": lambda payload=payload: len(legacy_parse(payload)),
+        }
+        for name, run in runs.items():
+            count, elapsed = timed(run)
+            print(
+                f"{target_lines:>10} {name:>10} {count:>10} {elapsed:>9.3f} "
+                f"{target_lines / elapsed:>12,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
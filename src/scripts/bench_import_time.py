@@ -0,0 +1,110 @@
+"""Startup cost of the orchestrator: import time and the agents it builds.
+
+Each module is imported in a fresh interpreter, several times, and the wall
+time of the import is reported together with the heavy libraries it pulled in
+(embedding models, FAISS, Bugzilla, agno, Ollama). With --build, the time to
+build each specialist agent on first use is measured the same way.
+
+    cd src/
+    uv run scripts/bench_import_time.py --repeat 5 --build
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).parent.parent
+sys.path.append(str(SRC))
+
+DEFAULT_MODULES = [
+    "orchestration.router",
+    "orchestration.crew_agents",
+    "orchestration.flow",
+    "frontend.helpers",
+]
+# Libraries that only the specialist agents need
+HEAVY_MODULES = [
+    "sentence_transformers",
+    "faiss",
+    "bugzilla",
+    "agno",
+    "langchain_community.llms",
+]
+
+_IMPORT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+_BUILD = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+from orchestration.crew_agents import agent_factory
+started = time.perf_counter()
+agent_factory.get_agent({agent!r})
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def _measure(code, repeat):
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, cwd=SRC
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return None, error[-1] if error else f"exit status {result.returncode}"
+        # Modules may print while importing, the measurement is the last line
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return runs, None
+
+
+def _report(label, runs, error):
+    if error:
+        print(f"  {label:<34} failed: {error}")
+        return
+    seconds = [run["seconds"] for run in runs]
+    heavy = ", ".join(runs[-1]["heavy"]) or "-"
+    print(
+        f"  {label:<34} median {statistics.median(seconds):6.2f}s  "
+        f"max {max(seconds):6.2f}s  heavy: {heavy}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--build", action="store_true", help="also time building each agent"
+    )
+    args = parser.parse_args()
+
+    print("import time (fresh interpreter per run):")
+    for module in args.modules:
+        code = _IMPORT.format(src=str(SRC), module=module, heavy=HEAVY_MODULES)
+        _report(module, *_measure(code, args.repeat))
+
+    if args.build:
+        # Not imported at the top: its own import time is what is measured
+        from utils.agents import AgentsEnum
+
+        print("\nfirst use of each agent, after importing orchestration.crew_agents:")
+        for agent in AgentsEnum:
+            code = _BUILD.format(src=str(SRC), agent=agent.value, heavy=HEAVY_MODULES)
+            _report(agent.value, *_measure(code, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Routing accuracy and latency of the local router against a labelled query set.
+
+Every query is routed by orchestration.router; the ones it is not confident
+about would go to the LLM planner. Prints the share of queries routed locally,
+the accuracy of those routes, the misroutes and the per-query latency.
+
+    cd src/
+    uv run scripts/bench_router.py --repeat 200
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from orchestration.router import route_query
+from utils.agents import AgentsEnum
+
+BUG = AgentsEnum.BUG_INTELLIGENCE
+VIZ = AgentsEnum.CEPHVIZ
+OBS = AgentsEnum.OBSERVABILITY
+PERF = AgentsEnum.PERFORMANCE
+MAV = AgentsEnum.MAVERICK
+
+# Queries and the agents that should answer them, in order. Kept apart from
+# the router's profile examples so the classifier is not scored on its own data.
+LABELLED_QUERIES = [
+    ("cluster health of cluster 1", [VIZ]),
+    ("What is the status of the cluster 1 and cluster 2?", [VIZ]),
+    ("Give me cluster health of the cluster 1.", [VIZ]),
+    ("show health detail for Cluster 2", [VIZ]),
+    ("list the filesystems on cluster 1", [VIZ]),
+    ("are there any degraded pgs right now", [VIZ]),
+    ("which OSDs are nearfull on cluster 3", [VIZ]),
+    ("list cephfs clients connected to cluster 1", [VIZ]),
+    ("how many OSDs are down in cluster 2", [VIZ]),
+    ("is the ceph cluster healthy", [VIZ]),
+    ("Give me all disk occupation for cluster 1.", [OBS]),
+    ("pool usage of cluster 2", [OBS]),
+    ("show the IOPS over the last 6 hours", [OBS]),
+    ("how has disk usage changed in the past week", [OBS]),
+    ("metrics trend for osd.3 during the last 30 minutes", [OBS]),
+    ("historical read throughput of the rbd pool", [OBS]),
+    ("What is the bug information for bug id 12345?", [BUG]),
+    ("details of BZ 2298765", [BUG]),
+    ("are there known bugs with bluestore compression", [BUG]),
+    ("What is the bug information for bug id 12345 and is it affecting in the cluster 1?", [BUG, VIZ]),
+    ("Give me some performance tunables for the cluster 1 to handle high throughput workloads", [PERF]),
+    ("how do I tune osd_memory_target", [PERF]),
+    ("optimize rgw for small objects", [PERF]),
+    ("we see slow ops, where is the bottleneck", [PERF]),
+    ("improve latency for databases on rbd", [PERF]),
+    ("What are sync modules? And give me list of support tickets related to this?", [MAV]),
+    ("Find all customer portal issues that are labeled as performance", [MAV]),
+    ("documentation for cephadm host maintenance mode", [MAV]),
+    ("is there a KCS article about mon clock skew", [MAV]),
+    ("how to set up rgw multisite", [MAV]),
+    ("what is a placement group", [MAV]),
+    ("how do I enable the dashboard module", [MAV]),
+    ("explain erasure coding profiles", [MAV]),
+    ("what does HEALTH_WARN mean", [MAV]),
+    ("compare cluster 1 and cluster 2", [VIZ]),
+    ("hello", []),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    local = correct = 0
+    by_source = {"rules": 0, "classifier": 0}
+    for query, expected in LABELLED_QUERIES:
+        route = route_query(query)
+        if route is None:
+            print(f"  -> LLM       {query}")
+            continue
+        local += 1
+        by_source[route.source] += 1
+        if route.agents == expected:
+            correct += 1
+        else:
+            got = ", ".join(agent.value for agent in route.agents)
+            want = ", ".join(agent.value for agent in expected) or "none"
+            print(f"  misrouted   {query}\n              got {got}, expected {want}")
+
+    timings = []
+    for _ in range(args.repeat):
+        for query, _ in LABELLED_QUERIES:
+            started = time.perf_counter()
+            route_query(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+
+    total = len(LABELLED_QUERIES)
+    print(f"\nrouted locally: {local}/{total} ({local / total:.0%}), {by_source}")
+    print(f"accuracy of local routes: {correct}/{local} ({correct / max(local, 1):.0%})")
+    print(
+        f"latency: median {statistics.median(timings):.0f} µs, "
+        f"p99 {timings[int(len(timings) * 0.99) - 1]:.0f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import queue
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
 from enum import Enum
 
 from crewai import Agent
@@ -16,11 +20,55 @@ class AgentsEnum(Enum):
 
 
 class AgentFactory:
+    """Agents by name, each built by its registered builder on first use.
+
+    Building an agent imports its tools, which can load models or log in to
+    remote services, so only the agents a query is routed to are built. Like
+    the orchestrator and the synthesizer, a specialist keeps state between
+    the tasks it runs, so every request borrows one from the agent's
+    :class:`AgentPool` instead of sharing a single instance.
+    """
+
     def __init__(self):
+        # Agents added already built, shared by every request as they are
         self.agents: dict[AgentsEnum, Agent] = {}
+        self.pools: dict[AgentsEnum, AgentPool] = {}
+
+    @contextmanager
+    def borrow(self, agent_name: AgentsEnum | str):
+        if isinstance(agent_name, str):
+            agent_name = AgentsEnum(agent_name)
 
-    def get_agent(self, agent_name: AgentsEnum):
-        return self.agents[agent_name]
+        if agent_name in self.agents:
+            yield self.agents[agent_name]
+            return
+        with self.pools[agent_name].borrow() as agent:
+            yield agent
+
+    def get_agent(self, agent_name: AgentsEnum | str):
+        """An agent for a single caller; concurrent requests use :meth:`borrow`."""
+        if isinstance(agent_name, str):
+            agent_name = AgentsEnum(agent_name)
+
+        if agent_name in self.agents:
+            return self.agents[agent_name]
+        return self.pools[agent_name].build()
+
+    def register(self, agent_name: AgentsEnum | str, build: Callable[[], Agent]):
+        if isinstance(agent_name, str):
+            agent_name = AgentsEnum(agent_name)
+
+        def timed_build():
+            started = time.perf_counter()
+            agent = build()
+            print(
+                f"🛠️ Built a {agent_name.value} agent in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+            return agent
+
+        self.pools[agent_name] = AgentPool(timed_build)
+        self.agents.pop(agent_name, None)
 
     def add_agent(self, agent_name: AgentsEnum | str, agent: Agent):
         if isinstance(agent_name, str):
@@ -32,15 +80,48 @@ class AgentFactory:
         if isinstance(agent_name, str):
             agent_name = AgentsEnum(agent_name)
 
-        if agent_name not in self.agents:
+        if agent_name not in self.agents and agent_name not in self.pools:
             raise ValueError(f"Agent {agent_name} not found")
-        del self.agents[agent_name]
+        self.agents.pop(agent_name, None)
+        self.pools.pop(agent_name, None)
 
     def get_all_agents(self):
-        return self.agents
+        """An agent of every kind, building the ones that are not added."""
+        return {
+            agent_name: self.get_agent(agent_name)
+            for agent_name in {**self.pools, **self.agents}
+        }
 
     def get_agent_names(self):
-        return [agent_name.value for agent_name in self.agents]
+        """Names of the available agents, built or not."""
+        return [agent_name.value for agent_name in {**self.pools, **self.agents}]
+
+
+class AgentPool:
+    """Prebuilt agents of one kind, each lent to a single request at a time.
+
+    Building a crewai Agent is not free and an agent keeps state between the
+    tasks it runs, so agents are reused but never shared by concurrent
+    requests. The pool grows to the peak number of concurrent requests.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._idle: queue.SimpleQueue[Agent] = queue.SimpleQueue()
+
+    @contextmanager
+    def borrow(self):
+        try:
+            agent = self._idle.get_nowait()
+        except queue.Empty:
+            agent = self.build()
+        try:
+            yield agent
+        finally:
+            # Results of the tools of this request must not leak into the next one
+            if getattr(agent, "tools_results", None):
+                agent.tools_results = []
+            self._idle.put(agent)
 
 
 class AgentBuilder:
@@ -0,0 +1,121 @@
+import pytest
+
+from agents.CephViz.backend.command_cache import command_cache
+from agents.CephViz.backend.functionality import CephOperations
+from agents.CephViz.backend.models import FsClient, MdsMemory, split_tell_output
+from agents.CephViz.backend.transport import FakeTransport
+
+CLUSTER = "10.0.0.1"
+SESSION_LS = "ceph tell mds.* session ls -f json"
+MDS_MEM = "ceph tell mds.* perf dump mds_mem -f json"
+
+SESSION = (
+    '[{"id": 4305, "state": "open", "num_caps": 12, "client_metadata": '
+    '{"hostname": "node1", "mount_point": "/mnt/fs", "root": "/", "ceph_version": "19.2.0"}}]'
+)
+
+
+@pytest.fixture
+def ops():
+    ops = CephOperations()
+    yield ops
+    command_cache.invalidate(CLUSTER)
+
+
+def answering(ops, responses):
+    ops.transports[CLUSTER] = FakeTransport(responses)
+    return ops
+
+
+def test_split_tell_output_by_daemon():
+    output = f"mds.a: {SESSION}\nmds.b: []\n"
+    replies = split_tell_output(output)
+    assert list(replies) == ["mds.a", "mds.b"]
+    assert replies["mds.a"][0]["id"] == 4305
+    assert replies["mds.b"] == []
+
+
+def test_split_tell_output_keeps_daemons_that_printed_nothing():
+    assert split_tell_output("mds.a:\nmds.b: []\n") == {"mds.a": None, "mds.b": []}
+    assert split_tell_output("mds.a: \n") == {"mds.a": None}
+
+
+def test_split_tell_output_of_a_single_decoded_reply():
+    assert split_tell_output([]) == {"": []}
+
+
+def test_split_tell_output_rejects_what_it_cannot_parse():
+    with pytest.raises(ValueError):
+        split_tell_output("mds.a: Error EPERM: problem getting command descriptions\n")
+    with pytest.raises(ValueError):
+        split_tell_output("Error ENOENT: no mds matched\n")
+
+
+def test_sessions_of_every_mds(ops):
+    answering(ops, {SESSION_LS: f"mds.a: {SESSION}\nmds.b: []\nmds.c:\n"})
+    result = ops.list_filesystem_clients(CLUSTER)
+    assert result["output"] == [
+        {
+            "mds": "mds.a",
+            "id": 4305,
+            "hostname": "node1",
+            "mount_point": "/mnt/fs",
+            "root": "/",
+            "state": "open",
+            "num_caps": 12,
+            "version": "19.2.0",
+        }
+    ]
+
+
+def test_no_sessions_is_an_empty_list(ops):
+    answering(ops, {SESSION_LS: "mds.a: []\nmds.b: []\n"})
+    assert ops.list_filesystem_clients(CLUSTER)["output"] == []
+
+
+def test_unparsed_tell_output_is_passed_through(ops):
+    raw = "mds.a: Error EINVAL: unrecognized command\n"
+    answering(ops, {SESSION_LS: raw})
+    assert ops.list_filesystem_clients(CLUSTER)["output"] == raw
+
+
+def test_memory_of_every_mds(ops):
+    answering(
+        ops,
+        {
+            MDS_MEM: 'mds.a: {"mds_mem": {"rss": 524288, "heap": 65536, "ino": 10, '
+            '"dn": 11, "dir": 2, "cap": 5}}\nmds.b: {}\nmds.c:\n'
+        },
+    )
+    assert ops.get_mds_memory_usage(CLUSTER)["output"] == [
+        {
+            "mds": "mds.a",
+            "rss_kb": 524288,
+            "heap_kb": 65536,
+            "inodes": 10,
+            "dentries": 11,
+            "dirs": 2,
+            "caps": 5,
+        }
+    ]
+
+
+def test_tell_models_skip_empty_replies():
+    assert FsClient.list_from_tell("mds.a:\n") == []
+    assert MdsMemory.list_from_tell("mds.a:\n") == []
+
+
+def test_failed_commands_are_not_cached(ops):
+    answering(ops, {"ceph fs get nope -f json": (2, "", "Error ENOENT: filesystem 'nope' not found")})
+    for _ in range(2):
+        result = ops.run_ceph_command(CLUSTER, "ceph fs get nope -f json")
+        assert result["exit_status"] == 2
+        assert "ENOENT" in result["error"]
+    assert len(ops.transports[CLUSTER].calls) == 2
+
+
+def test_successful_commands_are_cached(ops):
+    answering(ops, {"ceph fs ls -f json": [{"name": "cephfs"}]})
+    for _ in range(2):
+        assert ops.run_ceph_command(CLUSTER, "ceph fs ls -f json")["output"] == [{"name": "cephfs"}]
+    assert len(ops.transports[CLUSTER].calls) == 1
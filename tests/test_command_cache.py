@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from agents.CephViz.backend.command_cache import CommandCache
+
+TTLS = {"ceph status": 60, "ceph fs": 60, "ceph fs status": 5}
+
+
+class Counter:
+    def __init__(self, result=None):
+        self.calls = 0
+        self.result = result
+
+    def __call__(self):
+        self.calls += 1
+        return self.result if self.result is not None else {"output": self.calls}
+
+
+def test_ttl_of_the_longest_matching_prefix():
+    cache = CommandCache(TTLS)
+    assert cache.ttl_for("ceph fs status -f json") == 5
+    assert cache.ttl_for("ceph fs ls") == 60
+    assert cache.ttl_for("ceph  status") == 60
+    assert cache.ttl_for("ceph statusx") == 0
+    assert cache.ttl_for("ceph osd pool create x") == 0
+
+
+def test_cached_within_ttl_and_per_cluster():
+    cache, run = CommandCache(TTLS), Counter()
+    assert cache.get_or_run("a", "ceph status -f json", run) == {"output": 1}
+    assert cache.get_or_run("a", "ceph  status -f json-pretty", run) == {"output": 1}
+    assert cache.get_or_run("b", "ceph status -f json", run) == {"output": 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_uncacheable_commands_always_run():
+    cache, run = CommandCache(TTLS), Counter()
+    cache.get_or_run("a", "ceph osd out 3", run)
+    cache.get_or_run("a", "ceph osd out 3", run)
+    assert run.calls == 2
+
+
+def test_results_failing_the_cacheable_check_are_not_kept():
+    cache, run = CommandCache(TTLS), Counter({"error": "timeout"})
+    cache.get_or_run("a", "ceph status", run, cacheable=lambda result: "output" in result)
+    cache.get_or_run("a", "ceph status", run, cacheable=lambda result: "output" in result)
+    assert run.calls == 2
+
+
+def test_concurrent_callers_share_one_execution():
+    cache = CommandCache(TTLS)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def run():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"output": "status"}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_run("a", "ceph status", run)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(cache.get_or_run("a", "ceph status", run)))
+        for _ in range(4)
+    ]
+    for follower in followers:
+        follower.start()
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [{"output": "status"}] * 5
+
+
+def test_followers_get_the_leaders_exception():
+    cache = CommandCache(TTLS)
+    started, release = threading.Event(), threading.Event()
+
+    def run():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("ssh dropped")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_run("a", "ceph status", run)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["ssh dropped", "ssh dropped"]
+    assert cache.peek("a", "ceph status") is None
+
+
+def test_invalidate_one_cluster_or_one_command():
+    cache, run = CommandCache(TTLS), Counter()
+    for cluster in ("a", "b"):
+        cache.get_or_run(cluster, "ceph status", run)
+        cache.get_or_run(cluster, "ceph fs ls", run)
+
+    cache.invalidate("a", "ceph fs ls")
+    assert cache.peek("a", "ceph fs ls") is None
+    assert cache.peek("a", "ceph status") is not None
+
+    cache.invalidate("a")
+    assert cache.peek("a", "ceph status") is None
+    assert cache.peek("b", "ceph status") is not None
+
+    cache.invalidate()
+    assert cache.peek("b", "ceph fs ls") is None
+
+
+def test_a_result_racing_an_invalidation_is_not_stored():
+    cache = CommandCache(TTLS)
+
+    def run():
+        cache.invalidate("a")  # e.g. a write to the cluster while this ran
+        return {"output": "before the write"}
+
+    assert cache.get_or_run("a", "ceph status", run) == {"output": "before the write"}
+    assert cache.peek("a", "ceph status") is None
+
+
+@pytest.mark.parametrize("same_generation", [True, False])
+def test_store_checks_the_generation(same_generation):
+    cache = CommandCache(TTLS)
+    generation = cache.generation
+    if not same_generation:
+        cache.invalidate("a")
+    cache.store("a", "ceph status", {"output": 1}, generation)
+    assert (cache.peek("a", "ceph status") is not None) == same_generation
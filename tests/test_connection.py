@@ -0,0 +1,107 @@
+"""Checking connections out of the shared pool, against a fake psycopg2."""
+
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class Error(Exception):
+    pass
+
+
+class OperationalError(Error):
+    pass
+
+
+class PoolError(Error):
+    pass
+
+
+class FakeConnection:
+    def __init__(self, healthy):
+        self.healthy = healthy
+        self.closed = 0
+
+    def cursor(self):
+        if not self.healthy:
+            raise OperationalError("server closed the connection unexpectedly")
+        return self
+
+    def execute(self, query):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakePool:
+    """Hands out idle connections last in, first out, like ThreadedConnectionPool."""
+
+    def __init__(self, idle, fresh_healthy=True):
+        self._pool = list(idle)
+        self.fresh_healthy = fresh_healthy
+        self.opened = 0
+        self.discarded = []
+
+    def getconn(self):
+        if self._pool:
+            return self._pool.pop()
+        self.opened += 1
+        return FakeConnection(self.fresh_healthy)
+
+    def putconn(self, conn, close=False):
+        if close:
+            self.discarded.append(conn)
+        else:
+            self._pool.append(conn)
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    psycopg2 = types.ModuleType("psycopg2")
+    psycopg2.Error, psycopg2.OperationalError = Error, OperationalError
+    pool = types.ModuleType("psycopg2.pool")
+    pool.PoolError, pool.ThreadedConnectionPool = PoolError, FakePool
+    sqlalchemy = types.ModuleType("sqlalchemy")
+    sqlalchemy.create_engine, sqlalchemy.event = None, None
+    for module in (psycopg2, pool, sqlalchemy):
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+    name = "agents.Observability.backend.connection"
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module(name)
+    yield module
+    sys.modules.pop(name, None)
+
+
+def test_dead_idle_connections_are_all_replaced(connection):
+    dead = [FakeConnection(healthy=False) for _ in range(3)]
+    connection._pool = FakePool(dead)
+    conn = connection._checkout()
+    assert conn.healthy
+    assert connection._pool.opened == 1
+    assert connection._pool.discarded == dead[::-1]
+
+
+def test_healthy_idle_connection_is_reused(connection):
+    live = FakeConnection(healthy=True)
+    connection._pool = FakePool([FakeConnection(healthy=False), live])
+    assert connection._checkout() is live
+    assert connection._pool.opened == 0
+
+
+def test_no_healthy_connection_frees_the_slot(connection):
+    connection._pool = FakePool([FakeConnection(healthy=False)], fresh_healthy=False)
+    with pytest.raises(OperationalError):
+        connection._checkout()
+    assert len(connection._pool.discarded) == 2
+    assert connection.get_db_conn() is None
+    # Every failed checkout gave its slot back
+    assert connection._pool_slots._value == connection._POOL_SLOTS
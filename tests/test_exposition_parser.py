@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from agents.Observability.backend.exposition_parser import (
+    ExpositionParseError,
+    MetricMetadata,
+    Sample,
+    iter_lines,
+    parse_exposition,
+)
+
+EXPOSITION = b"""# HELP ceph_osd_up OSD status up
+# TYPE ceph_osd_up gauge
+ceph_osd_up{ceph_daemon="osd.0"} 1.0
+ceph_osd_up{ceph_daemon="osd.1"} 0.0
+# a plain comment
+ceph_health_status 0.0 1700000000000
+
+ceph_pool_metadata{pool_id="1",name="rbd \\"fast\\"",description="a\\\\b\\nc"} 1.0
+ceph_osd_apply_latency_ms{ceph_daemon="osd.0"} NaN
+ceph_osd_numpg{ceph_daemon="osd.0"} +Inf
+"""
+
+
+def test_samples():
+    samples = list(parse_exposition(EXPOSITION))
+    assert samples[:3] == [
+        Sample("ceph_osd_up", {"ceph_daemon": "osd.0"}, 1.0, None),
+        Sample("ceph_osd_up", {"ceph_daemon": "osd.1"}, 0.0, None),
+        Sample("ceph_health_status", {}, 0.0, 1700000000000),
+    ]
+    assert samples[3].labels == {"pool_id": "1", "name": 'rbd "fast"', "description": "a\\b\nc"}
+    assert math.isnan(samples[4].value)
+    assert samples[5].value == math.inf
+
+
+def test_metadata():
+    metadata = {}
+    list(parse_exposition(EXPOSITION, metadata))
+    assert metadata == {"ceph_osd_up": MetricMetadata("gauge", "OSD status up")}
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64])
+def test_same_samples_from_any_chunking(size):
+    chunks = [EXPOSITION[i : i + size] for i in range(0, len(EXPOSITION), size)]
+    # repr, since NaN != NaN
+    assert repr(list(parse_exposition(iter(chunks)))) == repr(list(parse_exposition(EXPOSITION)))
+
+
+def test_multibyte_character_split_between_chunks():
+    data = 'm{l="ü"} 1\n'.encode()
+    split = data.index("ü".encode()) + 1
+    assert list(iter_lines([data[:split], data[split:]])) == ['m{l="ü"} 1']
+
+
+def test_last_line_without_newline():
+    assert list(parse_exposition(b"a 1\nb 2")) == [Sample("a", {}, 1.0, None), Sample("b", {}, 2.0, None)]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        b"ceph_osd_up{ceph_daemon=\"osd.0\"}\n",
+        b"ceph_osd_up one\n",
+        b'm{l="x\\"} 1\n',
+        # Pairs the fast path would otherwise skip
+        b'ceph_osd_up{ceph_daemon="osd.0",broken} 1\n',
+        b"ceph_osd_up{ceph_daemon=osd.0} 1\n",
+        b'ceph_osd_up{ceph_daemon="osd.0" junk} 1\n',
+    ],
+)
+def test_malformed_lines(line):
+    with pytest.raises(ExpositionParseError):
+        list(parse_exposition(line))
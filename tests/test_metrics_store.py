@@ -0,0 +1,128 @@
+"""The metrics store's process-wide caches, against a fake connection.
+
+psycopg2 is replaced by a stand-in ``execute_values`` that hands out series ids.
+"""
+
+import importlib
+import itertools
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+SCRAPED_AT = datetime(2025, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        self.conn.statements.append(query)
+        if self.conn.slow:
+            time.sleep(0.01)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self, slow=False, fail_samples=False):
+        self.statements = []
+        self.slow = slow
+        self.fail_samples = fail_samples
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def store(monkeypatch):
+    ids = itertools.count(1)
+
+    def execute_values(cur, sql, argslist, page_size=100, fetch=False):
+        cur.conn.statements.append(sql)
+        if "INSERT INTO ceph_metric_samples" in sql and cur.conn.fail_samples:
+            raise RuntimeError("disk full")
+        if fetch:
+            return [(next(ids), *args[:3]) for args in argslist]
+
+    extras = types.ModuleType("psycopg2.extras")
+    extras.execute_values = execute_values
+    monkeypatch.setitem(sys.modules, "psycopg2", types.ModuleType("psycopg2"))
+    monkeypatch.setitem(sys.modules, "psycopg2.extras", extras)
+    name = "agents.Observability.backend.metrics_store"
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module(name)
+    yield module
+    sys.modules.pop(name, None)
+
+
+def created(conn, what):
+    return [query for query in conn.statements if what in query]
+
+
+def test_schema_is_created_once_by_concurrent_ingests(store):
+    conn = FakeConnection(slow=True)
+    threads = [
+        threading.Thread(target=store.ensure_schema, args=(conn,)) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(conn.statements) == len(store.SCHEMA_QUERIES)
+
+
+def test_series_ids_are_a_mapping_per_call(store):
+    conn = FakeConnection()
+    samples = [("ceph_osd_up", {"ceph_daemon": "osd.0"}, 1.0)]
+    store.ingest_samples(conn, samples, "a", SCRAPED_AT)
+    keys = {("a", "ceph_osd_up", '{"ceph_daemon":"osd.1"}')}
+    series_ids = store.resolve_series_ids(conn.cursor(), keys)
+    assert set(series_ids) == keys
+    # Not cached until an ingest commits it
+    assert keys.isdisjoint(store._series_ids)
+
+
+def test_committed_ingest_is_cached(store):
+    conn = FakeConnection()
+    samples = [("ceph_osd_up", {"ceph_daemon": "osd.0"}, 1.0)]
+    store.ingest_samples(conn, samples, "a", SCRAPED_AT)
+    store.ingest_samples(conn, samples, "a", SCRAPED_AT)
+    assert len(created(conn, "PARTITION OF")) == 1
+    assert len(created(conn, "INSERT INTO ceph_metric_series")) == 1
+
+
+def test_rolled_back_ingest_is_not_cached(store):
+    samples = [("ceph_osd_up", {"ceph_daemon": "osd.0"}, 1.0)]
+    failing = FakeConnection(fail_samples=True)
+    with pytest.raises(RuntimeError):
+        store.ingest_samples(failing, samples, "a", SCRAPED_AT)
+    assert failing.rollbacks == 1
+    assert not store._partitions and not store._series_ids
+
+    conn = FakeConnection()
+    store.ingest_samples(conn, samples, "a", SCRAPED_AT)
+    assert len(created(conn, "PARTITION OF")) == 1
+    assert len(created(conn, "INSERT INTO ceph_metric_series")) == 1
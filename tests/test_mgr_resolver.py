@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from agents.CephViz.backend.cluster_registry import ClusterRecord
+from agents.Observability.backend import mgr_resolver as resolver_module
+from agents.Observability.backend.mgr_resolver import MgrResolver
+
+CLUSTER = "10.0.0.1"
+MGR_DUMP = json.dumps({"active_addr": "10.0.0.7:6800/1234"}).encode()
+
+
+class FakeSessions:
+    """Stands in for the pooled SSH transports."""
+
+    def __init__(self, registered=(), stdout=MGR_DUMP):
+        self.registered = dict.fromkeys(registered)
+        self.stdout = stdout
+        self.commands = []
+
+    def __contains__(self, host):
+        return host in self.registered
+
+    def register(self, host, username=None, password=None, port=22):
+        self.registered[host] = (username, password, port)
+
+    def exec_command(self, host, command, timeout=None):
+        if host not in self.registered:
+            raise KeyError(f"Cluster {host} is not registered")
+        self.commands.append((host, command))
+        return 0, self.stdout, b""
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    records = {}
+    monkeypatch.setattr(resolver_module.cluster_registry, "by_ip", records.get)
+    monkeypatch.setenv("TEST_CEPH_PASSWORD", "secret")
+    return records
+
+
+def test_resolves_over_the_pooled_transport_and_caches(registry):
+    sessions = FakeSessions(registered=[CLUSTER])
+    resolver = MgrResolver(sessions=sessions)
+    assert resolver.resolve(CLUSTER) == "10.0.0.7"
+    assert resolver.resolve(CLUSTER) == "10.0.0.7"
+    assert sessions.commands == [(CLUSTER, "ceph mgr dump -f json")]
+    resolver.resolve(CLUSTER, refresh=True)
+    assert len(sessions.commands) == 2
+
+
+def test_unknown_cluster_is_registered_from_the_registry(registry):
+    registry[CLUSTER] = ClusterRecord(
+        name="prod",
+        ip=CLUSTER,
+        username="admin",
+        credentials_ref="env:TEST_CEPH_PASSWORD",
+    )
+    sessions = FakeSessions()
+    assert MgrResolver(sessions=sessions).resolve(CLUSTER) == "10.0.0.7"
+    assert sessions.registered[CLUSTER] == ("admin", "secret", 22)
+
+
+def test_no_credentials_and_no_active_mgr(registry):
+    with pytest.raises(RuntimeError, match="No credentials"):
+        MgrResolver(sessions=FakeSessions()).resolve(CLUSTER)
+    sessions = FakeSessions(registered=[CLUSTER], stdout=b"{}")
+    with pytest.raises(RuntimeError, match=f"No active mgr found for {CLUSTER}"):
+        MgrResolver(sessions=sessions).resolve(CLUSTER)
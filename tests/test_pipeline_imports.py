@@ -0,0 +1,88 @@
+"""The query pipeline imports, with crewai replaced by stand-ins.
+
+crewai pulls in litellm and friends; these tests only need the modules to load
+and wire their agents together, so a few names stand in for it.
+"""
+
+import importlib
+import sys
+import types
+
+import pytest
+
+PIPELINE_MODULES = [
+    "utils.agents",
+    "llm.llm_client",
+    "orchestration.router",
+    "orchestration.crew_agents",
+    "orchestration.orchestrator",
+    "orchestration.flow",
+]
+
+
+class _Stub:
+    def __init__(self, *args, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Flow(_Stub):
+    def __class_getitem__(cls, item):
+        return cls
+
+
+def _decorator(*args, **kwargs):
+    return lambda function: function
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+@pytest.fixture
+def stubbed_crewai(monkeypatch):
+    tool = type("Tool", (_Stub,), {"from_langchain": staticmethod(lambda tool: tool)})
+    stubs = [
+        _module("crewai", Agent=_Stub, Task=_Stub, LLM=_Stub),
+        _module("crewai.flow"),
+        _module("crewai.flow.flow", Flow=_Flow, listen=_decorator, start=_decorator),
+        _module("crewai.flow.persistence", persist=_decorator),
+        _module("crewai.tools"),
+        _module("crewai.tools.base_tool", Tool=tool),
+        _module("langchain_core"),
+        _module("langchain_core.tools", Tool=_Stub),
+    ]
+    for stub in stubs:
+        monkeypatch.setitem(sys.modules, stub.__name__, stub)
+    # Import the pipeline afresh against the stand-ins, and drop it afterwards
+    for name in PIPELINE_MODULES:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    yield
+    for name in PIPELINE_MODULES:
+        sys.modules.pop(name, None)
+
+
+@pytest.mark.parametrize("name", PIPELINE_MODULES)
+def test_pipeline_module_imports(stubbed_crewai, name):
+    importlib.import_module(name)
+
+
+def test_orchestrator_and_specialists_are_pooled(stubbed_crewai):
+    orchestrator = importlib.import_module("orchestration.orchestrator")
+    flow = importlib.import_module("orchestration.flow")
+    agents = importlib.import_module("utils.agents")
+
+    assert isinstance(orchestrator.orchestrator_agents, agents.AgentPool)
+    assert isinstance(flow.response_architects, agents.AgentPool)
+    assert set(flow.agent_factory.pools) == set(agents.AgentsEnum)
+
+
+def test_clear_cut_queries_skip_the_planner(stubbed_crewai, monkeypatch):
+    orchestrator = importlib.import_module("orchestration.orchestrator")
+    agents = importlib.import_module("utils.agents")
+    monkeypatch.setattr(orchestrator, "FAST_ROUTING", True)
+
+    assert orchestrator.ceph_orchestrator("What is bug 2312345 about?") == [
+        agents.AgentsEnum.BUG_INTELLIGENCE
+    ]
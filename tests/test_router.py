@@ -0,0 +1,69 @@
+import pytest
+
+from orchestration.router import cosine, embed, route_query, rule_scores
+from utils.agents import AgentsEnum
+
+BUG = AgentsEnum.BUG_INTELLIGENCE
+VIZ = AgentsEnum.CEPHVIZ
+OBS = AgentsEnum.OBSERVABILITY
+PERF = AgentsEnum.PERFORMANCE
+MAV = AgentsEnum.MAVERICK
+
+
+@pytest.mark.parametrize(
+    ("query", "agents"),
+    [
+        ("What is the bug information for bug id 12345?", [BUG]),
+        ("cluster health of cluster 1", [VIZ]),
+        ("Give me all disk occupation for cluster 1.", [OBS]),
+        ("how do I tune osd_memory_target", [PERF]),
+        ("is there a KCS article about mon clock skew", [MAV]),
+    ],
+)
+def test_strong_rules(query, agents):
+    route = route_query(query)
+    assert route.agents == agents
+    assert route.source == "rules"
+
+
+def test_several_strong_rules_route_to_all_in_order_of_mention():
+    route = route_query(
+        "What is the bug information for bug id 12345 and is it affecting in the cluster 1?"
+    )
+    assert route.agents == [BUG, VIZ]
+
+
+@pytest.mark.parametrize(
+    ("query", "agents"),
+    [
+        ("how many OSDs are down in cluster 2", [VIZ]),
+        ("compare cluster 1 and cluster 2", [VIZ]),
+        ("how to set up rgw multisite", [MAV]),
+    ],
+)
+def test_classifier(query, agents):
+    route = route_query(query)
+    assert route.agents == agents
+    assert route.source == "classifier"
+
+
+@pytest.mark.parametrize("query", ["hello", "explain erasure coding profiles"])
+def test_ambiguous_queries_are_left_to_the_planner(query):
+    assert route_query(query) is None
+
+
+def test_a_margin_nothing_clears_leaves_it_to_the_planner():
+    assert route_query("how many OSDs are down in cluster 2", min_margin=1.0) is None
+
+
+def test_rule_scores_record_the_first_hit():
+    scores = rule_scores("slow ops on cluster 2")
+    assert scores[PERF] == (1.0, 0)
+    assert scores[VIZ] == (0.5, 12)
+
+
+def test_embedding_is_normalised():
+    vector = embed("Which placement groups are degraded")
+    assert cosine(vector, vector) == pytest.approx(1.0)
+    assert cosine(vector, embed("which Placement groups are DEGRADED")) == pytest.approx(1.0)
+    assert cosine(vector, embed("")) == 0.0
@@ -0,0 +1,129 @@
+import io
+import threading
+
+import pytest
+
+from agents.CephViz.backend.ssh_pool import SSHSessionManager
+
+HOST = "10.0.0.1"
+
+
+class FakeChannel:
+    def __init__(self, transport):
+        self.transport = transport
+
+    def settimeout(self, timeout):
+        pass
+
+    def exec_command(self, command):
+        self.transport.commands.append(command)
+        if self.transport.dies_mid_command:
+            self.transport.active = False
+            raise EOFError("connection closed by peer")
+
+    def makefile(self, mode):
+        return io.BytesIO(b"ok")
+
+    def makefile_stderr(self, mode):
+        return io.BytesIO(b"")
+
+    def recv_exit_status(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    def __init__(self, dies_mid_command=False):
+        self.active = True
+        self.dies_mid_command = dies_mid_command
+        self.commands = []
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, seconds):
+        pass
+
+    def open_session(self, timeout=None):
+        if not self.active:
+            raise EOFError("transport is closed")
+        return FakeChannel(self)
+
+
+class FakeClient:
+    def __init__(self, transport=None):
+        self.transport = transport or FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.transport.active = False
+
+
+class FakeSessions(SSHSessionManager):
+    """Connects fake clients, checking the pool's lock is free while it does."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.connected = []
+        self.lock_free_while_connecting = True
+
+    def _connect(self, pool):
+        if pool.lock.acquire(blocking=False):
+            pool.lock.release()
+        else:
+            self.lock_free_while_connecting = False
+        client = FakeClient()
+        self.connected.append(client)
+        return client
+
+
+@pytest.fixture
+def sessions():
+    sessions = FakeSessions(transports_per_cluster=2, channels_per_transport=1)
+    sessions.register(HOST, "root", "secret")
+    return sessions
+
+
+def test_connects_outside_the_pool_lock(sessions):
+    assert sessions.exec_command(HOST, "ceph status") == (0, b"ok", b"")
+    assert len(sessions.connected) == 1
+    assert sessions.lock_free_while_connecting
+
+
+def test_concurrent_callers_share_the_transport_limit(sessions):
+    barrier = threading.Barrier(4)
+
+    def run():
+        barrier.wait()
+        sessions.exec_command(HOST, "ceph status")
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics = sessions.metrics(HOST)
+    assert metrics["transports"] <= 2
+    assert (metrics["commands"], metrics["failures"]) == (4, 0)
+    assert metrics["open_channels"] == 0
+
+
+def test_dead_idle_transport_is_replaced(sessions):
+    dead = FakeClient()
+    sessions.register(HOST, client=dead)
+    dead.transport.active = False
+    assert sessions.exec_command(HOST, "ceph status") == (0, b"ok", b"")
+    assert len(sessions.connected) == 1
+
+
+def test_command_is_not_retried_once_sent(sessions):
+    client = FakeClient(FakeTransport(dies_mid_command=True))
+    sessions.register(HOST, client=client)
+    with pytest.raises(EOFError):
+        sessions.exec_command(HOST, "ceph osd pool create rbd")
+    assert client.transport.commands == ["ceph osd pool create rbd"]
+    assert not sessions.connected
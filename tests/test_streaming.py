@@ -0,0 +1,88 @@
+import json
+import random
+
+import pytest
+
+from agents.CephViz.backend.streaming import OutputTooLarge, iter_json_items
+
+PG_DUMP = {
+    "pg_ready": True,
+    "pg_map": {"note": "] } [ { \" ignored", "stamp": "2026-10-18"},
+    "pg_stats": [
+        {"pgid": f"1.{i:x}", "state": "active+clean" if i % 7 else "active+undersized", "up": [i, i + 1]}
+        for i in range(200)
+    ],
+    "after": ["never", "read"],
+}
+
+
+def chunked(data, sizes):
+    pos = 0
+    while pos < len(data):
+        size = next(sizes)
+        yield data[pos : pos + size]
+        pos += size
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_items_of_a_nested_array_across_any_chunking(seed):
+    rng = random.Random(seed)
+    data = json.dumps(PG_DUMP, indent=seed % 2 or None).encode()
+    sizes = iter(lambda: rng.randint(1, 64), None)
+    items = list(iter_json_items(chunked(data, sizes), ("pg_stats",)))
+    assert items == PG_DUMP["pg_stats"]
+
+
+def test_top_level_array_of_scalars_and_strings():
+    data = json.dumps([1, -2.5, "a \"quoted\" ] string", None, True, "é", {"k": []}]).encode()
+    sizes = iter(lambda: 3, None)
+    assert list(iter_json_items(chunked(data, sizes))) == json.loads(data)
+
+
+def test_empty_array():
+    assert list(iter_json_items([b'{"pg_stats": []}'], ("pg_stats",))) == []
+
+
+def test_multibyte_characters_split_between_chunks():
+    data = json.dumps(["ünïcødé"], ensure_ascii=False).encode()
+    assert list(iter_json_items([data[:3], data[3:4], data[4:]])) == ["ünïcødé"]
+
+
+class Chunks:
+    """Iterable of chunks that records how much was read and whether it was closed."""
+
+    def __init__(self, data, size=16):
+        self.data, self.size = data, size
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        while self.read < len(self.data):
+            chunk = self.data[self.read : self.read + self.size]
+            self.read += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_stops_reading_after_the_array():
+    source = Chunks(json.dumps({"osds": [1, 2], "rest": "x" * 10_000}).encode())
+    assert list(iter_json_items(source, ("osds",))) == [1, 2]
+    assert source.read < 100
+    assert source.closed
+
+
+def test_closing_the_generator_closes_the_source():
+    source = Chunks(json.dumps(list(range(1000))).encode())
+    items = iter_json_items(source)
+    assert next(items) == 0
+    items.close()
+    assert source.closed
+
+
+def test_output_too_large():
+    source = Chunks(json.dumps(list(range(1000))).encode())
+    with pytest.raises(OutputTooLarge):
+        list(iter_json_items(source, max_bytes=100))
+    assert source.closed
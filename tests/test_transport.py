@@ -0,0 +1,169 @@
+import pytest
+
+from agents.CephViz.backend import transport
+from agents.CephViz.backend.batch import CommandResult
+from agents.CephViz.backend.transport import (
+    FakeTransport,
+    FallbackTransport,
+    is_mgr_command,
+    make_transport,
+    to_mon_command,
+)
+
+
+@pytest.mark.parametrize(
+    ("command", "expected"),
+    [
+        ("ceph status -f json", {"prefix": "status", "format": "json"}),
+        ("ceph -s", {"prefix": "status"}),
+        ("ceph osd tree -f json", {"prefix": "osd tree", "format": "json"}),
+        ("ceph osd  tree   --format=json-pretty", {"prefix": "osd tree", "format": "json"}),
+        ("ceph health detail -f json", {"prefix": "health", "detail": "detail", "format": "json"}),
+        ("ceph fs get cephfs -f json", {"prefix": "fs get", "fs_name": "cephfs", "format": "json"}),
+        ("ceph fs status", {"prefix": "fs status"}),
+        (
+            "ceph config set osd osd_memory_target 4294967296",
+            {"prefix": "config set", "who": "osd", "name": "osd_memory_target", "value": "4294967296"},
+        ),
+    ],
+)
+def test_to_mon_command(command, expected):
+    assert to_mon_command(command) == expected
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "ceph fs dump | grep client",
+        "ceph status > /tmp/status",
+        "ceph tell mds.* session ls -f json",
+        "ceph osd tree extra -f json",  # more arguments than the command takes
+        "ceph osd tree --verbose",
+        "ceph no such command",
+        "rados df",
+        "ceph osd tree 'unterminated",
+        "",
+    ],
+)
+def test_commands_without_a_mon_command_form(command):
+    assert to_mon_command(command) is None
+
+
+def test_mgr_commands():
+    assert is_mgr_command(to_mon_command("ceph fs status -f json"))
+    assert is_mgr_command(to_mon_command("ceph orch host ls"))
+    assert not is_mgr_command(to_mon_command("ceph fs ls"))
+    assert not is_mgr_command(to_mon_command("ceph status"))
+
+
+class NativeFake(FakeTransport):
+    """Runs only what has a mon command form, like the REST and rados transports."""
+
+    name = "native"
+
+    def __init__(self, responses=None, broken=False):
+        super().__init__(responses)
+        self.broken = broken
+
+    def supports(self, command):
+        return to_mon_command(command) is not None
+
+    def run(self, command, timeout=None):
+        if self.broken:
+            self.calls.append(command)
+            raise ConnectionError("mgr is gone")
+        return super().run(command, timeout)
+
+
+class BatchFake(FakeTransport):
+    name = "ssh"
+
+    def __init__(self, responses=None):
+        super().__init__(responses)
+        self.batches = []
+
+    def run_batch(self, commands, timeout=None):
+        self.batches.append(list(commands))
+        return super().run_batch(commands, timeout)
+
+
+def test_fallback_uses_the_primary_for_what_it_supports():
+    primary = NativeFake({"ceph status -f json": {"health": "native"}})
+    fallback = BatchFake({"ceph status -f json": {"health": "ssh"}})
+    result = FallbackTransport(primary, fallback).run("ceph status -f json")
+    assert result == CommandResult(b'{"health": "native"}', b"", 0)
+    assert fallback.calls == []
+
+
+def test_fallback_runs_the_rest_on_the_fallback():
+    primary = NativeFake()
+    fallback = BatchFake({"ceph tell mds.* session ls -f json": "mds.a: []"})
+    result = FallbackTransport(primary, fallback).run("ceph tell mds.* session ls -f json")
+    assert result.stdout == b"mds.a: []"
+    assert primary.calls == []
+
+
+def test_fallback_when_the_primary_fails():
+    primary = NativeFake(broken=True)
+    fallback = BatchFake({"ceph df -f json": {"pools": []}})
+    result = FallbackTransport(primary, fallback).run("ceph df -f json")
+    assert result.stdout == b'{"pools": []}'
+    assert primary.calls == ["ceph df -f json"]
+
+
+def test_a_failed_command_is_not_retried_on_the_fallback():
+    primary = NativeFake({"ceph fs get nope -f json": (2, "", "Error ENOENT")})
+    fallback = BatchFake()
+    result = FallbackTransport(primary, fallback).run("ceph fs get nope -f json")
+    assert result.exit_status == 2
+    assert fallback.calls == []
+
+
+def test_fallback_batch_keeps_the_order_and_sends_the_rest_in_one_batch():
+    primary = NativeFake({"ceph status -f json": "s", "ceph df -f json": "d"})
+    fallback = BatchFake({"ceph fs dump | grep client": "c", "ceph tell mds.* perf dump": "p"})
+    commands = [
+        "ceph fs dump | grep client",
+        "ceph status -f json",
+        "ceph tell mds.* perf dump",
+        "ceph df -f json",
+    ]
+    results = FallbackTransport(primary, fallback).run_batch(commands)
+    assert [result.stdout for result in results] == [b"c", b"s", b"p", b"d"]
+    assert fallback.batches == [["ceph fs dump | grep client", "ceph tell mds.* perf dump"]]
+
+
+def test_fallback_stream_of_unsupported_commands():
+    fallback = BatchFake({"ceph pg dump pgs_brief -f json | cat": "[]"})
+    chunks = FallbackTransport(NativeFake(), fallback).stream("ceph pg dump pgs_brief -f json | cat")
+    assert b"".join(chunks) == b"[]"
+
+
+def test_fallback_name():
+    assert FallbackTransport(NativeFake(), BatchFake()).name == "native+ssh"
+
+
+def test_make_transport_without_a_native_kind():
+    fallback = BatchFake()
+    assert make_transport("10.0.0.1", fallback, kind="ssh") is fallback
+
+
+def test_make_transport_falls_back_when_the_native_one_is_unavailable(monkeypatch):
+    monkeypatch.setattr(transport, "rados", None)
+    fallback = BatchFake()
+    assert make_transport("10.0.0.1", fallback, kind="rados") is fallback
+
+
+def test_fake_transport_answers():
+    fake = FakeTransport(
+        {
+            "ceph  status -f json-pretty": {"fsid": "f"},
+            "ceph fs ls": (1, "", "boom"),
+            "ceph osd df": lambda command: command.upper(),
+        }
+    )
+    assert fake.run("ceph status -f json").stdout == b'{"fsid": "f"}'
+    assert fake.run("ceph fs ls") == CommandResult(b"", b"boom", 1)
+    assert fake.run("ceph osd df").stdout == b"CEPH OSD DF"
+    assert fake.run("ceph mon dump").exit_status == 22
+    assert fake.calls[-1] == "ceph mon dump"